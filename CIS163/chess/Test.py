@@ -1,15 +1,39 @@
 import unittest
+import time
+import io
+import random
+import os
+import tempfile
+from unittest import mock
 
 
-from chess_model import ChessModel
+from chess_model import ChessModel, ChessAi, AiStrategy, UndoException, STARTING_FEN
 from pawn import Pawn
 from player import Player
-from move import Move
+from move import Move, MoveList, MOVE_CAPTURE, MOVE_PROMOTION, encode_move, decode_move, parse_move_name, move_name
 from king import King
 from queen import Queen
 from rook import Rook
 from bishop import Bishop
 from knight import Knight
+from perft import perft, divide, check_regressions, parallel_perft, parallel_divide, POSITIONS
+from analysis import analyze_positions
+from selfplay import play_game, play_games
+from pgn import read_games, san_to_move, move_to_san, write_game, validate_games
+from gamedb import GameDatabase, DatabaseError, import_pgn
+from book import OpeningBook, count_moves, write_book
+from tablebase import Tablebase, Wdl, canonical_material, WIN
+from evaluation import evaluate
+from piece_codes import PIECES, shared_piece
+from geometry import KNIGHT_TARGETS, KING_TARGETS, RAYS, BETWEEN, DIRECTION, ROOK_PATHS
+from search import Searcher, MATE_SCORE, static_exchange
+from zobrist import hash_board
+from transposition import TranspositionTable, Replacement, BOUND_EXACT, BOUND_LOWER
+try:
+    import numpy
+    from batch import positions_array, evaluate_batch, attack_maps, in_check_batch
+except ImportError:
+    numpy = None
 
 if __name__ == "__main__":
     unittest.main()
@@ -344,3 +368,851 @@ class TestInCheck(unittest.TestCase):
         self.chess_game.set_piece(0, 4, King(Player.WHITE))
         invalid_move = Move(0, 4, 2, 4)  # Attempt to move king two squares forward
         self.assertFalse(self.chess_game.is_valid_move(invalid_move))
+
+
+# Legal move generation
+class TestLegalMoves(unittest.TestCase):
+    def setUp(self):
+        self.chess_game = ChessModel()
+
+    def test_standard_board_has_20_moves(self):
+        self.assertEqual(len(self.chess_game.legal_moves()), 20)
+
+    def test_legal_moves_match_is_valid_move(self):
+        """Every generated move is accepted by is_valid_move and no other move is."""
+        self.chess_game.move(Move(6, 4, 4, 4))
+        self.chess_game.move(Move(1, 3, 3, 3))
+        generated = set()
+        for move in self.chess_game.legal_moves():
+            generated.add((move.from_row, move.from_col, move.to_row, move.to_col))
+        probed = set()
+        for from_row in range(8):
+            for from_col in range(8):
+                for to_row in range(8):
+                    for to_col in range(8):
+                        if self.chess_game.is_valid_move(Move(from_row, from_col, to_row, to_col)):
+                            probed.add((from_row, from_col, to_row, to_col))
+        self.assertEqual(generated, probed)
+
+    def test_no_legal_moves_when_checkmated(self):
+        self.chess_game.move(Move(6, 5, 5, 5))
+        self.chess_game.move(Move(1, 4, 3, 4))
+        self.chess_game.move(Move(6, 6, 4, 6))
+        self.chess_game.move(Move(0, 3, 4, 7))
+        self.assertEqual(self.chess_game.legal_moves(), [])
+
+
+# Runs every check and checkmate test again with the position stored as bitboards
+class TestInCheckBitboard(TestInCheck):
+    def setUp(self):
+        self.chess_game = ChessModel(bitboard=True)
+
+    def test_board_view_reads_back_pieces(self):
+        self.assertIsInstance(self.chess_game.board[0][4], King)
+        self.assertEqual(self.chess_game.piece_at(7, 3).player, Player.WHITE)
+        self.assertIsNone(self.chess_game.board[4][4])
+
+
+class TestLegalMovesBitboard(TestLegalMoves):
+    def setUp(self):
+        self.chess_game = ChessModel(bitboard=True)
+
+
+# Making and taking back moves in place
+class TestMakeUnmake(unittest.TestCase):
+    def setUp(self):
+        self.chess_game = ChessModel()
+
+    def snapshot(self):
+        return [[self.chess_game.piece_at(row, col) for col in range(8)] for row in range(8)]
+
+    def test_unmake_restores_capture(self):
+        self.chess_game.move(Move(6, 4, 4, 4))
+        self.chess_game.move(Move(1, 3, 3, 3))
+        before = self.snapshot()
+        self.chess_game.make_move(Move(4, 4, 3, 3))
+        self.assertEqual(self.chess_game.current_player, Player.BLACK)
+        self.chess_game.unmake_move()
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(self.chess_game.current_player, Player.WHITE)
+
+    def test_unmake_restores_promoted_pawn(self):
+        self.chess_game.set_piece(0, 0, None)
+        self.chess_game.set_piece(1, 0, Pawn(Player.WHITE))
+        self.chess_game.make_move(Move(1, 0, 0, 0))
+        self.assertIsInstance(self.chess_game.piece_at(0, 0), Queen)
+        self.chess_game.unmake_move()
+        self.assertIsInstance(self.chess_game.piece_at(1, 0), Pawn)
+        self.assertIsNone(self.chess_game.piece_at(0, 0))
+
+    def test_legality_check_leaves_board_untouched(self):
+        before = self.snapshot()
+        self.chess_game.legal_moves()
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(self.chess_game.move_history, [])
+
+    def test_king_square_follows_moves(self):
+        self.chess_game.move(Move(6, 4, 4, 4))
+        self.chess_game.move(Move(1, 4, 3, 4))
+        self.chess_game.move(Move(7, 4, 6, 4))
+        self.assertEqual(self.chess_game.king_square(Player.WHITE), (6, 4))
+        self.chess_game.undo()
+        self.assertEqual(self.chess_game.king_square(Player.WHITE), (7, 4))
+
+    def test_square_attacked_by_each_side(self):
+        # e3 is covered by white pawns, e6 by black pawns, e4 by neither at the start
+        self.assertTrue(self.chess_game.is_square_attacked(5, 4, Player.WHITE))
+        self.assertTrue(self.chess_game.is_square_attacked(2, 4, Player.BLACK))
+        self.assertFalse(self.chess_game.is_square_attacked(4, 4, Player.WHITE))
+        self.assertFalse(self.chess_game.is_square_attacked(4, 4, Player.BLACK))
+
+    def test_position_hash_matches_after_transposition(self):
+        start = self.chess_game.position_hash
+        self.chess_game.move(Move(7, 6, 5, 5))
+        self.assertNotEqual(self.chess_game.position_hash, start)
+        self.chess_game.move(Move(0, 6, 2, 5))
+        self.chess_game.move(Move(5, 5, 7, 6))
+        self.chess_game.move(Move(2, 5, 0, 6))
+        self.assertEqual(self.chess_game.position_hash, start)
+
+    def test_position_hash_restored_by_undo_and_set_piece(self):
+        start = self.chess_game.position_hash
+        self.chess_game.move(Move(6, 4, 4, 4))
+        self.chess_game.undo()
+        self.assertEqual(self.chess_game.position_hash, start)
+        self.chess_game.set_piece(4, 4, Queen(Player.BLACK))
+        self.assertNotEqual(self.chess_game.position_hash, start)
+        self.chess_game.set_piece(4, 4, None)
+        self.assertEqual(self.chess_game.position_hash, start)
+        self.chess_game.current_player = Player.BLACK
+        self.assertNotEqual(self.chess_game.position_hash, start)
+
+    def test_position_hash_matches_hash_from_scratch(self):
+        chess_game = self.chess_game
+        rng = random.Random(9)
+        for step in range(120):
+            choice = rng.random()
+            if choice < 0.15 and chess_game.move_history:
+                chess_game.undo()
+            elif choice < 0.2:
+                row, col = rng.randrange(2, 6), rng.randrange(8)
+                chess_game.set_piece(row, col, rng.choice([None, Knight(Player.WHITE), Rook(Player.BLACK)]))
+            else:
+                moves = chess_game.legal_moves()
+                if not moves:
+                    break
+                chess_game.move(rng.choice(moves))
+            self.assertEqual(chess_game.position_hash, hash_board(chess_game.board, chess_game.current_player))
+        chess_game.goto_ply(0)
+        self.assertEqual(chess_game.position_hash, hash_board(chess_game.board, chess_game.current_player))
+
+    def test_moves_after_an_edit_unmake_to_their_saved_hash(self):
+        chess_game = self.chess_game
+        chess_game.move(Move(6, 4, 4, 4))
+        chess_game.move(Move(1, 4, 3, 4))
+        chess_game.set_piece(5, 0, Knight(Player.WHITE))
+        chess_game.set_piece(5, 0, None)
+        edited = chess_game.position_hash
+        with mock.patch("chess_model.hash_board", wraps=hash_board) as rehash:
+            chess_game.make_move(Move(6, 3, 4, 3))
+            chess_game.make_move(Move(0, 1, 2, 2))
+            chess_game.unmake_move()
+            chess_game.unmake_move()
+            self.assertEqual(rehash.call_count, 0)
+            self.assertEqual(chess_game.position_hash, edited)
+            chess_game.undo()
+            self.assertEqual(rehash.call_count, 1)
+            self.assertEqual(chess_game.position_hash, hash_board(chess_game.board, chess_game.current_player))
+
+
+class TestMakeUnmakeBitboard(TestMakeUnmake):
+    def setUp(self):
+        self.chess_game = ChessModel(bitboard=True)
+
+
+# Computer player
+class TestChessAi(unittest.TestCase):
+    def setUp(self):
+        self.chess_game = ChessModel()
+        for row in range(self.chess_game.nrows):
+            for col in range(self.chess_game.ncols):
+                self.chess_game.set_piece(row, col, None)
+
+    def test_search_finds_back_rank_mate(self):
+        self.chess_game.set_piece(0, 7, King(Player.BLACK))
+        self.chess_game.set_piece(1, 6, Pawn(Player.BLACK))
+        self.chess_game.set_piece(1, 7, Pawn(Player.BLACK))
+        self.chess_game.set_piece(7, 7, King(Player.WHITE))
+        self.chess_game.set_piece(7, 0, Rook(Player.WHITE))
+        ChessAi(self.chess_game, AiStrategy.Search, 2).make_move()
+        self.assertIsInstance(self.chess_game.piece_at(0, 0), Rook)
+        self.assertTrue(self.chess_game.is_complete())
+
+    def test_search_takes_hanging_queen(self):
+        self.chess_game.set_piece(0, 4, King(Player.BLACK))
+        self.chess_game.set_piece(3, 3, Queen(Player.BLACK))
+        self.chess_game.set_piece(7, 4, King(Player.WHITE))
+        self.chess_game.set_piece(6, 3, Rook(Player.WHITE))
+        ChessAi(self.chess_game, AiStrategy.Search, 2).make_move()
+        self.assertIsInstance(self.chess_game.piece_at(3, 3), Rook)
+
+    def test_timed_search_reports_depth_and_restores_board(self):
+        self.chess_game = ChessModel()
+        ai = ChessAi(self.chess_game, time_budget_ms=100)
+        start = self.chess_game.position_hash
+        move = ai.choose_move()
+        self.assertTrue(self.chess_game.is_valid_move(move))
+        self.assertGreaterEqual(ai.last_depth, 1)
+        self.assertGreater(ai.last_nodes, 0)
+        self.assertEqual(self.chess_game.position_hash, start)
+        self.assertEqual(self.chess_game.move_history, [])
+
+    def test_timed_search_stays_within_its_budget(self):
+        for budget in (20, 100):
+            for fen in (POSITIONS["middlegame"][0], POSITIONS["promotion"][0]):
+                chess_game = ChessModel.from_fen(fen)
+                ai = ChessAi(chess_game, time_budget_ms=budget)
+                start = time.perf_counter()
+                move = ai.choose_move()
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.assertTrue(chess_game.is_valid_move(move))
+                self.assertLess(elapsed_ms, budget + 50)
+
+    def test_random_strategy_makes_a_legal_move(self):
+        self.chess_game = ChessModel()
+        ChessAi(self.chess_game, AiStrategy.Random).make_move()
+        self.assertEqual(len(self.chess_game.move_history), 1)
+        self.assertEqual(self.chess_game.current_player, Player.BLACK)
+
+
+# Move generation node counts
+class TestPerft(unittest.TestCase):
+    def test_regression_table_to_depth_2(self):
+        for bitboard in (False, True):
+            for name, depth, expected, nodes, _ in check_regressions(2, bitboard):
+                self.assertEqual(nodes, expected, f"{name} at depth {depth}")
+
+    def test_start_position_depth_3(self):
+        self.assertEqual(perft(ChessModel(), 3), 8902)
+
+    def test_divide_adds_up_to_perft(self):
+        counts = divide(ChessModel(), 2)
+        self.assertEqual(len(counts), 20)
+        self.assertEqual(sum(counts.values()), 400)
+        self.assertEqual(counts["e2e4"], 20)
+
+    def test_parallel_perft_matches_single_process(self):
+        fen, expected = POSITIONS["endgame"]
+        model = ChessModel.from_fen(fen)
+        self.assertEqual(parallel_perft(model, 3, 2), expected[2])
+        self.assertEqual(parallel_divide(model, 2, 2), divide(model, 2))
+
+
+# Snapshots and bulk analysis
+class TestSnapshots(unittest.TestCase):
+    def test_snapshot_round_trip(self):
+        chess_game = ChessModel()
+        chess_game.move(Move(6, 4, 4, 4))
+        for bitboard in (False, True):
+            copy = ChessModel.from_snapshot(chess_game.snapshot(), bitboard)
+            self.assertEqual(copy.position_hash, chess_game.position_hash)
+            self.assertEqual(copy.current_player, Player.BLACK)
+            self.assertEqual(copy.snapshot(), chess_game.snapshot())
+
+    def test_parallel_analysis_matches_single_process(self):
+        snapshots = [ChessModel.from_fen(fen).snapshot() for fen, _ in POSITIONS.values()]
+        self.assertEqual(analyze_positions(snapshots, 2, workers=2), analyze_positions(snapshots, 2))
+
+
+# Headless self-play
+class TestSelfPlay(unittest.TestCase):
+    def test_same_seed_gives_same_game(self):
+        self.assertEqual(play_game(7, max_plies=20), play_game(7, max_plies=20))
+        self.assertNotEqual(play_game(7, max_plies=20)["moves"], play_game(8, max_plies=20)["moves"])
+
+    def test_parallel_games_match_single_process(self):
+        serial = list(play_games(3, seed=1, max_plies=12))
+        parallel = list(play_games(3, seed=1, workers=2, max_plies=12))
+        self.assertEqual(parallel, serial)
+        self.assertEqual([record["game"] for record in serial], [0, 1, 2])
+
+    def test_record_describes_finished_game(self):
+        record = play_game(3, strategy=AiStrategy.Random, max_plies=30)
+        self.assertIn(record["result"], ("1-0", "0-1", "1/2-1/2"))
+        self.assertIn(record["reason"], ("checkmate", "stalemate", "repetition", "move limit"))
+        self.assertLessEqual(len(record["moves"]), 30)
+
+
+# Forsyth-Edwards Notation
+class TestFen(unittest.TestCase):
+    def test_standard_board_round_trip(self):
+        chess_game = ChessModel()
+        self.assertEqual(chess_game.to_fen(), STARTING_FEN)
+        for bitboard in (False, True):
+            loaded = ChessModel.from_fen(STARTING_FEN, bitboard)
+            self.assertEqual(loaded.position_hash, chess_game.position_hash)
+            self.assertEqual(loaded.to_fen(), STARTING_FEN)
+
+    def test_fields_follow_moves(self):
+        chess_game = ChessModel()
+        chess_game.move(Move(6, 4, 4, 4))
+        self.assertEqual(chess_game.to_fen(), "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1")
+        chess_game.move(Move(0, 6, 2, 5))
+        chess_game.move(Move(7, 4, 6, 4))
+        self.assertEqual(chess_game.to_fen(), "rnbqkb1r/pppppppp/5n2/8/4P3/8/PPPPKPPP/RNBQ1BNR b kq - 2 2")
+        chess_game.undo()
+        self.assertEqual(chess_game.to_fen(), "rnbqkb1r/pppppppp/5n2/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 1 2")
+
+    def test_loaded_position_keeps_all_fields(self):
+        fen = "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 b - - 13 40"
+        chess_game = ChessModel.from_fen(fen)
+        self.assertEqual(chess_game.to_fen(), fen)
+        self.assertEqual(chess_game.current_player, Player.BLACK)
+        self.assertIsInstance(chess_game.piece_at(3, 0), King)
+
+    def test_malformed_fen_raises(self):
+        for fen in ("8/8/8/8 w - - 0 1", "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX w", STARTING_FEN.replace(" w ", " x ")):
+            with self.assertRaises(ValueError):
+                ChessModel.from_fen(fen)
+
+
+class TestPgn(unittest.TestCase):
+    ARCHIVE = """[Event "Casual"]
+[White "A"]
+[Black "B"]
+[Result "*"]
+
+1. e4 e5 2. Nf3 {develops} Nc6 (2... d6 3. d4) 3. Bb5 a6 $1 4. Ba4 Nf6 *
+
+[Event "Castles"]
+[Result "1/2-1/2"]
+
+1.e4 e5 2.Nf3 Nc6 3.Bc4 Bc5 4.O-O 1/2-1/2
+"""
+
+    def test_reader_skips_comments_and_variations(self):
+        games = list(read_games(io.StringIO(self.ARCHIVE)))
+        self.assertEqual(len(games), 2)
+        self.assertEqual(games[0].tags["White"], "A")
+        self.assertEqual(games[0].moves, ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6", "Ba4", "Nf6"])
+        self.assertEqual(games[1].moves[-1], "O-O")
+        self.assertEqual(games[1].result, "1/2-1/2")
+
+    def test_validation_rejects_castling(self):
+        results = [result for _, result in validate_games(read_games(io.StringIO(self.ARCHIVE)))]
+        self.assertEqual(results[0], (True, 8, ""))
+        self.assertFalse(results[1][0])
+        self.assertEqual(results[1][1], 6)
+
+    def test_disambiguation(self):
+        chess_game = ChessModel.from_fen("4k3/8/8/8/8/8/4K3/R6R w - - 0 1")
+        move = san_to_move(chess_game, "Rhf1")
+        self.assertEqual((move.from_row, move.from_col, move.to_row, move.to_col), (7, 7, 7, 5))
+        self.assertEqual(move_to_san(chess_game, move), "Rhf1")
+        with self.assertRaises(ValueError):
+            san_to_move(chess_game, "Rf1")
+
+    def test_written_game_replays(self):
+        chess_game = ChessModel()
+        for san in ("f3", "e5", "g4", "Qh4"):
+            chess_game.make_move(san_to_move(chess_game, san))
+        text = write_game(chess_game, {"White": "A"})
+        self.assertIn("2. g4 Qh4# 0-1", text)
+        self.assertEqual(len(chess_game.move_history), 4)
+        game = next(read_games(io.StringIO(text)))
+        self.assertEqual(game.result, "0-1")
+        self.assertEqual(game.moves, ["f3", "e5", "g4", "Qh4#"])
+
+
+class TestPgnComments(unittest.TestCase):
+    def test_result_inside_multiline_comment_does_not_end_the_game(self):
+        archive = ('[Event "One"]\n\n1. e4 {White was sure this wins, as in the famous\n'
+                   'game that ended 1-0\n[in the end] } e5 2. Nf3 ; or 1/2-1/2\nNc6 0-1\n\n'
+                   '[Event "Two"]\n\n1. d4 *\n')
+        games = list(read_games(io.StringIO(archive)))
+        self.assertEqual([game.tags["Event"] for game in games], ["One", "Two"])
+        self.assertEqual(games[0].moves, ["e4", "e5", "Nf3", "Nc6"])
+        self.assertEqual(games[0].result, "0-1")
+        self.assertEqual(games[1].moves, ["d4"])
+
+
+class TestGameDatabase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "games.cgdb")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_move_packing_round_trip(self):
+        for name in ("a8h1", "h1a8", "e2e4", "g7g8"):
+            code = encode_move(parse_move_name(name))
+            self.assertLess(code, 1 << 16)
+            self.assertEqual(move_name(decode_move(code)), name)
+
+    def test_games_replay_by_number(self):
+        first = play_game(1, strategy=AiStrategy.Random, max_plies=60)
+        second = ChessModel.from_fen(POSITIONS["promotion"][0])
+        with GameDatabase(self.path) as database:
+            database.append([parse_move_name(name) for name in first["moves"]], first["result"])
+            moves = second.legal_moves()[:1]
+            number = database.append(moves, start=second)
+        self.assertEqual(number, 1)
+        self.assertEqual(len(second.move_history), 0)
+
+        with GameDatabase(self.path) as database:
+            self.assertEqual(len(database), 2)
+            game = database[0]
+            self.assertEqual([move_name(move) for move in game.moves], first["moves"])
+            self.assertEqual(game.result, first["result"])
+            model = database.replay(1)
+            self.assertEqual(len(model.move_history), 1)
+            second.make_move(moves[0])
+            self.assertEqual(model.position_hash, second.position_hash)
+
+    def test_missing_index_is_rebuilt(self):
+        archive = "1. e4 e5 2. Nf3 Nc6 *\n\n1. d4 d5 2. O-O *\n\n1. c4 1-0\n"
+        with GameDatabase(self.path) as database:
+            self.assertEqual(import_pgn(database, read_games(io.StringIO(archive))), (2, 1))
+        os.remove(self.path + ".idx")
+        with GameDatabase(self.path) as database:
+            self.assertEqual(len(database), 2)
+            self.assertEqual(database[-1].result, "1-0")
+            self.assertEqual(len(database[0].moves), 4)
+
+    def test_foreign_file_rejected_before_indexing(self):
+        for contents in (b"not a game database at all", b"CG"):
+            with open(self.path, "wb") as data:
+                data.write(contents)
+            with self.assertRaises(DatabaseError):
+                GameDatabase(self.path)
+            self.assertFalse(os.path.exists(self.path + ".idx"))
+
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "opening.book")
+        games = [[Move(6, 4, 4, 4), Move(1, 4, 3, 4)], [Move(6, 4, 4, 4), Move(1, 2, 3, 2)],
+                 [Move(6, 4, 4, 4)], [Move(6, 3, 4, 3)]]
+        write_book(self.path, count_moves(games, plies=2))
+        self.book = OpeningBook(self.path)
+
+    def tearDown(self):
+        self.book.close()
+        self.directory.cleanup()
+
+    def test_lookup_counts_moves(self):
+        self.assertEqual(len(self.book), 4)
+        entries = {move_name(move): weight for move, weight in self.book.lookup(ChessModel().position_hash)}
+        self.assertEqual(entries, {"e2e4": 3, "d2d4": 1})
+        self.assertEqual(self.book.lookup(12345), [])
+
+    def test_ai_plays_book_moves_then_searches(self):
+        chess_game = ChessModel()
+        ai = ChessAi(chess_game, depth=1, book=self.book)
+        self.assertEqual(move_name(self.book.choose(chess_game, best=True)), "e2e4")
+        chess_game.make_move(Move(6, 4, 4, 4))
+        self.assertIn(move_name(ai.choose_move()), ("e7e5", "c7c5"))
+        self.assertEqual(ai.last_nodes, 0)
+        chess_game.make_move(Move(1, 0, 2, 0))
+        self.assertIsNotNone(ai.choose_move())
+        self.assertGreater(ai.last_nodes, 0)
+
+
+class TestTablebase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.tablebase = Tablebase(cls.directory.name)
+        cls.tablebase.generate("KRK")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_material_names(self):
+        self.assertEqual(canonical_material("KRK"), ("KRK", False))
+        self.assertEqual(canonical_material("KKR"), ("KRK", True))
+        self.assertEqual(canonical_material("KPKQ"), ("KQKP", True))
+        for material in ("KQRKR", "QK", "KQ"):
+            with self.assertRaises(ValueError):
+                canonical_material(material)
+
+    def test_mate_in_one(self):
+        chess_game = ChessModel.from_fen("k7/8/1K6/8/8/8/8/7R w - - 0 1")
+        self.assertEqual(self.tablebase.probe(chess_game), (Wdl.Win, 1))
+        ai = ChessAi(chess_game, tablebase=self.tablebase)
+        move = ai.choose_move()
+        self.assertEqual(move_name(move), "h1h8")
+        self.assertEqual(ai.last_nodes, 0)
+        chess_game.make_move(move)
+        self.assertTrue(chess_game.is_complete())
+        self.assertEqual(self.tablebase.probe(chess_game), (Wdl.Loss, 0))
+
+    def test_mirrored_material_and_adjudication(self):
+        chess_game = ChessModel.from_fen("7r/8/8/8/8/1k6/8/K7 b - - 0 1")
+        self.assertEqual(self.tablebase.probe(chess_game), (Wdl.Win, 1))
+        self.assertEqual(self.tablebase.adjudicate(chess_game), "0-1")
+        # Black takes the undefended rook
+        chess_game = ChessModel.from_fen("8/8/8/8/8/8/kR6/7K b - - 0 1")
+        self.assertEqual(self.tablebase.adjudicate(chess_game), "1/2-1/2")
+        self.assertIsNone(self.tablebase.probe(ChessModel()))
+
+    def test_values_agree_with_moves(self):
+        self.assert_values_agree_with_moves(self.tablebase)
+
+    def test_capture_losing_slowly_is_still_a_loss(self):
+        # Pretend a bare king pair is a win for the side to move in 41 plies, so taking the rook
+        # loses more slowly than any quiet move of a king about to be mated. Such positions must
+        # stay lost, with the distance of the slowest loss.
+        class SlowCaptureTablebase(Tablebase):
+            def _probe_pieces(self, codes, squares, color):
+                if len(codes) == 2:
+                    return WIN, 41
+                return super()._probe_pieces(codes, squares, color)
+
+        with tempfile.TemporaryDirectory() as directory:
+            tablebase = SlowCaptureTablebase(directory)
+            tablebase.generate("KRK")
+            # The black king can take the undefended rook or step away from it
+            chess_game = ChessModel.from_fen("K1Rk4/8/8/8/8/8/8/8 b - - 0 1")
+            self.assertEqual(tablebase.probe(chess_game), (Wdl.Loss, 42))
+            self.assert_values_agree_with_moves(tablebase)
+
+    def assert_values_agree_with_moves(self, tablebase):
+        rng = random.Random(7)
+        for _ in range(200):
+            chess_game = ChessModel(empty=True)
+            squares = rng.sample(range(64), 3)
+            for square, piece in zip(squares, (King(Player.WHITE), Rook(Player.WHITE), King(Player.BLACK))):
+                chess_game.set_piece(square // 8, square % 8, piece)
+            chess_game.current_player = rng.choice((Player.WHITE, Player.BLACK))
+            if chess_game.in_check(chess_game.current_player.next()):
+                continue
+            outcomes = []
+            for move in chess_game.legal_moves():
+                chess_game.make_move(move)
+                outcomes.append(tablebase.probe(chess_game))
+                chess_game.unmake_move()
+            losses = [plies for wdl, plies in outcomes if wdl == Wdl.Loss]
+            if not outcomes:
+                expected = (Wdl.Loss if chess_game.in_check(chess_game.current_player) else Wdl.Draw, 0)
+            elif losses:
+                expected = (Wdl.Win, min(losses) + 1)
+            elif any(wdl == Wdl.Draw for wdl, _ in outcomes):
+                expected = (Wdl.Draw, 0)
+            else:
+                expected = (Wdl.Loss, max(plies for _, plies in outcomes) + 1)
+            self.assertEqual(tablebase.probe(chess_game), expected)
+
+
+@unittest.skipUnless(numpy is not None, "NumPy is not installed")
+class TestBatch(unittest.TestCase):
+    FENS = [STARTING_FEN] + [fen for fen, _ in POSITIONS.values()] + [
+        "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3",
+        "4k3/8/8/8/8/8/4r3/R3K2R w - - 0 1",
+    ]
+
+    def setUp(self):
+        self.models = [ChessModel.from_fen(fen, bitboard=True) for fen in self.FENS]
+        self.boards, self.colors = positions_array(model.snapshot() for model in self.models)
+
+    def test_layout(self):
+        self.assertEqual(self.boards.shape, (len(self.FENS), 64))
+        self.assertEqual(self.boards.dtype, numpy.int8)
+
+    def test_evaluation_matches_single_positions(self):
+        scores = evaluate_batch(self.boards, self.colors)
+        for model, score in zip(self.models, scores):
+            self.assertEqual(score, evaluate(model.board, model.current_player))
+
+    def test_attacks_and_checks_match_single_positions(self):
+        attacks = attack_maps(self.boards)
+        checks = in_check_batch(self.boards, self.colors)
+        for number, model in enumerate(self.models):
+            self.assertEqual(checks[number], model.in_check(model.current_player))
+            for color in (0, 1):
+                for square in range(64):
+                    self.assertEqual(attacks[number, color, square], model.board.attackers(square, color) != 0)
+        self.assertEqual(list(checks[-2:]), [True, True])
+
+
+class TestGeometry(unittest.TestCase):
+    def test_jump_and_step_targets(self):
+        self.assertEqual(sorted(KNIGHT_TARGETS[0]), [(1, 2), (2, 1)])
+        self.assertEqual(len(KNIGHT_TARGETS[3 * 8 + 3]), 8)
+        self.assertEqual(sorted(KING_TARGETS[63]), [(6, 6), (6, 7), (7, 6)])
+
+    def test_rays_and_between(self):
+        self.assertEqual(RAYS[-1, 1][56], ((6, 1), (5, 2), (4, 3), (3, 4), (2, 5), (1, 6), (0, 7)))
+        self.assertEqual(BETWEEN[56][0], ((6, 0), (5, 0), (4, 0), (3, 0), (2, 0), (1, 0)))
+        self.assertEqual(BETWEEN[56][57], ())
+        self.assertEqual(DIRECTION[0][63], (1, 1))
+        self.assertIsNone(DIRECTION[0][17])
+        self.assertIsNone(ROOK_PATHS[0][63])
+
+    def test_sliders_stop_at_blockers(self):
+        model = ChessModel.from_fen("7k/8/8/8/8/2p5/8/Q3K3 w - - 0 1")
+        self.assertTrue(model.is_valid_move(Move(7, 0, 5, 2)))
+        self.assertFalse(model.is_valid_move(Move(7, 0, 4, 3)))
+        self.assertTrue(model.is_valid_move(Move(7, 0, 0, 0)))
+        self.assertFalse(model.is_valid_move(Move(7, 0, 7, 5)))
+        self.assertFalse(model.is_valid_move(Move(7, 0, 5, 1)))
+
+
+class TestSharedPieces(unittest.TestCase):
+    def test_setup_uses_shared_pieces(self):
+        board = ChessModel().board
+        self.assertIs(board[6][0], board[6][7])
+        self.assertIs(board[0][3], shared_piece(Queen, Player.BLACK))
+        self.assertTrue(all(board[row][col] in PIECES for row in (0, 1, 6, 7) for col in range(8)))
+
+    def test_promotion_uses_shared_queen(self):
+        model = ChessModel.from_fen("4k3/P7/8/8/8/8/8/4K3 w - - 0 1")
+        model.make_move(Move(1, 0, 0, 0))
+        self.assertIs(model.board[0][0], shared_piece(Queen, Player.WHITE))
+
+    def test_no_instance_dictionaries(self):
+        self.assertFalse(hasattr(Move(6, 4, 4, 4), "__dict__"))
+        self.assertFalse(hasattr(King(Player.WHITE), "__dict__"))
+        with self.assertRaises(AttributeError):
+            Move(6, 4, 4, 4).score = 1
+
+
+class TestPackedMoves(unittest.TestCase):
+    FEN = "4k3/1P6/8/8/8/8/3n4/R3K3 w - - 0 1"
+
+    def test_generated_moves_match_legal_moves(self):
+        for bitboard in (False, True):
+            model = ChessModel.from_fen(self.FEN, bitboard)
+            moves = model.generate_moves()
+            self.assertEqual(sorted(move_name(move) for move in moves.moves()),
+                             sorted(move_name(move) for move in model.legal_moves()))
+
+    def test_flags(self):
+        for bitboard in (False, True):
+            model = ChessModel.from_fen(self.FEN, bitboard)
+            flags = {move_name(decode_move(code)): code & (MOVE_CAPTURE | MOVE_PROMOTION)
+                     for code in model.generate_moves()}
+            self.assertEqual(flags["b7b8"], MOVE_PROMOTION)
+            self.assertEqual(flags["e1d2"], MOVE_CAPTURE)
+            self.assertEqual(flags["a1a2"], 0)
+
+    def test_move_list_is_reused(self):
+        moves = MoveList()
+        model = ChessModel()
+        self.assertIs(model.generate_moves(moves), moves)
+        self.assertEqual(len(moves), 20)
+        self.assertEqual(moves[-1], moves[19])
+        model.make_packed_move(moves[0])
+        model.generate_moves(moves)
+        self.assertEqual(len(moves), 20)
+        with self.assertRaises(IndexError):
+            moves[20]
+
+    def test_history_holds_packed_moves(self):
+        model = ChessModel()
+        model.make_move(Move(6, 4, 4, 4))
+        self.assertEqual(model.move_history[0][0], encode_move(Move(6, 4, 4, 4)))
+        model.unmake_move()
+        self.assertEqual(model.to_fen(), STARTING_FEN)
+
+
+class TestPositionCache(unittest.TestCase):
+    def test_repeated_queries_hit_the_cache(self):
+        model = ChessModel()
+        self.assertTrue(model.is_valid_move(Move(6, 4, 4, 4)))
+        misses = model.cache_misses
+        self.assertFalse(model.is_valid_move(Move(6, 4, 3, 4)))
+        self.assertFalse(model.in_check(model.current_player))
+        self.assertFalse(model.in_check(model.current_player))
+        self.assertFalse(model.is_complete())
+        self.assertEqual(len(model.legal_moves()), 20)
+        self.assertEqual(model.cache_misses, misses + 1)
+        self.assertEqual(model.cache_hits, 3)
+
+    def test_move_undo_and_set_piece_clear_the_cache(self):
+        model = ChessModel()
+        self.assertEqual(len(model.legal_moves()), 20)
+        model.move(Move(6, 5, 5, 5))
+        model.move(Move(1, 4, 3, 4))
+        model.move(Move(6, 6, 4, 6))
+        self.assertFalse(model.is_complete())
+        model.move(Move(0, 3, 4, 7))
+        self.assertTrue(model.is_complete())
+        model.undo()
+        self.assertFalse(model.is_complete())
+        self.assertFalse(model.in_check(Player.BLACK))
+        model.set_piece(2, 4, Rook(Player.WHITE))
+        self.assertTrue(model.in_check(Player.BLACK))
+
+    def test_clear_cache_after_writing_the_board(self):
+        model = ChessModel()
+        self.assertFalse(model.is_valid_move(Move(7, 0, 5, 0)))
+        model.board[6][0] = None
+        model.clear_cache()
+        self.assertTrue(model.is_valid_move(Move(7, 0, 5, 0)))
+
+
+class TestChecksAndPins(unittest.TestCase):
+    def test_pinned_piece_stays_on_its_line(self):
+        for bitboard in (False, True):
+            model = ChessModel.from_fen("4k3/8/8/8/4r3/8/4R3/4K3 w - - 0 1", bitboard)
+            checkers, pins = model.checks_and_pins()
+            self.assertEqual(checkers, [])
+            self.assertEqual(pins, {(6, 4): frozenset({(6, 4), (5, 4), (4, 4)})})
+            rook_moves = {move_name(move) for move in model.legal_moves() if move.from_row == 6 and move.from_col == 4}
+            self.assertEqual(rook_moves, {"e2e3", "e2e4"})
+
+    def test_double_check_allows_only_king_moves(self):
+        for bitboard in (False, True):
+            model = ChessModel.from_fen("4k3/8/8/8/8/3n4/R7/4K2r w - - 0 1", bitboard)
+            checkers, _ = model.checks_and_pins()
+            self.assertEqual(sorted(checkers), [(5, 3), (7, 7)])
+            self.assertEqual(sorted(move_name(move) for move in model.legal_moves()), ["e1d2", "e1e2"])
+
+    def test_single_check_must_be_blocked_or_captured(self):
+        for bitboard in (False, True):
+            model = ChessModel.from_fen("4k3/8/8/8/8/5B2/8/r3K3 w - - 0 1", bitboard)
+            self.assertEqual(model.checks_and_pins()[0], [(7, 0)])
+            self.assertEqual(sorted(move_name(move) for move in model.legal_moves()),
+                             ["e1d2", "e1e2", "e1f2", "f3d1"])
+
+
+class TestHistoryNavigation(unittest.TestCase):
+    def play(self, model, plies, seed=5):
+        rng = random.Random(seed)
+        fens = [model.to_fen()]
+        for _ in range(plies):
+            model.move(rng.choice(model.legal_moves()))
+            fens.append(model.to_fen())
+        return fens
+
+    def test_undo_then_redo(self):
+        model = ChessModel()
+        fens = self.play(model, 6)
+        model.undo()
+        model.undo()
+        self.assertEqual(model.to_fen(), fens[4])
+        self.assertEqual(model.total_plies, 6)
+        model.redo()
+        self.assertEqual(model.to_fen(), fens[5])
+        model.redo()
+        self.assertEqual(model.to_fen(), fens[6])
+        with self.assertRaises(UndoException):
+            model.redo()
+
+    def test_new_move_discards_redo(self):
+        model = ChessModel()
+        self.play(model, 4)
+        model.undo()
+        model.move(model.legal_moves()[0])
+        self.assertEqual(model.total_plies, 4)
+        with self.assertRaises(UndoException):
+            model.redo()
+
+    def test_goto_ply_anywhere_in_the_game(self):
+        for bitboard in (False, True):
+            model = ChessModel(bitboard)
+            fens = self.play(model, 50)
+            rng = random.Random(1)
+            for ply in [0, 50, 17, 33, 32, 49, 1] + [rng.randrange(51) for _ in range(20)]:
+                model.goto_ply(ply)
+                self.assertEqual(model.ply, ply)
+                self.assertEqual(model.to_fen(), fens[ply])
+                self.assertEqual(model.position_hash, ChessModel.from_fen(fens[ply], bitboard).position_hash)
+            self.assertEqual(model.total_plies, 50)
+            with self.assertRaises(ValueError):
+                model.goto_ply(51)
+
+    def test_goto_ply_after_make_move(self):
+        model = ChessModel()
+        rng = random.Random(2)
+        fens = [model.to_fen()]
+        for _ in range(40):
+            model.make_move(rng.choice(model.legal_moves()))
+            fens.append(model.to_fen())
+        for ply in (3, 38, 20, 0, 40):
+            model.goto_ply(ply)
+            self.assertEqual(model.to_fen(), fens[ply])
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def test_store_and_probe(self):
+        table = TranspositionTable(100)
+        self.assertEqual(len(table), 64)
+        code = encode_move(Move(6, 4, 4, 4))
+        table.store(12345, 3, -MATE_SCORE + 4, BOUND_LOWER, code)
+        self.assertEqual(table.probe(12345), (3, -MATE_SCORE + 4, BOUND_LOWER, code))
+        self.assertIsNone(table.probe(12345 + 64))
+        self.assertEqual((table.probes, table.hits, table.hit_rate), (2, 1, 0.5))
+
+    def test_replacement_schemes(self):
+        first, second = 5, 5 + (1 << 20)
+        for replacement, kept in ((Replacement.Always, [None, 1]), (Replacement.Depth, [4, None]),
+                                  (Replacement.TwoTier, [4, 1])):
+            table = TranspositionTable(16, replacement)
+            table.store(first, 4, 10, BOUND_EXACT)
+            table.store(second, 1, 20, BOUND_EXACT)
+            self.assertEqual([None if entry is None else entry[0]
+                              for entry in (table.probe(first), table.probe(second))], kept)
+
+    def test_new_search_lets_shallow_entries_in(self):
+        table = TranspositionTable(16, Replacement.Depth)
+        table.store(5, 4, 10, BOUND_EXACT)
+        table.new_search()
+        table.store(5 + (1 << 20), 1, 20, BOUND_EXACT)
+        self.assertIsNone(table.probe(5))
+        self.assertEqual(table.overwrites, 1)
+
+    def test_search_scores_unchanged(self):
+        for fen in (STARTING_FEN, "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1",
+                    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3"):
+            model = ChessModel.from_fen(fen)
+            expected = Searcher(model).search(3)[1]
+            table = TranspositionTable(1 << 12)
+            searcher = Searcher(model, table)
+            for depth in (1, 2, 3):
+                score = searcher.search(depth)[1]
+            self.assertEqual(score, expected)
+            self.assertGreater(table.hits, 0)
+            self.assertEqual(model.to_fen(), ChessModel.from_fen(fen).to_fen())
+
+
+class TestMoveOrdering(unittest.TestCase):
+    def test_ordering_keeps_scores_and_saves_nodes(self):
+        for fen in (POSITIONS["middlegame"][0], POSITIONS["endgame"][0]):
+            unordered = Searcher(ChessModel.from_fen(fen), ordering=False, quiescence=False)
+            ordered = Searcher(ChessModel.from_fen(fen), quiescence=False)
+            self.assertEqual(unordered.search(3)[1], ordered.search(3)[1])
+            self.assertLess(ordered.nodes, unordered.nodes)
+
+    def test_winning_capture_searched_first(self):
+        # Taking the undefended rook first gives a bound that cuts the other root moves short
+        model = ChessModel.from_fen("4k3/8/8/3r4/8/8/3Q4/4K3 w - - 0 1")
+        ordered, unordered = Searcher(model), Searcher(model, ordering=False)
+        self.assertEqual(move_name(ordered.search(2)[0]), "d2d5")
+        unordered.search(2)
+        self.assertLess(ordered.nodes, unordered.nodes)
+
+
+class TestQuiescence(unittest.TestCase):
+    def test_static_exchange(self):
+        for bitboard in (False, True):
+            for fen, name, expected in (
+                    ("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1e5", 100),
+                    ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5", -220),
+                    ("4k3/3r4/8/3p4/8/8/3R4/3QK3 w - - 0 1", "d2d5", 100)):
+                model = ChessModel.from_fen(fen, bitboard)
+                code = next(code for code in model.generate_moves() if move_name(decode_move(code)) == name)
+                self.assertEqual(static_exchange(model.board, code), expected)
+
+    def test_defended_piece_not_taken_at_the_horizon(self):
+        # At depth 1 without quiescence the queen grabs the pawn defended by the other pawn
+        model = ChessModel.from_fen("4k3/8/2p5/3p4/8/8/3Q4/4K3 w - - 0 1")
+        self.assertEqual(move_name(Searcher(model, quiescence=False).search(1)[0]), "d2d5")
+        best_move, score = Searcher(model).search(1)
+        self.assertNotEqual(move_name(best_move), "d2d5")
+        self.assertGreater(score, 500)
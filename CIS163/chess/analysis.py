@@ -0,0 +1,94 @@
+"""Bulk position analysis, optionally spread over several worker processes.
+
+Each line of the input file holds one position in FEN. Run from this directory, for example:
+
+    python analysis.py positions.txt --depth 3 --workers 8
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, List, Tuple
+from chess_model import ChessModel
+from search import Searcher
+from move import move_name
+
+
+def analyze(snapshot: Tuple[bytes, int], depth: int, bitboard: bool = False) -> Dict:
+    """Analyzes one position.
+
+    Args:
+        snapshot (Tuple[bytes, int]): The position, as returned by ChessModel.snapshot.
+        depth (int): The search depth in plies.
+        bitboard (bool, optional): Whether to use the bitboard backend. Defaults to False.
+
+    Returns:
+        Dict: The number of legal moves, whether the player to move is in check, the best move
+            (None if there is none) with its score, and the number of positions searched.
+    """
+    model = ChessModel.from_snapshot(snapshot, bitboard)
+    searcher = Searcher(model)
+    best_move, score = searcher.search(depth)
+    return {
+        "legal_moves": len(model.legal_moves()),
+        "in_check": model.in_check(model.current_player),
+        "best_move": None if best_move is None else move_name(best_move),
+        "score": score,
+        "nodes": searcher.nodes,
+    }
+
+
+def analyze_positions(snapshots: Iterable[Tuple[bytes, int]], depth: int, workers: int = 1,
+                      bitboard: bool = False) -> List[Dict]:
+    """Analyzes many positions, spreading them over a process pool when more than one worker is asked for.
+
+    The results are the same, and in the same order, whatever the number of workers.
+
+    Args:
+        snapshots (Iterable[Tuple[bytes, int]]): The positions, as returned by ChessModel.snapshot.
+        depth (int): The search depth in plies.
+        workers (int, optional): The number of worker processes. Defaults to 1, which analyzes in
+            this process.
+        bitboard (bool, optional): Whether to use the bitboard backend. Defaults to False.
+
+    Returns:
+        List[Dict]: One result per position, as returned by analyze.
+    """
+    task = partial(analyze, depth=depth, bitboard=bitboard)
+    if workers <= 1:
+        return [task(snapshot) for snapshot in snapshots]
+    snapshots = list(snapshots)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(task, snapshots, chunksize=max(1, len(snapshots) // (workers * 4))))
+
+
+def read_positions(path: str) -> List[Tuple[bytes, int]]:
+    """Reads a file of positions, one FEN per line, into snapshots."""
+    snapshots = []
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                snapshots.append(ChessModel.from_fen(line).snapshot())
+    return snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a batch of chess positions.")
+    parser.add_argument("positions", help="file with one FEN per line")
+    parser.add_argument("--depth", type=int, default=2, help="search depth in plies")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--bitboard", action="store_true", help="use the bitboard backend")
+    args = parser.parse_args()
+
+    snapshots = read_positions(args.positions)
+    start = time.perf_counter()
+    results = analyze_positions(snapshots, args.depth, args.workers, args.bitboard)
+    seconds = time.perf_counter() - start
+    for number, result in enumerate(results, start=1):
+        print(f"{number}: best {result['best_move']} score {result['score']} "
+              f"moves {result['legal_moves']} check {result['in_check']} nodes {result['nodes']}")
+    print(f"{len(results)} positions in {seconds:.3f}s ({len(results) / max(seconds, 1e-9):.1f} positions/s)")
+
+
+if __name__ == "__main__":
+    main()
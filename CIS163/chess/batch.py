@@ -0,0 +1,151 @@
+"""Evaluation, attack maps and check detection for many positions at once, using NumPy.
+
+A batch of N positions is an (N, 64) int8 array with one row per position and one column per square
+(row * 8 + col). Each entry is 0 for an empty square or a piece code plus one, the same layout as the
+squares of ChessModel.snapshot. The player to move is given separately as an array of color indices
+(piece_codes.WHITE or BLACK). Requires NumPy, unlike the rest of the game.
+"""
+from typing import Iterable, List, Tuple
+import numpy as np
+from player import Player
+from piece_codes import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, COLOR_INDEX
+from evaluation import SQUARE_SCORES
+from geometry import KNIGHT_OFFSETS, KING_OFFSETS, ROOK_DIRECTIONS, BISHOP_DIRECTIONS
+
+# SCORE_TABLE[entry][square]: what a board entry on a square adds to white's score
+SCORE_TABLE = np.zeros((13, 64), dtype=np.int32)
+SCORE_TABLE[1:] = SQUARE_SCORES
+
+# Pawn captures as (row step, column step); white pawns capture towards row 0 and black pawns towards row 7
+PAWN_OFFSETS = (((-1, -1), (-1, 1)), ((1, -1), (1, 1)))
+
+
+def _column_mask(cols: range) -> np.uint64:
+    """The squares of some columns as a 64-bit mask, bit row * 8 + col for each square."""
+    return np.uint64(sum(1 << (row * 8 + col) for row in range(8) for col in cols))
+
+
+# What is left of a board shifted sideways by a number of columns: the columns it wrapped into are cleared
+KEEP_AFTER_COLUMN_STEP = {step: _column_mask(range(max(0, step), min(8, 8 + step))) for step in range(-2, 3)}
+
+
+def _move_bits(bits: np.ndarray, distance: int) -> np.ndarray:
+    """Moves every square of an array of 64-bit boards by a number of squares, without regard to columns."""
+    if distance >= 0:
+        return bits << np.uint64(distance)
+    return bits >> np.uint64(-distance)
+
+
+def _shift(bits: np.ndarray, offset: Tuple[int, int]) -> np.ndarray:
+    """Moves every square of an array of 64-bit boards by (row step, column step), dropping what falls off."""
+    return _move_bits(bits, offset[0] * 8 + offset[1]) & KEEP_AFTER_COLUMN_STEP[offset[1]]
+
+
+def _slide(sliders: np.ndarray, empty: np.ndarray, direction: Tuple[int, int]) -> np.ndarray:
+    """Finds the squares sliding pieces attack along one direction, stopping at the first piece.
+
+    The rays are filled in three doubling steps (a Kogge-Stone fill), whatever the length of the ray.
+    Clearing the wrapped column from `empty` once is enough to keep every step from wrapping.
+    """
+    distance = direction[0] * 8 + direction[1]
+    empty = empty & KEEP_AFTER_COLUMN_STEP[direction[1]]
+    filled = sliders
+    for steps in (1, 2, 4):
+        filled = filled | (empty & _move_bits(filled, distance * steps))
+        empty = empty & _move_bits(empty, distance * steps)
+    return _shift(filled, direction)
+
+
+def _piece_bits(boards: np.ndarray) -> np.ndarray:
+    """Turns (N, 64) boards into an (N, 13) array of 64-bit boards, one per entry value."""
+    bits = np.zeros((boards.shape[0], 13), dtype=np.uint64)
+    for entry in range(1, 13):
+        packed = np.packbits(boards == entry, axis=1, bitorder="little")
+        bits[:, entry] = packed.view("<u8").ravel()
+    return bits
+
+
+def _attack_bits(boards: np.ndarray) -> np.ndarray:
+    """Finds the squares each color attacks, as an (N, 2) array of 64-bit boards."""
+    pieces = _piece_bits(boards)
+    empty = np.packbits(boards == 0, axis=1, bitorder="little").view("<u8").ravel()
+    attacks = np.zeros((boards.shape[0], 2), dtype=np.uint64)
+    for color in (WHITE, BLACK):
+        base = color * 6 + 1
+        found = np.zeros(boards.shape[0], dtype=np.uint64)
+        for kind, offsets in ((PAWN, PAWN_OFFSETS[color]), (KNIGHT, KNIGHT_OFFSETS), (KING, KING_OFFSETS)):
+            for offset in offsets:
+                found |= _shift(pieces[:, base + kind], offset)
+        queens = pieces[:, base + QUEEN]
+        for directions, kind in ((ROOK_DIRECTIONS, ROOK), (BISHOP_DIRECTIONS, BISHOP)):
+            sliders = queens | pieces[:, base + kind]
+            for direction in directions:
+                found |= _slide(sliders, empty, direction)
+        attacks[:, color] = found
+    return attacks
+
+
+def positions_array(snapshots: Iterable[Tuple[bytes, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Packs positions into a batch.
+
+    Args:
+        snapshots (Iterable[Tuple[bytes, int]]): The positions, as returned by ChessModel.snapshot.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The (N, 64) int8 boards and the (N,) int8 colors to move.
+    """
+    squares: List[bytes] = []
+    colors: List[int] = []
+    for board, player in snapshots:
+        squares.append(board)
+        colors.append(COLOR_INDEX[Player(player)])
+    boards = np.frombuffer(b"".join(squares), dtype=np.int8).reshape(len(squares), 64)
+    return boards, np.array(colors, dtype=np.int8)
+
+
+def evaluate_batch(boards: np.ndarray, colors: np.ndarray = None) -> np.ndarray:
+    """Scores positions by material and piece placement, like evaluation.evaluate.
+
+    Args:
+        boards (np.ndarray): The (N, 64) int8 boards.
+        colors (np.ndarray, optional): The (N,) colors whose point of view each score is given from.
+            Defaults to white for every position.
+
+    Returns:
+        np.ndarray: The (N,) int32 scores in centipawns.
+    """
+    scores = SCORE_TABLE[boards.astype(np.intp), np.arange(64)].sum(axis=1, dtype=np.int32)
+    if colors is None:
+        return scores
+    return np.where(np.asarray(colors) == BLACK, -scores, scores)
+
+
+def attack_maps(boards: np.ndarray) -> np.ndarray:
+    """Finds the squares each color attacks in every position.
+
+    Args:
+        boards (np.ndarray): The (N, 64) int8 boards.
+
+    Returns:
+        np.ndarray: An (N, 2, 64) bool array; [n, color, square] is True if a piece of that color
+            attacks the square in position n.
+    """
+    attacks = _attack_bits(boards)
+    squares = np.unpackbits(attacks.astype("<u8").view(np.uint8).reshape(-1, 2, 8), axis=2, bitorder="little")
+    return squares.astype(bool)
+
+
+def in_check_batch(boards: np.ndarray, colors: np.ndarray) -> np.ndarray:
+    """Finds the positions whose player to move is in check.
+
+    Args:
+        boards (np.ndarray): The (N, 64) int8 boards.
+        colors (np.ndarray): The (N,) colors to move.
+
+    Returns:
+        np.ndarray: The (N,) bool flags. A player without a king is never in check.
+    """
+    colors = np.asarray(colors, dtype=np.intp)
+    rows = np.arange(boards.shape[0])
+    kings = _piece_bits(boards)[rows, colors * 6 + KING + 1]
+    return (kings & _attack_bits(boards)[rows, 1 - colors]) != 0
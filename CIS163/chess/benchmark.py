@@ -0,0 +1,196 @@
+"""Measures the memory a game takes, to keep an eye on hosting many games in one process, and how
+many positions the search visits to reach a depth.
+
+Reports the size of a move and a piece with __slots__ and as they would be with attribute
+dictionaries, the bytes the pieces of a board take shared and with one object per square, the bytes
+one game holds on to when it is set up and after some plies, what each ply of move history costs
+next to a copy of the board, the bytes a legal move list takes, and how many piece objects each game
+allocates rather than sharing. With --search it instead searches the perft set positions to each
+depth with and without move ordering and quiescence search. Run from this directory, for example:
+
+    python benchmark.py --games 200 --plies 40
+    python benchmark.py --bitboard
+    python benchmark.py --search 4
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+from chess_model import ChessModel
+from move import Move
+from perft import POSITIONS
+from piece_codes import PIECES
+from queen import Queen
+from search import Searcher
+from transposition import TranspositionTable
+
+
+class Unslotted:
+    """A copy of a slotted object's attributes held in an instance dictionary, the way the same class
+    would store them without __slots__."""
+
+    def __init__(self, instance: object):
+        """Copies the attributes of every __slots__ entry up the instance's class hierarchy.
+
+        Args:
+            instance (object): The slotted object to copy.
+        """
+        for cls in type(instance).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if name.startswith("__"):
+                    name = f"_{cls.__name__.lstrip('_')}{name}"
+                setattr(self, name, getattr(instance, name))
+
+
+def board_pieces(rows: List[List[object]], shared: bool = True, slots: bool = True) -> List[List[object]]:
+    """Copies the pieces of a board, as the same shared instances or as one new object per square.
+
+    Args:
+        rows (List[List[object]]): The board to copy, for example ChessModel().board.
+        shared (bool, optional): Use the shared instances. Defaults to True.
+        slots (bool, optional): For new objects, keep __slots__ rather than copying each piece to an
+            Unslotted object. Defaults to True.
+
+    Returns:
+        List[List[object]]: The board's rows.
+    """
+    if shared:
+        return [row[:] for row in rows]
+    if slots:
+        return [[None if piece is None else type(piece)(piece.player) for piece in row] for row in rows]
+    return [[None if piece is None else Unslotted(type(piece)(piece.player)) for piece in row] for row in rows]
+
+
+def retained_bytes(make: Callable[[], object], count: int) -> float:
+    """Measures the memory kept alive by objects, on average.
+
+    Args:
+        make (Callable[[], object]): Makes one object.
+        count (int): The number of objects to make and keep.
+
+    Returns:
+        float: The bytes traced per object.
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [make() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    if not was_tracing:
+        tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+
+def play_random(model: ChessModel, plies: int, rng: random.Random) -> ChessModel:
+    """Plays random legal moves as a game would, with checkpoints, stopping early if the game ends.
+
+    Args:
+        model (ChessModel): The game to play in.
+        plies (int): The number of moves to make.
+        rng (random.Random): The source of the moves picked.
+
+    Returns:
+        ChessModel: The same game, for convenience.
+    """
+    for _ in range(plies):
+        moves = model.legal_moves()
+        if not moves:
+            break
+        model.move(rng.choice(moves))
+    return model
+
+
+def allocated_pieces(models: List[ChessModel]) -> int:
+    """Counts the distinct piece objects on some boards that are not the shared instances."""
+    shared = {id(piece) for piece in PIECES}
+    found = set()
+    for model in models:
+        for row in range(8):
+            for col in range(8):
+                piece = model.board[row][col]
+                if piece is not None and id(piece) not in shared:
+                    found.add(id(piece))
+    return len(found)
+
+
+def search_nodes(fen: str, depth: int, ordering: bool, quiescence: bool,
+                 bitboard: bool = False) -> Tuple[int, float]:
+    """Searches a position with iterative deepening and a transposition table, as ChessAi does.
+
+    Args:
+        fen (str): The position.
+        depth (int): The last depth to search to.
+        ordering (bool): Whether the searcher orders its moves.
+        quiescence (bool): Whether the searcher plays out captures past the depth.
+        bitboard (bool, optional): Whether to use the bitboard backend. Defaults to False.
+
+    Returns:
+        Tuple[int, float]: The positions visited over all depths, and the seconds taken.
+    """
+    searcher = Searcher(ChessModel.from_fen(fen, bitboard), TranspositionTable(), ordering, quiescence)
+    nodes, start = 0, time.perf_counter()
+    for iteration in range(1, depth + 1):
+        searcher.search(iteration)
+        nodes += searcher.nodes
+    return nodes, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory used per game.")
+    parser.add_argument("--games", type=int, default=200, help="number of games to measure over")
+    parser.add_argument("--plies", type=int, default=40, help="random moves to play in each game")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the random moves")
+    parser.add_argument("--bitboard", action="store_true", help="use the bitboard backend")
+    parser.add_argument("--search", type=int, metavar="DEPTH",
+                        help="count the positions searched to each depth up to DEPTH instead")
+    args = parser.parse_args()
+
+    if args.search:
+        settings = (("unordered", False, False), ("ordered", True, False), ("quiescence", True, True))
+        for depth in range(1, args.search + 1):
+            for name, ordering, quiescence in settings:
+                results = [search_nodes(fen, depth, ordering, quiescence, args.bitboard)
+                           for fen, _ in POSITIONS.values()]
+                nodes = sum(result[0] for result in results)
+                seconds = sum(result[1] for result in results)
+                print(f"depth {depth} {name:>10}: {nodes:>9} nodes  {seconds:8.3f}s")
+        return
+
+    # Retained rather than instance sizes, since asking for an object's __dict__ makes it bigger
+    piece = ChessModel().board[7][3]
+    print(f"move:  {retained_bytes(lambda: Move(6, 4, 4, 4), args.games):4.0f} bytes, "
+          f"{retained_bytes(lambda: Unslotted(Move(6, 4, 4, 4)), args.games):4.0f} bytes without __slots__")
+    print(f"piece: {retained_bytes(lambda: Queen(piece.player), args.games):4.0f} bytes, "
+          f"{retained_bytes(lambda: Unslotted(Queen(piece.player)), args.games):4.0f} bytes without __slots__")
+    rows = ChessModel().board
+    empty = retained_bytes(lambda: [[None] * 8 for _ in range(8)], args.games)
+    for name, shared, slots in (("shared", True, True), ("one per square", False, True),
+                                ("one per square, no __slots__", False, False)):
+        pieces = retained_bytes(lambda: board_pieces(rows, shared, slots), args.games) - empty
+        print(f"pieces of a board, {name + ':':<30}{max(pieces, 0):6.0f} bytes")
+
+    start = time.perf_counter()
+    models = [ChessModel(args.bitboard) for _ in range(args.games)]
+    seconds = time.perf_counter() - start
+    print(f"set up {args.games} games in {seconds:.3f}s ({seconds / args.games * 1e6:.1f} us per game), "
+          f"{allocated_pieces(models) / args.games:.1f} unshared pieces per game")
+    del models
+
+    new_game = retained_bytes(lambda: ChessModel(args.bitboard), args.games)
+    print(f"new game:            {new_game:9.0f} bytes")
+    rng = random.Random(args.seed)
+    played = retained_bytes(lambda: play_random(ChessModel(args.bitboard), args.plies, rng), args.games)
+    print(f"after {args.plies:>3} plies:     {played:9.0f} bytes")
+    board = ChessModel().board
+    copied = retained_bytes(lambda: [row[:] for row in board], args.games)
+    print(f"history per ply:      {(played - new_game) / args.plies:8.0f} bytes "
+          f"(a copy of the board: {copied:.0f} bytes)")
+    model = ChessModel(args.bitboard)
+    print(f"start position moves: {retained_bytes(model.legal_moves, args.games):8.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
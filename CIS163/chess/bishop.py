@@ -1,7 +1,8 @@
 from chess_piece import ChessPiece
 from move import Move
-from typing import List
+from typing import Iterator, List, Tuple
 from player import Player
+from geometry import BISHOP_PATHS, BISHOP_RAYS
 
 
 class Bishop(ChessPiece):
@@ -9,6 +10,8 @@ class Bishop(ChessPiece):
 
     Inherits from ChessPiece and implements specific move validation logic for a bishop.
     """
+    __slots__ = ()
+
     def __str__(self) -> str:
         """Returns a string representation of the bishop.
 
@@ -40,39 +43,20 @@ class Bishop(ChessPiece):
 
         if not super().is_valid_move(move, board):
             return False
-        
-        # If the bishop is moving diagonally
-        if abs(move.from_row - move.to_row) == abs(move.from_col - move.to_col):
-            # If the bishop is moving to the upper right
-            if move.from_row > move.to_row and move.from_col < move.to_col:
-                # If the path is clear and the destination is empty or occupied by the other player
-                if board[move.to_row][move.to_col] is None or board[move.to_row][move.to_col].player != self.player:
-                    for i in range(1, abs(move.from_row - move.to_row)):
-                        if board[move.from_row - i][move.from_col + i] is not None:
-                            return False
-                    return True
-            # If the bishop is moving to the upper left
-            if move.from_row > move.to_row and move.from_col > move.to_col:
-                # If the path is clear and the destination is empty or occupied by the other player
-                if board[move.to_row][move.to_col] is None or board[move.to_row][move.to_col].player != self.player:
-                    for i in range(1, abs(move.from_row - move.to_row)):
-                        if board[move.from_row - i][move.from_col - i] is not None:
-                            return False
-                    return True
-            # If the bishop is moving to the lower right
-            if move.from_row < move.to_row and move.from_col < move.to_col:
-                # If the path is clear and the destination is empty or occupied by the other player
-                if board[move.to_row][move.to_col] is None or board[move.to_row][move.to_col].player != self.player:
-                    for i in range(1, abs(move.from_row - move.to_row)):
-                        if board[move.from_row + i][move.from_col + i] is not None:
-                            return False
-                    return True
-            # If the bishop is moving to the lower left
-            if move.from_row < move.to_row and move.from_col > move.to_col:
-                # If the path is clear and the destination is empty or occupied by the other player
-                if board[move.to_row][move.to_col] is None or board[move.to_row][move.to_col].player != self.player:
-                    for i in range(1, abs(move.from_row - move.to_row)):
-                        if board[move.from_row + i][move.from_col - i] is not None:
-                            return False
-                    return True
-        return False
\ No newline at end of file
+
+        # The move must follow one of the bishop's directions over empty squares; the destination is
+        # already known to be empty or occupied by the other player
+        return self._path_is_clear(move, board, BISHOP_PATHS)
+
+    def reachable_squares(self, row: int, col: int, board: List[List["ChessPiece"]]) -> Iterator[Tuple[int, int]]:
+        """Generates the squares the bishop can reach along its diagonals.
+
+        Args:
+            row (int): The row the bishop is standing on.
+            col (int): The column the bishop is standing on.
+            board (List[List["ChessPiece"]]): The current state of the chess board.
+
+        Yields:
+            Tuple[int, int]: The (row, col) of each reachable square.
+        """
+        return self._slide(row, col, board, BISHOP_RAYS)
@@ -0,0 +1,290 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from player import Player
+from chess_piece import ChessPiece
+from geometry import KNIGHT_TARGETS, KING_TARGETS, RAYS, BETWEEN
+from piece_codes import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, COLOR_INDEX, PIECES, piece_code
+
+# Squares are numbered row * 8 + col, so bit 0 is the top left corner (row 0, col 0)
+# and bit 63 is the bottom right corner (row 7, col 7).
+
+
+def _masks(squares: Iterable[Tuple[Tuple[int, int], ...]]) -> List[int]:
+    """Turns a geometry table of (row, col) squares per square into a bit mask per square."""
+    return [sum(1 << (row * 8 + col) for row, col in listed) for listed in squares]
+
+
+KNIGHT_ATTACKS = _masks(KNIGHT_TARGETS)
+KING_ATTACKS = _masks(KING_TARGETS)
+# White pawns capture towards row 0 and black pawns towards row 7
+PAWN_ATTACKS = (_masks(RAYS[-1, -1][square][:1] + RAYS[-1, 1][square][:1] for square in range(64)),
+                _masks(RAYS[1, -1][square][:1] + RAYS[1, 1][square][:1] for square in range(64)))
+
+# Rays that run towards higher square numbers stop at their lowest blocker, the others at their highest
+POSITIVE_ROOK_RAYS = (_masks(RAYS[1, 0]), _masks(RAYS[0, 1]))
+NEGATIVE_ROOK_RAYS = (_masks(RAYS[-1, 0]), _masks(RAYS[0, -1]))
+POSITIVE_BISHOP_RAYS = (_masks(RAYS[1, 1]), _masks(RAYS[1, -1]))
+NEGATIVE_BISHOP_RAYS = (_masks(RAYS[-1, -1]), _masks(RAYS[-1, 1]))
+
+
+# BETWEEN_MASKS[a][b]: the squares strictly between two squares on a line, 0 if they do not share one
+BETWEEN_MASKS = [_masks(BETWEEN[square]) for square in range(64)]
+
+
+def _slider_attacks(square: int, occupied: int, positive_rays, negative_rays) -> int:
+    """Computes the squares a sliding piece attacks, stopping each ray at its first blocker."""
+    attacks = 0
+    for rays in positive_rays:
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in negative_rays:
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    """int: The squares a rook on the given square attacks with the given occupancy."""
+    return _slider_attacks(square, occupied, POSITIVE_ROOK_RAYS, NEGATIVE_ROOK_RAYS)
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    """int: The squares a bishop on the given square attacks with the given occupancy."""
+    return _slider_attacks(square, occupied, POSITIVE_BISHOP_RAYS, NEGATIVE_BISHOP_RAYS)
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Yields the square number of every set bit in a mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitboardRow:
+    """A view of one row of a BitboardBoard that reads and writes like a list of pieces."""
+
+    def __init__(self, bitboard: "BitboardBoard", row: int):
+        self.__bitboard = bitboard
+        self.__first = row * 8
+
+    def __len__(self) -> int:
+        return 8
+
+    def __col(self, col: int) -> int:
+        if col < 0:
+            col += 8
+        if not 0 <= col < 8:
+            raise IndexError("Column out of range.")
+        return col
+
+    def __getitem__(self, col):
+        if isinstance(col, slice):
+            return [self[c] for c in range(8)[col]]
+        return self.__bitboard.piece_on(self.__first + self.__col(col))
+
+    def __setitem__(self, col: int, piece: Optional[ChessPiece]):
+        self.__bitboard.place(self.__first + self.__col(col), piece)
+
+    def __iter__(self) -> Iterator[Optional[ChessPiece]]:
+        for col in range(8):
+            yield self.__bitboard.piece_on(self.__first + col)
+
+
+class BitboardBoard:
+    """Holds a chess position as twelve 64-bit piece sets plus occupancy masks.
+
+    The board can be indexed like the list-of-lists board (`board[row][col]`), so piece classes
+    and the GUI keep working unchanged, while rule checks use the piece sets directly.
+
+    Attributes:
+        pieces (list): One bit set per piece code (see piece_codes), 12 in total.
+        occupancy (list): The squares occupied by white and by black pieces.
+        occupied (int): The squares occupied by any piece.
+        squares (list): The piece code on each of the 64 squares, or None if empty.
+    """
+
+    def __init__(self):
+        """Initializes an empty board."""
+        self.pieces = [0] * 12
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        self.squares = [None] * 64
+        self.__rows = [BitboardRow(self, row) for row in range(8)]
+
+    def __len__(self) -> int:
+        return 8
+
+    def __getitem__(self, row: int) -> BitboardRow:
+        return self.__rows[row]
+
+    def __iter__(self) -> Iterator[BitboardRow]:
+        return iter(self.__rows)
+
+    def piece_on(self, square: int) -> Optional[ChessPiece]:
+        """Returns the (shared) piece on a square, or None if it is empty."""
+        code = self.squares[square]
+        return None if code is None else PIECES[code]
+
+    def place(self, square: int, piece: Optional[ChessPiece]):
+        """Puts a piece on a square, replacing whatever was there. None empties the square."""
+        self.place_code(square, None if piece is None else piece_code(piece))
+
+    def place_code(self, square: int, code: Optional[int]):
+        """Puts the piece with a given code on a square, replacing whatever was there. None empties the square."""
+        bit = 1 << square
+        old = self.squares[square]
+        if old is not None:
+            self.pieces[old] ^= bit
+            self.occupancy[old // 6] ^= bit
+            self.occupied ^= bit
+        if code is not None:
+            self.pieces[code] |= bit
+            self.occupancy[code // 6] |= bit
+            self.occupied |= bit
+        self.squares[square] = code
+
+    def attackers(self, square: int, color: int, occupied: Optional[int] = None) -> int:
+        """Finds the pieces of one color that attack a square.
+
+        Args:
+            square (int): The square being attacked.
+            color (int): The color index (piece_codes.WHITE or BLACK) of the attackers.
+            occupied (int, optional): The occupancy to use for sliding pieces. Defaults to the board's.
+
+        Returns:
+            int: The mask of attacking pieces.
+        """
+        if occupied is None:
+            occupied = self.occupied
+        pieces = self.pieces
+        base = color * 6
+        # A pawn of this color attacks the square from where a pawn of the other color would capture
+        found = PAWN_ATTACKS[1 - color][square] & pieces[base + PAWN]
+        found |= KNIGHT_ATTACKS[square] & pieces[base + KNIGHT]
+        found |= KING_ATTACKS[square] & pieces[base + KING]
+        queens = pieces[base + QUEEN]
+        straight = queens | pieces[base + ROOK]
+        if straight:
+            found |= rook_attacks(square, occupied) & straight
+        diagonal = queens | pieces[base + BISHOP]
+        if diagonal:
+            found |= bishop_attacks(square, occupied) & diagonal
+        return found
+
+    def in_check(self, player: Player) -> bool:
+        """Determines if a player's king is attacked. A player without a king is never in check."""
+        color = COLOR_INDEX[player]
+        kings = self.pieces[color * 6 + KING]
+        if not kings:
+            return False
+        return self.attackers((kings & -kings).bit_length() - 1, 1 - color) != 0
+
+    def targets(self, square: int) -> int:
+        """Computes the squares the piece on a square may move to, ignoring checks.
+
+        Returns:
+            int: The mask of destination squares, 0 if the square is empty.
+        """
+        code = self.squares[square]
+        if code is None:
+            return 0
+        color, kind = divmod(code, 6)
+        own = self.occupancy[color]
+        if kind == PAWN:
+            empty = ~self.occupied
+            if color == WHITE:
+                step, start_row = -8, 6
+            else:
+                step, start_row = 8, 1
+            found = PAWN_ATTACKS[color][square] & self.occupancy[1 - color]
+            ahead = square + step
+            if 0 <= ahead < 64 and empty >> ahead & 1:
+                found |= 1 << ahead
+                if square // 8 == start_row and empty >> (ahead + step) & 1:
+                    found |= 1 << (ahead + step)
+            return found
+        if kind == KNIGHT:
+            found = KNIGHT_ATTACKS[square]
+        elif kind == KING:
+            found = KING_ATTACKS[square]
+        elif kind == ROOK:
+            found = rook_attacks(square, self.occupied)
+        elif kind == BISHOP:
+            found = bishop_attacks(square, self.occupied)
+        else:
+            found = rook_attacks(square, self.occupied) | bishop_attacks(square, self.occupied)
+        return found & ~own
+
+    def checks_and_pins(self, color: int) -> Tuple[int, Dict[int, int]]:
+        """Finds the pieces checking a color's king and that color's pinned pieces.
+
+        Args:
+            color (int): The color index (piece_codes.WHITE or BLACK) of the king.
+
+        Returns:
+            Tuple[int, Dict[int, int]]: The mask of checking pieces, and for each pinned piece's
+                square the mask of squares it may move to along its pin. Both are empty without a king.
+        """
+        kings = self.pieces[color * 6 + KING]
+        if not kings:
+            return 0, {}
+        king = (kings & -kings).bit_length() - 1
+        enemy = 1 - color
+        pins = {}
+        # Looking from the king through the color's own pieces, any enemy slider on a line with
+        # exactly one piece in between pins it
+        base = enemy * 6
+        queens = self.pieces[base + QUEEN]
+        for sliders, slider_attacks in ((queens | self.pieces[base + ROOK], rook_attacks),
+                                        (queens | self.pieces[base + BISHOP], bishop_attacks)):
+            if not sliders:
+                continue
+            for pinner in iter_bits(slider_attacks(king, self.occupancy[enemy]) & sliders):
+                between = BETWEEN_MASKS[king][pinner] & self.occupied
+                if between and not between & (between - 1):
+                    pins[between.bit_length() - 1] = BETWEEN_MASKS[king][pinner] | 1 << pinner
+        return self.attackers(king, enemy), pins
+
+    def iter_legal_moves(self, player: Player) -> Iterator[Tuple[int, int]]:
+        """Generates the (from_square, to_square) pairs of every legal move for a player.
+
+        Moves are kept or dropped using the checks and pins of the position (see checks_and_pins),
+        so only king steps need an attack test.
+        """
+        color = COLOR_INDEX[player]
+        own = self.occupancy[color]
+        kings = self.pieces[color * 6 + KING]
+        if not kings:
+            for from_square in iter_bits(own):
+                for to_square in iter_bits(self.targets(from_square)):
+                    yield from_square, to_square
+            return
+        king = (kings & -kings).bit_length() - 1
+        checkers, pins = self.checks_and_pins(color)
+
+        # Under check the other pieces must capture the checker or step in between; under double
+        # check only the king can move
+        if not checkers:
+            evasions = ~0
+        elif checkers & (checkers - 1):
+            evasions = 0
+        else:
+            evasions = BETWEEN_MASKS[king][checkers.bit_length() - 1] | checkers
+
+        # The king's square is left out of the occupancy so sliding pieces see through it
+        without_king = self.occupied ^ 1 << king
+        for from_square in iter_bits(own):
+            if from_square == king:
+                for to_square in iter_bits(self.targets(king)):
+                    if not self.attackers(to_square, 1 - color, without_king):
+                        yield king, to_square
+                continue
+            allowed = self.targets(from_square) & evasions & pins.get(from_square, ~0)
+            for to_square in iter_bits(allowed):
+                yield from_square, to_square
@@ -0,0 +1,201 @@
+"""Opening books: the moves played from each early position of a collection of games.
+
+A book file is a sorted array of fixed-size entries, one per (position hash, move) pair, each holding
+the position's Zobrist hash, the packed move (see move.encode_move) and how often it was played.
+Looking a position up is a binary search over the memory-mapped file, so opening a book reads
+nothing until the first lookup.
+
+Build a book from PGN files or binary game databases (see gamedb.py), for example:
+
+    python book.py opening.book games.pgn more.cgdb --plies 16 --min-count 2
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from chess_model import ChessModel, STARTING_FEN
+from move import Move, encode_move, decode_move
+from gamedb import GameDatabase
+from pgn import read_games, san_to_move
+
+# Position hash, packed move and weight
+ENTRY = struct.Struct("<QHH")
+MAX_WEIGHT = 0xFFFF
+
+
+def count_moves(games: Iterable[Iterable[Move]], plies: int = 16,
+                counts: Optional[Dict[Tuple[int, int], int]] = None) -> Dict[Tuple[int, int], int]:
+    """Counts how often each move was played from each position in the first plies of some games.
+
+    Args:
+        games (Iterable[Iterable[Move]]): The games, each a series of legal moves from the standard
+            starting position.
+        plies (int, optional): The number of moves of each game to count. Defaults to 16.
+        counts (Dict[Tuple[int, int], int], optional): Counts to add to. Defaults to new counts.
+
+    Returns:
+        Dict[Tuple[int, int], int]: The number of times each move was played, keyed by
+            (position hash, packed move).
+    """
+    counts = {} if counts is None else counts
+    model = ChessModel()
+    for moves in games:
+        played = 0
+        for move in moves:
+            if played == plies:
+                break
+            key = (model.position_hash, encode_move(move))
+            counts[key] = counts.get(key, 0) + 1
+            model.make_move(move)
+            played += 1
+        for _ in range(played):
+            model.unmake_move()
+    return counts
+
+
+def write_book(path: str, counts: Dict[Tuple[int, int], int], min_count: int = 1) -> int:
+    """Writes move counts to a book file.
+
+    Args:
+        path (str): The book file.
+        counts (Dict[Tuple[int, int], int]): The counts, as returned by count_moves.
+        min_count (int, optional): Moves played fewer times than this are left out. Defaults to 1.
+
+    Returns:
+        int: The number of entries written.
+    """
+    entries = sorted((key, count) for key, count in counts.items() if count >= min_count)
+    with open(path, "wb") as file:
+        for (position_hash, code), count in entries:
+            file.write(ENTRY.pack(position_hash, code, min(count, MAX_WEIGHT)))
+    return len(entries)
+
+
+class OpeningBook:
+    """A book file opened for lookups.
+
+    Attributes:
+        path (str): The book file.
+    """
+
+    def __init__(self, path: str):
+        """Opens a book file.
+
+        Args:
+            path (str): The book file, as written by write_book.
+        """
+        self.path = path
+        self.__size = os.path.getsize(path) // ENTRY.size
+        self.__map = None
+        if self.__size:
+            with open(path, "rb") as file:
+                self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def close(self):
+        """Closes the book file."""
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+
+    def lookup(self, position_hash: int) -> List[Tuple[Move, int]]:
+        """Finds the book moves of a position.
+
+        Args:
+            position_hash (int): The position's hash, see ChessModel.position_hash.
+
+        Returns:
+            List[Tuple[Move, int]]: Each book move with its weight; empty if the position is not in the book.
+        """
+        if self.__map is None:
+            return []
+        data = self.__map
+
+        # Find the first entry for the position
+        low, high = 0, self.__size
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from("<Q", data, middle * ENTRY.size)[0] < position_hash:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        for index in range(low, self.__size):
+            entry_hash, code, weight = ENTRY.unpack_from(data, index * ENTRY.size)
+            if entry_hash != position_hash:
+                break
+            moves.append((decode_move(code), weight))
+        return moves
+
+    def choose(self, model: ChessModel, best: bool = False) -> Optional[Move]:
+        """Picks a book move for the player to move.
+
+        Args:
+            model (ChessModel): The game to pick a move in.
+            best (bool, optional): Whether to always pick the most played move. Defaults to False,
+                which picks at random in proportion to how often each move was played.
+
+        Returns:
+            Optional[Move]: A legal book move, or None if the position is not in the book.
+        """
+        entries = self.lookup(model.position_hash)
+        while entries:
+            if best:
+                entry = max(entries, key=lambda entry: entry[1])
+            else:
+                entry = random.choices(entries, [weight for _, weight in entries])[0]
+            # Different positions can share a hash, so only the picked move is checked for legality
+            if model.is_valid_move(entry[0]):
+                return entry[0]
+            entries.remove(entry)
+        return None
+
+
+def _games_from_file(path: str) -> Iterable[List[Move]]:
+    """Reads the games that start from the standard position out of a PGN file or game database."""
+    if path.endswith(".pgn"):
+        with open(path) as file:
+            for game in read_games(file):
+                if game.fen != STARTING_FEN:
+                    continue
+                model, moves = ChessModel(), []
+                try:
+                    for san in game.moves:
+                        move = san_to_move(model, san)
+                        model.make_move(move)
+                        moves.append(move)
+                except ValueError:
+                    # Keep the moves before the first one these rules do not allow
+                    pass
+                yield moves
+    else:
+        with GameDatabase(path) as database:
+            for game in database:
+                if game.start is None:
+                    yield game.moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an opening book from game collections.")
+    parser.add_argument("book", help="book file to write")
+    parser.add_argument("games", nargs="+", help="PGN files (.pgn) or binary game databases")
+    parser.add_argument("--plies", type=int, default=16, help="number of moves of each game to count")
+    parser.add_argument("--min-count", type=int, default=1, help="leave out moves played fewer times")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = {}
+    for path in args.games:
+        count_moves(_games_from_file(path), args.plies, counts)
+    entries = write_book(args.book, counts, args.min_count)
+    print(f"{entries} entries written in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
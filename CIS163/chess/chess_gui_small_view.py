@@ -1,12 +1,16 @@
 import copy
+import os
 from enum import Enum
 import pygame as pg
 import pygame_gui as gui
 from chess_model import ChessModel, MoveValidity, UndoException, ChessAi
+from book import OpeningBook
 from move import Move
 from player import Player
 
 IMAGE_SIZE = 52  # small format - images 52 X 52
+AI_TIME_BUDGET_MS = 500  # time the computer may think about each move
+OPENING_BOOK_PATH = "opening.book"  # used by the computer if it exists, see book.py
 
 
 class SpriteType(Enum):
@@ -29,7 +33,8 @@ class GUI:
     def __init__(self) -> None:
         pg.init()
         self.__model = ChessModel()
-        self.chess_ai = ChessAi(self.__model)
+        self._book = OpeningBook(OPENING_BOOK_PATH) if os.path.exists(OPENING_BOOK_PATH) else None
+        self.chess_ai = ChessAi(self.__model, time_budget_ms=AI_TIME_BUDGET_MS, book=self._book)
         self._screen = pg.display.set_mode((800, 600))
         pg.display.set_caption("Laker Chess")
         self._ui_manager = gui.UIManager((800, 600))
@@ -51,6 +56,7 @@ class GUI:
         self._piece_selected = False
         self._first_selected = (0, 0)
         self._second_selected = (0, 0)
+        self._legal_targets = []
 
     @classmethod
     def load_images(cls):
@@ -93,6 +99,11 @@ class GUI:
                             self._piece_selected = True
                             self._first_selected = y, x
                             self._piece_selected = piece
+                            self._legal_targets = [
+                                (mv.to_row, mv.to_col)
+                                for mv in self.__model.iter_legal_moves()
+                                if (mv.from_row, mv.from_col) == (y, x)
+                            ]
                     elif self._piece_selected:
                         mv = Move(
                             self._first_selected[0], self._first_selected[1], y, x
@@ -125,14 +136,16 @@ class GUI:
                                 )
 
                         self._piece_selected = False
+                        self._legal_targets = []
                     else:
                         self._piece_selected = False
+                        self._legal_targets = []
                     # if self.__model.current_player == self.chess_ai.model.player:
                     #     self.chess_ai.make_move()
                 if event.type == gui.UI_BUTTON_PRESSED:
                     if event.ui_element == self._restart_button:
                         self.__model = ChessModel()
-                        self.chess_ai = ChessAi(self.__model)
+                        self.chess_ai = ChessAi(self.__model, time_budget_ms=AI_TIME_BUDGET_MS, book=self._book)
                         self._side_box.set_text("Restarting game...<br />")
                     if event.ui_element == self._undo_button:
                         try:
@@ -182,6 +195,15 @@ class GUI:
                         ),
                         2,
                     )
+                if self._piece_selected and (y, x) in self._legal_targets:
+                    pg.draw.rect(
+                        self._screen,
+                        (0, 160, 0),
+                        pg.rect.Rect(
+                            x * IMAGE_SIZE, y * IMAGE_SIZE, IMAGE_SIZE, IMAGE_SIZE
+                        ),
+                        2,
+                    )
                 draw_piece = self.__model.piece_at(y, x)
                 if draw_piece is not None:
                     if draw_piece.player == Player.BLACK:
@@ -1,7 +1,8 @@
 from enum import Enum
 import random
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
 from player import Player
-from move import Move
+from move import Move, MoveList, MOVE_CAPTURE, MOVE_PROMOTION, MOVE_SQUARES, encode_move, decode_move
 from chess_piece import ChessPiece
 from pawn import Pawn
 from rook import Rook
@@ -9,8 +10,32 @@ from knight import Knight
 from bishop import Bishop
 from queen import Queen
 from king import King
+from geometry import KNIGHT_TARGETS, KING_TARGETS, ROOK_RAYS, BISHOP_RAYS, BETWEEN
+from bitboard import BitboardBoard, iter_bits
+from piece_codes import COLOR_INDEX, PIECES, PAWN as PAWN_CODE, KING as KING_CODE, piece_code, shared_piece
+from zobrist import PIECE_KEYS, BLACK_TO_MOVE_KEY, hash_board
+from search import Searcher
+from transposition import TranspositionTable
 
 
+# The standard starting position in Forsyth-Edwards Notation
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# The piece code for each FEN letter: upper case for white and lower case for black
+FEN_CODES = {str(piece) if piece.player == Player.WHITE else str(piece).lower(): code
+             for code, piece in enumerate(PIECES)}
+
+# The king and rook squares (row, col) each castling right depends on
+CASTLING_SQUARES = {
+    "K": ((7, 4), (7, 7)),
+    "Q": ((7, 4), (7, 0)),
+    "k": ((0, 4), (0, 7)),
+    "q": ((0, 4), (0, 0)),
+}
+
+# How many plies apart the positions kept for goto_ply are
+CHECKPOINT_INTERVAL = 16
+
 
 class MoveValidity(Enum):
     Valid = 1
@@ -31,6 +56,22 @@ class MoveValidity(Enum):
             return "Unknown move validity."
 
 
+class _PositionCache:
+    """What has been worked out about the current position so far; None for anything not yet asked.
+
+    Attributes:
+        moves (Optional[Tuple[int, ...]]): The packed legal moves of the player to move.
+        legal (Optional[FrozenSet[int]]): The same moves without their flags, for lookups.
+        in_check (Optional[bool]): Whether the player to move is in check.
+        complete (Optional[bool]): Whether the game is over, see ChessModel.is_complete.
+        checks_and_pins (Optional[Tuple]): The checking and pinned pieces, see ChessModel.checks_and_pins.
+    """
+    __slots__ = ("moves", "legal", "in_check", "complete", "checks_and_pins")
+
+    def __init__(self):
+        self.moves = self.legal = self.in_check = self.complete = self.checks_and_pins = None
+
+
 class ChessModel:
 
     """Represents the model of a chess game, managing the game state, player turns, and move validation.
@@ -40,48 +81,72 @@ class ChessModel:
         __ncols (int): Number of columns on the chess board.
         __player (Player): The current player (either Player.WHITE or Player.BLACK).
         __message_code (MoveValidity): The validity status of the last move attempted.
-        board (list): A 2D list representing the chess board with pieces.
-        move_history (list): A list storing the history of moves made during the game.
+        board (list): A 2D list representing the chess board with pieces, or a BitboardBoard that
+            can be indexed the same way.
+        move_history (list): The moves made during the game, each stored as a (packed move, moved
+            piece, captured piece, previous position hash) tuple; see move.decode_move.
+
+    Moves taken back with undo can be played again with redo until a new move is made, and goto_ply
+    jumps anywhere in that line. Every CHECKPOINT_INTERVAL plies the position is kept as it passes,
+    so a jump replays at most that many moves from the nearest checkpoint instead of walking there.
+
+    The legal moves, the in-check flag and the game status of the current position are cached once
+    asked for, so repeated is_valid_move, in_check and is_complete calls on an unchanged position
+    are lookups. Moving, undoing, set_piece and changing the current player clear the cache.
+    Writing into `board` directly does not, so call clear_cache afterwards.
     """
 
-    def __init__(self):
+    def __init__(self, bitboard: bool = False, empty: bool = False):
 
-        """Initializes a new chess game with a standard board setup."""
+        """Initializes a new chess game with a standard board setup.
+
+        Args:
+            bitboard (bool, optional): Store the position as bitboards and use bitboard move
+                generation and check detection. Defaults to the list-of-lists board.
+            empty (bool, optional): Start with an empty board instead of the standard setup.
+                Defaults to False.
+        """
 
         self.__nrows = 8
         self.__ncols = 8
         self.__player = Player.WHITE
         self.__message_code = MoveValidity.Valid
-        self.board = [[None] * self.__ncols for _ in range(self.__nrows)]
-        self.setup_standard_board()
+        if bitboard:
+            self.board = BitboardBoard()
+        else:
+            self.board = [[None] * self.__ncols for _ in range(self.__nrows)]
+        self.__king_squares = {Player.WHITE: None, Player.BLACK: None}
+        self.__hash = 0
+        self.__cache = None
+        self.__cache_hits = 0
+        self.__cache_misses = 0
+        # Castling rights, en passant square, halfmove clock and fullmove number as of the first
+        # move in move_history, kept for FEN export
+        self.__fen_fields = ("-" if empty else "KQkq", "-", 0, 1)
         self.move_history = []
-        self.temp_board = None
+        # Records taken back by undo, the next one to redo last, and the positions kept for goto_ply
+        # as {ply: (snapshot, position hash)}
+        self.__redo = []
+        self.__checkpoints = {}
+        # How many records at the start of move_history were made before set_piece or the current
+        # player setter changed the position, so their hashes no longer describe the positions undo
+        # goes back to
+        self.__edited_ply = 0
+        if not empty:
+            self.setup_standard_board()
 
     def setup_standard_board(self):
         """Sets up the chess board with pieces in their standard starting positions."""
 
-        # Set up pawns
+        # Set up pawns, using the shared piece instances rather than 32 new objects per game
         for col in range(self.ncols):
-            self.set_piece(1, col, Pawn(Player.BLACK))
-            self.set_piece(self.nrows - 2, col, Pawn(Player.WHITE))
+            self.set_piece(1, col, shared_piece(Pawn, Player.BLACK))
+            self.set_piece(self.nrows - 2, col, shared_piece(Pawn, Player.WHITE))
 
-        #Set up other pieces
-        self.set_piece(0, 0, Rook(Player.BLACK))
-        self.set_piece(0, 1, Knight(Player.BLACK))
-        self.set_piece(0, 2, Bishop(Player.BLACK))
-        self.set_piece(0, 3, Queen(Player.BLACK))
-        self.set_piece(0, 4, King(Player.BLACK))
-        self.set_piece(0, 5, Bishop(Player.BLACK))
-        self.set_piece(0, 6, Knight(Player.BLACK))
-        self.set_piece(0, 7, Rook(Player.BLACK))
-        self.set_piece(7, 0, Rook(Player.WHITE))
-        self.set_piece(7, 1, Knight(Player.WHITE))
-        self.set_piece(7, 2, Bishop(Player.WHITE))
-        self.set_piece(7, 3, Queen(Player.WHITE))
-        self.set_piece(7, 4, King(Player.WHITE))
-        self.set_piece(7, 5, Bishop(Player.WHITE))
-        self.set_piece(7, 6, Knight(Player.WHITE))
-        self.set_piece(7, 7, Rook(Player.WHITE))
+        # Set up other pieces
+        for col, piece_type in enumerate((Rook, Knight, Bishop, Queen, King, Bishop, Knight, Rook)):
+            self.set_piece(0, col, shared_piece(piece_type, Player.BLACK))
+            self.set_piece(7, col, shared_piece(piece_type, Player.WHITE))
 
 
 
@@ -108,6 +173,40 @@ class ChessModel:
         """MoveValidity: The validity status of the last move attempted."""
         return self.__message_code
 
+    @property
+    def position_hash(self) -> int:
+        """int: The 64-bit Zobrist hash of the pieces on the board and the player to move.
+
+        It is updated incrementally by move, undo, set_piece and changes of the current player.
+        Writing into `board` directly bypasses it.
+        """
+        return self.__hash
+
+    @property
+    def ply(self) -> int:
+        """int: The number of moves made since the starting position."""
+        return len(self.move_history)
+
+    @property
+    def total_plies(self) -> int:
+        """int: The number of moves in the game, counting those taken back that can be redone."""
+        return len(self.move_history) + len(self.__redo_line())
+
+    @property
+    def cache_hits(self) -> int:
+        """int: The number of position queries answered from the cache."""
+        return self.__cache_hits
+
+    @property
+    def cache_misses(self) -> int:
+        """int: The number of position queries that had to be worked out."""
+        return self.__cache_misses
+
+    @property
+    def uses_bitboards(self) -> bool:
+        """bool: Whether the position is stored as bitboards."""
+        return isinstance(self.board, BitboardBoard)
+
     @nrows.setter
     def nrows(self, value: int):
         self.__nrows = value
@@ -118,6 +217,10 @@ class ChessModel:
 
     @current_player.setter
     def current_player(self, value: Player):
+        if value != self.__player:
+            self.__hash ^= BLACK_TO_MOVE_KEY
+            self.__cache = None
+            self.__history_edited()
         self.__player = value
 
     @messageCode.setter
@@ -149,25 +252,22 @@ class ChessModel:
             return False
 
         # Check if the piece allows this move
-        if not piece.is_valid_move(move, self.board):
+        if isinstance(self.board, BitboardBoard):
+            allowed = (
+                move.to_row is not None and move.to_col is not None
+                and 0 <= move.to_row < self.__nrows and 0 <= move.to_col < self.__ncols
+                and self.board.targets(move.from_row % 8 * 8 + move.from_col % 8) >> (move.to_row * 8 + move.to_col) & 1
+            )
+        else:
+            allowed = piece.is_valid_move(move, self.board)
+        if not allowed:
             # Set message code to indicate an invalid move
             self.__message_code = MoveValidity.Invalid
             return False
 
-        # Simulate the move to check for moving into check
-        simulated_board = []
-        for row in self.board:
-            simulated_row = []
-            for item in row:
-                simulated_row.append(item)
-            simulated_board.append(simulated_row)
-
-        # Make the move on the simulated board
-        simulated_board[move.to_row][move.to_col] = piece
-        simulated_board[move.from_row][move.from_col] = None
-
-        # Check if the move puts the player's own king in check
-        if self.in_check(self.__player, simulated_board):
+        # Check if the move puts the player's own king in check: the piece can make it, so it is only
+        # missing from the legal moves if it does
+        if encode_move(move) not in self.__cached_moves().legal:
             # Set message code to indicate moving into check
             self.__message_code = MoveValidity.MovingIntoCheck
             return False
@@ -176,11 +276,236 @@ class ChessModel:
         self.__message_code = MoveValidity.Valid
         return True
 
+    def __analyze_checks(self, player: Player) -> Tuple[Optional[Tuple[int, int]], List[Tuple[int, int]],
+                                                         Dict[Tuple[int, int], FrozenSet[Tuple[int, int]]]]:
+        """Finds a player's king, the pieces giving it check and the player's pinned pieces.
+
+        A piece is pinned if it is the only piece between its king and an enemy rook, bishop or
+        queen sliding along that line; it may then only move along the line, capturing the pinner.
+
+        Returns:
+            Tuple: The (row, col) of the king (None if the player has no king), the (row, col) of
+                each checking piece, and for each pinned piece's (row, col) the squares it may move to.
+        """
+
+        king = self.king_square(player)
+        if king is None:
+            return None, [], {}
+        board = self.board
+        enemy = player.next()
+        row, col = king
+        square = row * 8 + col
+        checkers = []
+
+        # Knights and kings one jump or step away, and pawns on the diagonals they capture from
+        for targets, piece_type in ((KNIGHT_TARGETS, Knight), (KING_TARGETS, King)):
+            for from_row, from_col in targets[square]:
+                piece = board[from_row][from_col]
+                if isinstance(piece, piece_type) and piece.player == enemy:
+                    checkers.append((from_row, from_col))
+        from_row = row + 1 if enemy == Player.WHITE else row - 1
+        if 0 <= from_row < 8:
+            for from_col in (col - 1, col + 1):
+                if 0 <= from_col < 8:
+                    piece = board[from_row][from_col]
+                    if isinstance(piece, Pawn) and piece.player == enemy:
+                        checkers.append((from_row, from_col))
+
+        # Along each ray the first enemy piece checks if it slides that way, or pins the player's
+        # piece if exactly one stands in between
+        pins = {}
+        for rays, piece_types in ((ROOK_RAYS, (Rook, Queen)), (BISHOP_RAYS, (Bishop, Queen))):
+            for ray in rays[square]:
+                shield = None
+                for distance, (from_row, from_col) in enumerate(ray):
+                    piece = board[from_row][from_col]
+                    if piece is None:
+                        continue
+                    if piece.player == player:
+                        if shield is not None:
+                            break
+                        shield = (from_row, from_col)
+                        continue
+                    if isinstance(piece, piece_types):
+                        if shield is None:
+                            checkers.append((from_row, from_col))
+                        else:
+                            pins[shield] = frozenset(ray[:distance + 1])
+                    break
+
+        return king, checkers, pins
+
+    def checks_and_pins(self) -> Tuple[List[Tuple[int, int]], Dict[Tuple[int, int], FrozenSet[Tuple[int, int]]]]:
+        """Finds the pieces giving check to the player to move and that player's pinned pieces.
+
+        Worked out once per position; move generation uses the same analysis to produce legal
+        moves directly: only king moves under double check, only captures of the checker or
+        blocks under single check, and pinned pieces only along their pin.
+
+        Returns:
+            Tuple: The (row, col) of each checking piece, and for each pinned piece's (row, col)
+                the squares it may move to along its pin.
+        """
+
+        cache = self.__cache
+        if cache is None:
+            cache = self.__cache = _PositionCache()
+        if cache.checks_and_pins is not None:
+            self.__cache_hits += 1
+            return cache.checks_and_pins
+        self.__cache_misses += 1
+
+        if isinstance(self.board, BitboardBoard):
+            checkers, pins = self.board.checks_and_pins(COLOR_INDEX[self.__player])
+            found = ([divmod(square, 8) for square in iter_bits(checkers)],
+                     {divmod(square, 8): frozenset(divmod(target, 8) for target in iter_bits(ray))
+                      for square, ray in pins.items()})
+        else:
+            found = self.__analyze_checks(self.__player)[1:]
+        cache.checks_and_pins = found
+        return found
+
+    def __iter_packed_moves(self) -> Iterator[int]:
+        """Generates every legal move for the current player as a packed move (see move.pack_move),
+        flagged with MOVE_CAPTURE and MOVE_PROMOTION where they apply.
+
+        Each piece produces its own reachable squares, which are kept or dropped using the checks
+        and pins of the position; no move is tried out on the board.
+        """
+
+        player = self.__player
+        if isinstance(self.board, BitboardBoard):
+            occupied = self.board.occupied
+            # White pawns promote on row 0 and black pawns on row 7
+            pawns = self.board.pieces[COLOR_INDEX[player] * 6 + PAWN_CODE]
+            last_row = 0 if player == Player.WHITE else 7
+            for from_square, to_square in self.board.iter_legal_moves(player):
+                code = from_square | to_square << 6
+                if occupied >> to_square & 1:
+                    code |= MOVE_CAPTURE
+                if pawns >> from_square & 1 and to_square >> 3 == last_row:
+                    code |= MOVE_PROMOTION
+                yield code
+            return
+
+        board = self.board
+        king, checkers, pins = self.__analyze_checks(player)
+
+        # Under check the other pieces must capture the checker or step in between; under double
+        # check only the king can move
+        evasions = None
+        if len(checkers) == 1:
+            evasions = frozenset(BETWEEN[king[0] * 8 + king[1]][checkers[0][0] * 8 + checkers[0][1]]) \
+                | {checkers[0]}
+        elif checkers:
+            evasions = frozenset()
+
+        # The king may step anywhere not attacked once it has left its square, so it is lifted off
+        # the board while its steps are checked, to let sliding pieces see through
+        king_steps = []
+        if king is not None:
+            king_row, king_col = king
+            king_piece = board[king_row][king_col]
+            board[king_row][king_col] = None
+            enemy = player.next()
+            for to_row, to_col in king_piece.reachable_squares(king_row, king_col, board):
+                if not self.is_square_attacked(to_row, to_col, enemy):
+                    king_steps.append((to_row, to_col))
+            board[king_row][king_col] = king_piece
+
+        last_row = 0 if player == Player.WHITE else self.__nrows - 1
+        for row in range(self.__nrows):
+            for col in range(self.__ncols):
+                piece = board[row][col]
+                if piece is None or piece.player != player:
+                    continue
+                if (row, col) == king:
+                    targets = king_steps
+                elif evasions is not None and not evasions:
+                    continue
+                else:
+                    targets = piece.reachable_squares(row, col, board)
+                    pin = pins.get((row, col))
+                    if evasions is not None:
+                        targets = [target for target in targets if target in evasions]
+                    if pin is not None:
+                        targets = [target for target in targets if target in pin]
+                from_square = row * 8 + col
+                promotes = isinstance(piece, Pawn)
+                for to_row, to_col in targets:
+                    code = from_square | (to_row * 8 + to_col) << 6
+                    if board[to_row][to_col] is not None:
+                        code |= MOVE_CAPTURE
+                    if promotes and to_row == last_row:
+                        code |= MOVE_PROMOTION
+                    yield code
+
+    def generate_moves(self, moves: Optional[MoveList] = None) -> MoveList:
+        """Fills a move list with every legal move for the current player, as packed moves.
+
+        Reusing one move list per search depth avoids building a list and a Move object for each
+        move; decode_move turns a packed move back into a Move where one is needed.
+
+        Args:
+            moves (MoveList, optional): The list to fill; whatever it held is replaced. Defaults to
+                a new list.
+
+        Returns:
+            MoveList: The filled list.
+        """
+
+        if moves is None:
+            moves = MoveList()
+        codes = moves.codes
+        count = 0
+        for code in self.__iter_packed_moves():
+            codes[count] = code
+            count += 1
+        moves.count = count
+        return moves
+
+    def __cached_moves(self) -> _PositionCache:
+        """Gets the position cache with the legal moves filled in, generating them if needed."""
+
+        cache = self.__cache
+        if cache is None:
+            cache = self.__cache = _PositionCache()
+        if cache.moves is None:
+            self.__cache_misses += 1
+            cache.moves = tuple(self.__iter_packed_moves())
+            cache.legal = frozenset(code & MOVE_SQUARES for code in cache.moves)
+        else:
+            self.__cache_hits += 1
+        return cache
+
+    def clear_cache(self):
+        """Forgets what is cached about the current position, for use after writing into `board` directly."""
+
+        self.__cache = None
+
+    def iter_legal_moves(self) -> Iterator[Move]:
+        """Generates every legal move for the current player.
+
+        Yields:
+            Move: Each legal move, in board order of the moving piece.
+        """
+
+        for code in self.__cached_moves().moves:
+            yield decode_move(code)
+
+    def legal_moves(self) -> List[Move]:
+        """Lists every legal move for the current player.
+
+        Returns:
+            List[Move]: The legal moves, empty if the player cannot move.
+        """
+        return list(self.iter_legal_moves())
+
     def is_complete(self) -> bool:
 
         """Determines if the game is complete, either by checkmate or stalemate.
 
-        Iterates over all pieces for the current player to check if any valid moves are available.
+        Asks the legal move generator whether the current player has any move available.
         If no valid moves are available and the player is in check, it's checkmate. If no moves are
         available but the player is not in check, it's stalemate.
 
@@ -188,29 +513,16 @@ class ChessModel:
             bool: True if the game is complete, False otherwise.
         """
 
-        # Iterate over each cell on the board
-        for row in range(self.__nrows):
-            for col in range(self.__ncols):
-                # Get the piece at the current cell
-                piece = self.board[row][col]
+        cache = self.__cache
+        if cache is not None and cache.complete is not None:
+            self.__cache_hits += 1
+            return cache.complete
 
-                # Check if there's a piece at the cell, and it belongs to the current player
-                if piece and piece.player == self.__player:
-                    # Iterate over all possible destination cells
-                    for to_row in range(self.__nrows):
-                        for to_col in range(self.__ncols):
-                            # Create a move from the current cell to the destination cell
-                            move = Move(row, col, to_row, to_col)
-
-                            # Check if the move is valid
-                            if self.is_valid_move(move):
-                                # If there's at least one valid move for the current player, the game is not complete
-                                return False
-        # If no valid move is found for the current player, check if the player is in check
-        if self.in_check(self.__player):
-            return True
-        else:
-            return False
+        # If there's at least one legal move for the current player, the game is not complete;
+        # otherwise it is if the player is in check
+        cache = self.__cached_moves()
+        cache.complete = not cache.moves and self.in_check(self.__player)
+        return cache.complete
 
     def move(self, move: Move):
         """Executes a chess move on the board, including pawn promotion and turn switching.
@@ -228,32 +540,101 @@ class ChessModel:
         if self.is_complete():
             return
 
-        # Make a copy of the current board state
-        current_state = []
-        for row in self.board:
-            current_state.append(row[:])
+        # A new move replaces the moves that were taken back
+        if self.__redo:
+            self.__redo.clear()
+            ply = len(self.move_history)
+            for stale in [checkpoint for checkpoint in self.__checkpoints if checkpoint > ply]:
+                del self.__checkpoints[stale]
+        self.__record_checkpoint()
+        self.make_move(move)
+
+    def make_move(self, move: Move):
+        """Applies a move to the board in place, without validating it.
+
+        Moves the piece, promotes a pawn reaching the opposite end of the board to a queen and
+        switches the turn. The packed move, the moved and captured pieces and the previous position
+        hash are pushed onto `move_history`, so `unmake_move` can put everything back without copying
+        the board.
+
+        Args:
+            move (Move): The move to be applied.
+        """
+
+        self.make_packed_move(encode_move(move))
+
+    def make_packed_move(self, code: int):
+        """Applies a packed move (see move.pack_move) to the board in place, without validating it.
+
+        Works like make_move. The flags are not needed: a pawn reaching the opposite end of the
+        board is promoted either way.
+
+        Args:
+            code (int): The packed move to be applied.
+        """
+
+        board = self.board
+        from_square, to_square = code & 63, code >> 6 & 63
+        from_row, from_col = from_square >> 3, from_square & 7
+        to_row, to_col = to_square >> 3, to_square & 7
+        piece = board[from_row][from_col]
+        captured = board[to_row][to_col]
+        previous_hash = self.__hash
 
         # Make the move on the board
-        self.board[move.to_row][move.to_col] = self.board[move.from_row][move.from_col]
-        self.board[move.from_row][move.from_col] = None
+        board[to_row][to_col] = piece
+        board[from_row][from_col] = None
+        if isinstance(piece, King):
+            self.__king_squares[piece.player] = (to_row, to_col)
 
         # Check for pawn promotion to Queen
-        moved_piece = self.piece_at(move.to_row, move.to_col)
-        if isinstance(moved_piece, Pawn):
-            if moved_piece.player == Player.WHITE:
-                if move.to_row == 0:
-                    promoted_piece = Queen(moved_piece.player)
-                    self.board[move.to_row][move.to_col] = promoted_piece
-            elif moved_piece.player == Player.BLACK:
-                if move.to_row == 7:
-                    promoted_piece = Queen(moved_piece.player)
-                    self.board[move.to_row][move.to_col] = promoted_piece
+        placed = piece
+        if isinstance(piece, Pawn):
+            if piece.player == Player.WHITE:
+                if to_row == 0:
+                    placed = shared_piece(Queen, piece.player)
+            elif piece.player == Player.BLACK:
+                if to_row == self.__nrows - 1:
+                    placed = shared_piece(Queen, piece.player)
+            if placed is not piece:
+                board[to_row][to_col] = placed
+
+        # Update the hash for the squares that changed
+        if captured is not None:
+            self.__hash ^= PIECE_KEYS[piece_code(captured)][to_square]
+        if piece is not None:
+            self.__hash ^= PIECE_KEYS[piece_code(piece)][from_square] ^ PIECE_KEYS[piece_code(placed)][to_square]
 
         # Set the next player
         self.set_next_player()
 
-        # Save the move and the recorded board state to the move history
-        self.move_history.append((current_state, move))
+        # Save the move with the pieces and hash needed to take it back
+        self.move_history.append((code & MOVE_SQUARES, piece, captured, previous_hash))
+
+    def unmake_move(self):
+        """Reverts the last move applied by `make_move`, restoring any captured or promoted piece
+        and the player to move.
+
+        Raises:
+            IndexError: If no move has been made.
+        """
+
+        code, piece, captured, previous_hash = self.move_history.pop()
+        from_row, from_col = code >> 3 & 7, code & 7
+        to_row, to_col = code >> 9 & 7, code >> 6 & 7
+        self.board[from_row][from_col] = piece
+        self.board[to_row][to_col] = captured
+        if isinstance(piece, King):
+            self.__king_squares[piece.player] = (from_row, from_col)
+        if isinstance(captured, King):
+            self.__king_squares[captured.player] = (to_row, to_col)
+        self.set_next_player()
+        if len(self.move_history) < self.__edited_ply:
+            # The position was changed since the move was made, so its old hash no longer applies
+            self.__hash = hash_board(self.board, self.__player)
+            self.__edited_ply = len(self.move_history)
+        else:
+            self.__hash = previous_hash
 
     def in_check(self, player: Player, board=None):
         """Determines if a player's king is in check.
@@ -266,42 +647,118 @@ class ChessModel:
             bool: True if the player's king is in check, False otherwise.
         """
 
-        # If no board is provided, use the current board
+        # The player to move's check on the current board is cached
+        cache = None
+        if board is None and player == self.__player:
+            cache = self.__cache
+            if cache is None:
+                cache = self.__cache = _PositionCache()
+            if cache.in_check is not None:
+                self.__cache_hits += 1
+                return cache.in_check
+            self.__cache_misses += 1
+
+        # If no board is provided, use the current board and the tracked king square
         if board is None:
-            board = self.board
+            if isinstance(self.board, BitboardBoard):
+                attacked = self.board.in_check(player)
+            else:
+                king_square = self.king_square(player)
+                # If the king's position is not found, return False (not in check)
+                attacked = king_square is not None and \
+                    self.is_square_attacked(king_square[0], king_square[1], player.next())
+        else:
+            king_square = self.__find_king(player, board)
+            # Check if any opponent's piece attacks the king's square
+            attacked = king_square is not None and \
+                self.is_square_attacked(king_square[0], king_square[1], player.next(), board)
+
+        if cache is not None:
+            cache.in_check = attacked
+        return attacked
+
+    def king_square(self, player: Player) -> Optional[Tuple[int, int]]:
+        """Finds the square of a player's king.
+
+        The square is tracked as moves are made, so this is normally a single lookup. If the board was
+        changed some other way (for example by writing into `board` directly) the board is scanned again.
+
+        Args:
+            player (Player): The player whose king to find.
+
+        Returns:
+            Optional[Tuple[int, int]]: The (row, col) of the king, or None if the player has no king.
+        """
+
+        square = self.__king_squares[player]
+        if square is not None:
+            piece = self.board[square[0]][square[1]]
+            if isinstance(piece, King) and piece.player == player:
+                return square
 
-        # Initialize variables to store the king's position
-        king_row, king_col = None, None
+        # The tracked square is stale, so look for the king again
+        square = self.__find_king(player, self.board)
+        self.__king_squares[player] = square
+        return square
 
-        # Find the position of the king of the specified player on the board
+    def __find_king(self, player: Player, board) -> Optional[Tuple[int, int]]:
+        """Scans a board for a player's king and returns its (row, col), or None if there is none."""
         for row in range(self.__nrows):
             for col in range(self.__ncols):
                 piece = board[row][col]
                 if isinstance(piece, King) and piece.player == player:
-                    king_row, king_col = row, col
-                    break
-            if king_row is not None:
-                break
+                    return row, col
+        return None
 
-        # If the king's position is not found, return False (not in check)
-        if king_row is None or king_col is None:
-            return False
+    def is_square_attacked(self, row: int, col: int, by_player: Player, board=None) -> bool:
+        """Determines if any of a player's pieces attacks a square.
 
-        # Check if any opponent's piece can attack the king
-        for row in range(self.__nrows):
-            for col in range(self.__ncols):
-                piece = board[row][col]
-                # Check if there is a piece at the current position, and it belongs to the opponent
-                if piece and piece.player != player:
-                    # Create a move from the opponent's piece to the king's position
-                    move = Move(row, col, king_row, king_col)
-                    # Check if the move is valid for the opponent's piece, i.e., it can attack the king
-                    if piece.is_valid_move(move, board):
+        Works outward from the square: it looks for knights and kings one jump or step away, pawns on
+        the two diagonals they capture from, and rooks, bishops and queens at the end of each ray.
+
+        Args:
+            row (int): The row of the square.
+            col (int): The column of the square.
+            by_player (Player): The player whose pieces may be attacking.
+            board (list, optional): A specific board configuration to check. Defaults to the current board.
+
+        Returns:
+            bool: True if the square is attacked, False otherwise.
+        """
+
+        if board is None:
+            if isinstance(self.board, BitboardBoard):
+                return self.board.attackers(row * 8 + col, COLOR_INDEX[by_player]) != 0
+            board = self.board
+
+        # Knights and kings one jump or step away
+        square = row * 8 + col
+        for targets, piece_type in ((KNIGHT_TARGETS, Knight), (KING_TARGETS, King)):
+            for from_row, from_col in targets[square]:
+                piece = board[from_row][from_col]
+                if isinstance(piece, piece_type) and piece.player == by_player:
+                    return True
+
+        # Pawns capture diagonally forward, so white pawns attack from the row below and black from above
+        from_row = row + 1 if by_player == Player.WHITE else row - 1
+        if 0 <= from_row < 8:
+            for from_col in (col - 1, col + 1):
+                if 0 <= from_col < 8:
+                    piece = board[from_row][from_col]
+                    if isinstance(piece, Pawn) and piece.player == by_player:
                         return True
 
-        # If no opponent's piece can attack the king, return False (not in check)
-        return False
+        # Sliding pieces, stopping each ray at the first piece in the way
+        for rays, piece_types in ((ROOK_RAYS, (Rook, Queen)), (BISHOP_RAYS, (Bishop, Queen))):
+            for ray in rays[square]:
+                for from_row, from_col in ray:
+                    piece = board[from_row][from_col]
+                    if piece is not None:
+                        if isinstance(piece, piece_types) and piece.player == by_player:
+                            return True
+                        break
 
+        return False
 
     # ChessPiece method -> returns the piece at the given row and col
     def piece_at(self, row: int, col: int) -> ChessPiece:
@@ -333,6 +790,8 @@ class ChessModel:
 
     def set_next_player(self):
         """Switches the turn to the next player."""
+        self.__hash ^= BLACK_TO_MOVE_KEY
+        self.__cache = None
         if self.current_player == Player.WHITE:
             self.__player = Player.BLACK
         else:
@@ -360,7 +819,26 @@ class ChessModel:
         if not (piece is None or isinstance(piece, ChessPiece)):
             raise TypeError("Piece is not a ChessPiece.")
 
+        # Swap the old piece for the new one in the position hash
+        old_piece = self.board[row][col]
+        if old_piece is not None:
+            self.__hash ^= PIECE_KEYS[piece_code(old_piece)][row * 8 + col]
+        if piece is not None:
+            self.__hash ^= PIECE_KEYS[piece_code(piece)][row * 8 + col]
+
         self.board[row][col] = piece
+        if isinstance(piece, King):
+            self.__king_squares[piece.player] = (row, col)
+        self.__cache = None
+        self.__history_edited()
+
+    def __history_edited(self):
+        """Notes that the position was changed outside of a move, once moves have been made: undoing the
+        moves made before the change works out hashes afresh, and the checkpoints, which show the game
+        before the change, are dropped."""
+        if self.move_history:
+            self.__edited_ply = len(self.move_history)
+            self.__checkpoints.clear()
 
     def undo(self):
         """Reverts the last move made in the game.
@@ -371,16 +849,276 @@ class ChessModel:
 
         if not self.move_history:
             raise UndoException("No moves to undo")
-        # Retrieve the last move and board state from the history
-        last_state, last_move = self.move_history.pop()
+        # Take back the last move, restoring captured pieces and the player to move, and keep it for redo
+        self.__redo_line().append(self.move_history[-1])
+        self.unmake_move()
+        self.__record_checkpoint()
 
-        # Restore the previous board state using deep copy
-        self.board = []
-        for row in last_state:
-            self.board.append(row[:])
+    def redo(self):
+        """Plays the last move taken back by `undo` again.
 
-        # Switch back to the player who made the undone move
-        self.set_next_player()
+        Raises:
+            UndoException: If there are no moves to redo, because none were undone or a move has
+                been made since.
+        """
+
+        redo = self.__redo_line()
+        if not redo:
+            raise UndoException("No moves to redo")
+        self.make_packed_move(redo.pop()[0])
+        self.__record_checkpoint()
+
+    def goto_ply(self, ply: int):
+        """Moves to the position after a number of moves, going back or forward through the game.
+
+        Positions passed on the way become checkpoints, so jumping replays at most
+        CHECKPOINT_INTERVAL moves from the nearest checkpoint rather than every move in between.
+        Moves after the new position can be redone.
+
+        Args:
+            ply (int): The number of moves from the starting position, between 0 and `total_plies`.
+
+        Raises:
+            ValueError: If the ply is outside the game.
+        """
+
+        history = self.move_history
+        redo = self.__redo_line()
+        current = len(history)
+        if ply < 0 or ply > current + len(redo):
+            raise ValueError(f"Ply {ply} is outside the game of {current + len(redo)} plies.")
+
+        checkpoint = self.__nearest_checkpoint(ply)
+        if ply < current:
+            if checkpoint is not None and ply - checkpoint < current - ply:
+                # Restore the checkpoint and replay from there; the moves after ply stay redoable
+                redo.extend(reversed(history[ply:]))
+                replay = [record[0] for record in history[checkpoint:ply]]
+                del history[checkpoint:]
+                self.__restore_checkpoint(checkpoint)
+                for code in replay:
+                    self.make_packed_move(code)
+                return
+            while len(history) > ply:
+                self.undo()
+        elif ply > current:
+            if checkpoint is not None and current < checkpoint and ply - checkpoint < ply - current:
+                # Skip straight to the checkpoint, taking the records in between from the redo line
+                for _ in range(checkpoint - current):
+                    history.append(redo.pop())
+                self.__restore_checkpoint(checkpoint)
+            while len(history) < ply:
+                self.redo()
+
+    def __redo_line(self) -> list:
+        """Gets the records that can be redone, dropping them if the position has moved on since the undo."""
+        redo = self.__redo
+        if redo and redo[-1][3] != self.__hash:
+            redo.clear()
+        return redo
+
+    def __hash_at(self, ply: int) -> Optional[int]:
+        """Gets the position hash after a number of moves along the history and redo line, if known."""
+        history = self.move_history
+        if ply == len(history):
+            return self.__hash
+        if ply < len(history):
+            return history[ply][3]
+        if ply - len(history) < len(self.__redo):
+            return self.__redo[len(history) - ply - 1][3]
+        # The hash after the last redoable move is only known once it is played
+        return None
+
+    def __record_checkpoint(self):
+        """Keeps the current position for goto_ply if the ply is a multiple of CHECKPOINT_INTERVAL."""
+        ply = len(self.move_history)
+        if ply % CHECKPOINT_INTERVAL == 0:
+            checkpoint = self.__checkpoints.get(ply)
+            if checkpoint is None or checkpoint[1] != self.__hash:
+                self.__checkpoints[ply] = (self.snapshot(), self.__hash)
+
+    def __nearest_checkpoint(self, ply: int) -> Optional[int]:
+        """Finds the closest checkpoint at or before a ply that still matches the game, if any."""
+        checkpoint = ply - ply % CHECKPOINT_INTERVAL
+        while checkpoint >= 0:
+            kept = self.__checkpoints.get(checkpoint)
+            if kept is not None and kept[1] == self.__hash_at(checkpoint):
+                return checkpoint
+            checkpoint -= CHECKPOINT_INTERVAL
+        return None
+
+    def __restore_checkpoint(self, ply: int):
+        """Puts the pieces, player to move and hash of a checkpoint back on the board."""
+        (squares, player), position_hash = self.__checkpoints[ply]
+        board = self.board
+        kings = self.__king_squares
+        kings[Player.WHITE] = kings[Player.BLACK] = None
+        for square in range(64):
+            code = squares[square]
+            piece = PIECES[code - 1] if code else None
+            board[square >> 3][square & 7] = piece
+            if code and (code - 1) % 6 == KING_CODE:
+                kings[piece.player] = (square >> 3, square & 7)
+        self.__player = Player(player)
+        self.__hash = position_hash
+        self.__cache = None
+
+    def snapshot(self) -> Tuple[bytes, int]:
+        """Captures the position in a compact form that is cheap to pickle and send to other processes.
+
+        Returns:
+            Tuple[bytes, int]: 64 bytes holding each square's piece code plus one (0 for an empty
+                square), and the value of the player to move. Move history is not included.
+        """
+        squares = bytearray(64)
+        for row in range(self.__nrows):
+            for col in range(self.__ncols):
+                piece = self.board[row][col]
+                if piece is not None:
+                    squares[row * 8 + col] = piece_code(piece) + 1
+        return bytes(squares), self.__player.value
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Tuple[bytes, int], bitboard: bool = False) -> "ChessModel":
+        """Builds a chess model from a position captured by `snapshot`.
+
+        Args:
+            snapshot (Tuple[bytes, int]): The captured position.
+            bitboard (bool, optional): Whether the new model should use bitboards. Defaults to False.
+
+        Returns:
+            ChessModel: A new model holding the position, with no move history.
+        """
+        squares, player = snapshot
+        model = cls(bitboard, empty=True)
+        for square in range(64):
+            code = squares[square]
+            if code:
+                model.set_piece(square // 8, square % 8, PIECES[code - 1])
+        model.current_player = Player(player)
+        return model
+
+    @classmethod
+    def from_fen(cls, fen: str, bitboard: bool = False) -> "ChessModel":
+        """Builds a chess model from a position in Forsyth-Edwards Notation.
+
+        Pieces are taken from the shared instances in piece_codes and written straight into the board,
+        so no piece objects are created.
+        Castling rights and the en passant square are kept for `to_fen` but are not used by the
+        rules of this game, which have neither castling nor en passant.
+
+        Args:
+            fen (str): The position, for example STARTING_FEN. The castling, en passant and move
+                counter fields may be left out.
+            bitboard (bool, optional): Whether the new model should use bitboards. Defaults to False.
+
+        Raises:
+            ValueError: If the FEN is malformed.
+
+        Returns:
+            ChessModel: A new model holding the position, with no move history.
+        """
+        fields = fen.split()
+        if len(fields) < 2 or len(fields) > 6:
+            raise ValueError("A FEN needs between 2 and 6 fields.")
+        ranks = fields[0].split("/")
+        if len(ranks) != 8:
+            raise ValueError("A FEN board needs 8 ranks.")
+
+        # Write the shared pieces straight into the board, hashing them as they go
+        model = cls(bitboard, empty=True)
+        board, position_hash = model.board, 0
+        for row, rank in enumerate(ranks):
+            cells, col = (None if bitboard else board[row]), 0
+            for letter in rank:
+                code = FEN_CODES.get(letter)
+                if code is not None:
+                    if col > 7:
+                        raise ValueError(f"Too many squares in FEN rank {rank!r}.")
+                    if bitboard:
+                        board.place_code(row * 8 + col, code)
+                    else:
+                        cells[col] = PIECES[code]
+                    position_hash ^= PIECE_KEYS[code][row * 8 + col]
+                    if code % 6 == KING_CODE:
+                        model.__king_squares[PIECES[code].player] = (row, col)
+                    col += 1
+                elif letter in "12345678":
+                    col += ord(letter) - 48
+                else:
+                    raise ValueError(f"Unknown character {letter!r} in FEN board.")
+            if col != 8:
+                raise ValueError(f"FEN rank {rank!r} does not have 8 squares.")
+        model.__hash = position_hash
+
+        if fields[1] not in ("w", "b"):
+            raise ValueError("The FEN player to move must be 'w' or 'b'.")
+        model.current_player = Player.WHITE if fields[1] == "w" else Player.BLACK
+
+        castling = fields[2] if len(fields) > 2 else "-"
+        en_passant = fields[3] if len(fields) > 3 else "-"
+        if castling != "-" and (not castling or any(right not in "KQkq" for right in castling)):
+            raise ValueError(f"Invalid FEN castling rights {castling!r}.")
+        if en_passant != "-" and (len(en_passant) != 2 or en_passant[0] not in "abcdefgh"
+                                  or en_passant[1] not in "36"):
+            raise ValueError(f"Invalid FEN en passant square {en_passant!r}.")
+        try:
+            halfmove = int(fields[4]) if len(fields) > 4 else 0
+            fullmove = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError("The FEN move counters must be numbers.")
+        model.__fen_fields = (castling, en_passant, halfmove, fullmove)
+        return model
+
+    def to_fen(self) -> str:
+        """Describes the position in Forsyth-Edwards Notation.
+
+        Castling rights, the en passant square and the move counters are carried forward from the
+        starting position (or the FEN the model was built from) through the moves in `move_history`.
+
+        Returns:
+            str: The position as a FEN string.
+        """
+        ranks = []
+        for row in range(self.__nrows):
+            rank, empty = "", 0
+            for col in range(self.__ncols):
+                piece = self.board[row][col]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = str(piece)
+                rank += letter if piece.player == Player.WHITE else letter.lower()
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+
+        # Replay the history to bring the other fields up to date
+        castling, en_passant, halfmove, fullmove = self.__fen_fields
+        mover = self.__player if len(self.move_history) % 2 == 0 else self.__player.next()
+        for code, piece, captured, _ in self.move_history:
+            move = decode_move(code)
+            touched = ((move.from_row, move.from_col), (move.to_row, move.to_col))
+            castling = "".join(right for right in castling
+                               if not any(square in CASTLING_SQUARES[right] for square in touched))
+            en_passant = "-"
+            if isinstance(piece, Pawn):
+                halfmove = 0
+                if abs(move.from_row - move.to_row) == 2:
+                    en_passant = f"{'abcdefgh'[move.from_col]}{8 - (move.from_row + move.to_row) // 2}"
+            elif captured is not None:
+                halfmove = 0
+            else:
+                halfmove += 1
+            if mover == Player.BLACK:
+                fullmove += 1
+            mover = mover.next()
+
+        side = "w" if self.__player == Player.WHITE else "b"
+        return f"{'/'.join(ranks)} {side} {castling or '-'} {en_passant} {halfmove} {fullmove}"
 
 
 class UndoException(Exception):
@@ -397,9 +1135,99 @@ class UndoException(Exception):
         super().__init__(self.message)
 
 
+class AiStrategy(Enum):
+    Random = 1
+    Search = 2
+
+    def __str__(self):
+        if self.value == 1:
+            return "Plays a random legal move."
+        elif self.value == 2:
+            return "Plays the best move found by an alpha-beta search."
+        else:
+            return "Unknown strategy."
+
+
 class ChessAi:
-    def __init__(self, model: ChessModel):
+    """A computer player that makes moves on a chess model.
+
+    Attributes:
+        model (ChessModel): The game the AI plays in.
+        strategy (AiStrategy): How the AI chooses its moves.
+        depth (int): The number of plies the search strategy looks ahead.
+        time_budget_ms (Optional[int]): If set, the search deepens step by step until this many
+            milliseconds have passed instead of searching to a fixed depth.
+        book (Optional[OpeningBook]): If set, positions in this opening book (see book.py) are played
+            from the book instead of searched.
+        tablebase (Optional[Tablebase]): If set, endgames covered by this tablebase (see
+            tablebase.py) are played perfectly instead of searched.
+        table (Optional[TranspositionTable]): The transposition table kept between this AI's searches,
+            made at the first search unless given.
+        last_depth (int): The depth the last search completed, 0 for a book or tablebase move.
+        last_nodes (int): The number of positions the last search visited.
+    """
+
+    def __init__(self, model: ChessModel, strategy: AiStrategy = AiStrategy.Search, depth: int = 2,
+                 time_budget_ms: Optional[int] = None, book=None, tablebase=None,
+                 table: Optional[TranspositionTable] = None):
+        """Initializes the AI for a game.
+
+        Args:
+            model (ChessModel): The game to play in.
+            strategy (AiStrategy, optional): How to choose moves. Defaults to searching.
+            depth (int, optional): The search depth in plies. Defaults to 2.
+            time_budget_ms (int, optional): The time allowed per move, in milliseconds. Defaults to
+                None, which searches to a fixed depth.
+            book (OpeningBook, optional): The opening book to consult before searching. Defaults to none.
+            tablebase (Tablebase, optional): The endgame tablebase to consult before searching.
+                Defaults to none.
+            table (TranspositionTable, optional): The transposition table to search with, for example
+                a smaller one or one with another replacement scheme. Defaults to a table of
+                transposition.DEFAULT_ENTRIES entries made at the first search.
+        """
         self.model = model
+        self.strategy = strategy
+        self.depth = depth
+        self.time_budget_ms = time_budget_ms
+        self.book = book
+        self.tablebase = tablebase
+        self.table = table
+        self.last_depth = 0
+        self.last_nodes = 0
+
+    def choose_move(self) -> Optional[Move]:
+        """Chooses a move for the player to move without making it.
+
+        Returns:
+            Optional[Move]: The chosen move, or None if there are no legal moves.
+        """
+
+        if self.strategy == AiStrategy.Random:
+            moves = self.model.legal_moves()
+            if not moves:
+                return None
+            return random.choice(moves)
+
+        move = None
+        if self.tablebase is not None:
+            move = self.tablebase.best_move(self.model)
+        if move is None and self.book is not None:
+            move = self.book.choose(self.model)
+        if move is not None:
+            self.last_depth = 0
+            self.last_nodes = 0
+            return move
+
+        if self.table is None:
+            self.table = TranspositionTable()
+        searcher = Searcher(self.model, self.table)
+        if self.time_budget_ms is None:
+            best_move, _ = searcher.search(self.depth)
+        else:
+            best_move, _ = searcher.search_timed(self.time_budget_ms)
+        self.last_depth = searcher.depth_reached
+        self.last_nodes = searcher.nodes
+        return best_move
 
     def make_move(self):
         """Attempts to make a move for the AI player."""
@@ -408,23 +1236,12 @@ class ChessAi:
         if self.model.is_complete():
             return
 
-        # Attempt to make a random move
-        while True:
-            # Generate random row and column values for the move
-            from_row = random.randint(0, self.model.nrows - 1)
-            from_col = random.randint(0, self.model.ncols - 1)
-            to_row = random.randint(0, self.model.nrows - 1)
-            to_col = random.randint(0, self.model.ncols - 1)
-
-            # Create a move from the generated values
-            move = Move(from_row, from_col, to_row, to_col)
-
-            # Check if the move is valid
-            if self.model.is_valid_move(move):
-                # Make the move on the board
-                self.model.move(move)
-                break
+        # Choose a move with the selected strategy and make it
+        move = self.choose_move()
+        if move is None:
+            return
+        self.model.move(move)
 
         # Check if the game is complete after the move
         if self.model.is_complete():
-            return
\ No newline at end of file
+            return
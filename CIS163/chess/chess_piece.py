@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
 from player import Player
 from move import Move
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
 
 class ChessPiece(ABC):
@@ -11,7 +11,12 @@ class ChessPiece(ABC):
 
     Attributes:
         player (Player): The player (either white or black) this piece belongs to.
+
+    Pieces never change once made, so a single instance of each type and player can be shared by
+    every square and every game (see piece_codes.shared_piece). Slots keep each instance small.
     """
+    __slots__ = ("__player",)
+
     def __init__(self, player: Player) -> None:
         """
         Initializes a ChessPiece instance with the specified player.
@@ -97,3 +102,93 @@ class ChessPiece(ABC):
 
         # If all the above conditions are met, the move is valid
         return True
+
+    def reachable_squares(self, row: int, col: int, board: List[List["ChessPiece"]]) -> Iterator[Tuple[int, int]]:
+        """
+        Generates every square this piece could move to from the given location, ignoring whether
+        the move would leave its own king in check. Subclasses override this with direct move
+        generation; the default falls back to probing every square with is_valid_move.
+
+        Args:
+            row (int): The row the piece is standing on.
+            col (int): The column the piece is standing on.
+            board (List[List["ChessPiece"]]): The current state of the chessboard.
+
+        Yields:
+            Tuple[int, int]: The (row, col) of each reachable square.
+        """
+        for to_row in range(len(board)):
+            for to_col in range(len(board[to_row])):
+                if self.is_valid_move(Move(row, col, to_row, to_col), board):
+                    yield to_row, to_col
+
+    def _slide(self, row: int, col: int, board: List[List["ChessPiece"]],
+               rays: List[Tuple[Tuple[Tuple[int, int], ...], ...]]) -> Iterator[Tuple[int, int]]:
+        """
+        Walks each ray from the given location until the first piece, yielding the empty squares
+        passed and the first square holding an opponent's piece.
+
+        Args:
+            row (int): The row the piece is standing on.
+            col (int): The column the piece is standing on.
+            board (List[List["ChessPiece"]]): The current state of the chessboard.
+            rays (List[Tuple[Tuple[Tuple[int, int], ...], ...]]): The rays to walk from each square,
+                such as geometry.ROOK_RAYS.
+
+        Yields:
+            Tuple[int, int]: The (row, col) of each reachable square.
+        """
+        for ray in rays[row * 8 + col]:
+            for to_row, to_col in ray:
+                target = board[to_row][to_col]
+                if target is None:
+                    yield to_row, to_col
+                else:
+                    if target.player != self.player:
+                        yield to_row, to_col
+                    break
+
+    def _step(self, row: int, col: int, board: List[List["ChessPiece"]],
+              targets: List[Tuple[Tuple[int, int], ...]]) -> Iterator[Tuple[int, int]]:
+        """
+        Yields each of the given target squares of the location that is not occupied by a piece
+        belonging to the same player.
+
+        Args:
+            row (int): The row the piece is standing on.
+            col (int): The column the piece is standing on.
+            board (List[List["ChessPiece"]]): The current state of the chessboard.
+            targets (List[Tuple[Tuple[int, int], ...]]): The squares to try from each square, such as
+                geometry.KNIGHT_TARGETS.
+
+        Yields:
+            Tuple[int, int]: The (row, col) of each reachable square.
+        """
+        for to_row, to_col in targets[row * 8 + col]:
+            target = board[to_row][to_col]
+            if target is None or target.player != self.player:
+                yield to_row, to_col
+
+    @staticmethod
+    def _path_is_clear(move: Move, board: List[List["ChessPiece"]],
+                       paths: List[List[Optional[Tuple[Tuple[int, int], ...]]]]) -> bool:
+        """
+        Checks that a sliding piece can travel from a move's start square to its end square with
+        nothing standing in between. The end square itself is not looked at.
+
+        Args:
+            move (Move): The move to check.
+            board (List[List["ChessPiece"]]): The current state of the chessboard.
+            paths (List[List[Optional[Tuple[Tuple[int, int], ...]]]]): The squares between each pair
+                of squares the piece can slide along, such as geometry.ROOK_PATHS.
+
+        Returns:
+            bool: True if the piece slides along the move and its path is empty, False otherwise.
+        """
+        path = paths[move.from_row * 8 + move.from_col][move.to_row * 8 + move.to_col]
+        if path is None:
+            return False
+        for row, col in path:
+            if board[row][col] is not None:
+                return False
+        return True
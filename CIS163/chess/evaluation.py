@@ -0,0 +1,111 @@
+from player import Player
+from piece_codes import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, piece_code
+
+# Material values in centipawns, indexed by piece kind
+PIECE_VALUES = (100, 320, 330, 500, 900, 20000)
+
+# Piece-square bonuses from white's point of view, written as the board is drawn: row 0 is the far
+# side of the board for white. Black uses the same tables mirrored top to bottom.
+PIECE_SQUARE_TABLES = {
+    PAWN: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ),
+    KNIGHT: (
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ),
+    BISHOP: (
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ),
+    ROOK: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ),
+    QUEEN: (
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ),
+    KING: (
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ),
+}
+
+
+def _square_scores():
+    """Combines material and piece-square bonuses into one signed score per piece code and square.
+
+    White pieces score positive and black pieces negative, so a position's score is a plain sum.
+    """
+    scores = []
+    for color in range(2):
+        for kind in range(6):
+            table = PIECE_SQUARE_TABLES[kind]
+            if color == 0:
+                scores.append(tuple(PIECE_VALUES[kind] + table[square] for square in range(64)))
+            else:
+                scores.append(tuple(-(PIECE_VALUES[kind] + table[(7 - square // 8) * 8 + square % 8])
+                                    for square in range(64)))
+    return tuple(scores)
+
+
+# SQUARE_SCORES[code][square]: what a piece code standing on a square adds to white's score
+SQUARE_SCORES = _square_scores()
+
+
+def evaluate(board, player: Player) -> int:
+    """Scores a position by material and piece placement.
+
+    Args:
+        board (list): The chess board, indexed as board[row][col].
+        player (Player): The player whose point of view the score is given from.
+
+    Returns:
+        int: The score in centipawns; positive means the player is better off.
+    """
+    score = 0
+    for row in range(8):
+        cells = board[row]
+        for col in range(8):
+            piece = cells[col]
+            if piece is not None:
+                score += SQUARE_SCORES[piece_code(piece)][row * 8 + col]
+    return score if player == Player.WHITE else -score
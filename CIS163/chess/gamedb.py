@@ -0,0 +1,349 @@
+"""A compact binary game database with random access to any game.
+
+A database is two files. The data file starts with a file header, followed by one record per game.
+Each record has a fixed-size game header, then the start position if the game did not begin from
+the standard position, then 2 bytes per move (see move.encode_move). The index file, the data
+file's name plus '.idx', holds the 8-byte offset of each record. Both files are memory-mapped for
+reading, so game K is found and replayed without reading the rest of the file. Games are only
+ever appended.
+
+Import a PGN archive, or show a stored game, from this directory, for example:
+
+    python gamedb.py import games.pgn games.cgdb --workers 8
+    python gamedb.py show games.cgdb 1234
+"""
+import argparse
+import mmap
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+from chess_model import ChessModel, STARTING_FEN
+from move import Move, MOVE_PROMOTION, encode_move, decode_move, move_name
+from pawn import Pawn
+from pgn import PgnGame, read_games, san_to_move
+
+MAGIC = b"CGDB"
+VERSION = 1
+# Magic, format version and two spare bytes
+FILE_HEADER = struct.Struct("<4sHH")
+# Number of moves, result (an index into RESULTS) and flags
+GAME_HEADER = struct.Struct("<HBB")
+OFFSET = struct.Struct("<Q")
+# The 64 squares of a snapshot and the player to move
+START_POSITION_SIZE = 65
+
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2")
+GAME_HAS_START_POSITION = 1
+
+
+class DatabaseError(Exception):
+    """Exception raised for a file that is not a game database or is damaged."""
+
+
+class StoredGame:
+    """A game read from a game database.
+
+    Attributes:
+        result (str): The result, one of '1-0', '0-1', '1/2-1/2' or '*'.
+        start (Optional[Tuple[bytes, int]]): The start position as a ChessModel snapshot, or None
+            for the standard starting position.
+        moves (List[Move]): The moves of the game.
+    """
+
+    def __init__(self, result: str, start: Optional[Tuple[bytes, int]], moves: List[Move]):
+        self.result = result
+        self.start = start
+        self.moves = moves
+
+    def replay(self, bitboard: bool = False) -> ChessModel:
+        """Plays the game out on a new model.
+
+        Args:
+            bitboard (bool, optional): Whether the model should use bitboards. Defaults to False.
+
+        Returns:
+            ChessModel: The model at the end of the game, with every move in its move_history.
+        """
+        model = ChessModel(bitboard) if self.start is None else ChessModel.from_snapshot(self.start, bitboard)
+        for move in self.moves:
+            model.make_move(move)
+        return model
+
+
+def pack_game(moves: Iterable[Move], result: str = "*", start: Optional[ChessModel] = None) -> bytes:
+    """Packs a game into a database record.
+
+    Args:
+        moves (Iterable[Move]): The moves of the game, which must be legal.
+        result (str, optional): The result. Defaults to '*'.
+        start (ChessModel, optional): The position the game starts from; it is left unchanged.
+            Defaults to the standard starting position.
+
+    Raises:
+        ValueError: If the result is unknown or the game is too long to store.
+
+    Returns:
+        bytes: The record.
+    """
+    if result not in RESULTS:
+        raise ValueError(f"Unknown result {result!r}.")
+    flags, start_bytes = 0, b""
+    if start is not None and start.to_fen().split()[:2] != STARTING_FEN.split()[:2]:
+        squares, player = start.snapshot()
+        flags, start_bytes = GAME_HAS_START_POSITION, squares + bytes((player,))
+
+    # Mark promotions, which only needs to know which piece is moving
+    model = ChessModel() if start is None else start
+    board = model.board
+    codes = []
+    for move in moves:
+        piece = board[move.from_row][move.from_col]
+        promotion = isinstance(piece, Pawn) and move.to_row in (0, 7)
+        codes.append(encode_move(move, MOVE_PROMOTION if promotion else 0))
+        model.make_move(move)
+    for _ in codes:
+        model.unmake_move()
+    if len(codes) > 0xFFFF:
+        raise ValueError("A game of more than 65535 moves cannot be stored.")
+    return GAME_HEADER.pack(len(codes), RESULTS.index(result), flags) + start_bytes + \
+        struct.pack(f"<{len(codes)}H", *codes)
+
+
+class GameDatabase:
+    """A binary game database, opened for reading and appending.
+
+    Attributes:
+        path (str): The data file.
+    """
+
+    def __init__(self, path: str):
+        """Opens a game database, creating it if it does not exist.
+
+        Args:
+            path (str): The data file. The index is kept next to it, with '.idx' added.
+
+        Raises:
+            DatabaseError: If the file is not a game database.
+        """
+        self.path = path
+        self.__index_path = path + ".idx"
+        if not os.path.exists(path):
+            with open(path, "wb") as data:
+                data.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+            open(self.__index_path, "wb").close()
+        else:
+            # Check the file is a game database before trusting it enough to index it
+            with open(path, "rb") as data:
+                header = data.read(FILE_HEADER.size)
+            if len(header) < FILE_HEADER.size or FILE_HEADER.unpack(header)[:2] != (MAGIC, VERSION):
+                raise DatabaseError(f"{path} is not a version {VERSION} game database.")
+            if not os.path.exists(self.__index_path):
+                self.rebuild_index()
+        self.__data = open(path, "r+b")
+        self.__index = open(self.__index_path, "r+b")
+        self.__data_map = None
+        self.__index_map = None
+
+    def __enter__(self) -> "GameDatabase":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the database's files."""
+        self.__unmap()
+        self.__data.close()
+        self.__index.close()
+
+    def __unmap(self):
+        if self.__data_map is not None:
+            self.__data_map.close()
+            self.__index_map.close()
+            self.__data_map = self.__index_map = None
+
+    def __map(self):
+        """Maps both files for reading; appending unmaps them again since they grow.
+
+        Only called once there is a game, since an empty file cannot be mapped.
+        """
+        if self.__data_map is None:
+            self.__data_map = mmap.mmap(self.__data.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__index_map = mmap.mmap(self.__index.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return os.fstat(self.__index.fileno()).st_size // OFFSET.size
+
+    def append(self, moves: Iterable[Move], result: str = "*", start: Optional[ChessModel] = None) -> int:
+        """Adds a game to the end of the database.
+
+        Args:
+            moves (Iterable[Move]): The moves of the game, which must be legal.
+            result (str, optional): The result. Defaults to '*'.
+            start (ChessModel, optional): The position the game starts from; it is left unchanged.
+                Defaults to the standard starting position.
+
+        Returns:
+            int: The number of the new game.
+        """
+        return self.append_record(pack_game(moves, result, start))
+
+    def append_record(self, record: bytes) -> int:
+        """Adds a game packed by pack_game to the end of the database.
+
+        Args:
+            record (bytes): The packed game.
+
+        Returns:
+            int: The number of the new game.
+        """
+        self.__unmap()
+        offset = self.__data.seek(0, os.SEEK_END)
+        self.__data.write(record)
+        self.__data.flush()
+        self.__index.seek(0, os.SEEK_END)
+        self.__index.write(OFFSET.pack(offset))
+        self.__index.flush()
+        return len(self) - 1
+
+    def __getitem__(self, number: int) -> StoredGame:
+        """Reads game `number`, counting from 0; negative numbers count from the end.
+
+        Raises:
+            IndexError: If there is no such game.
+        """
+        count = len(self)
+        if number < 0:
+            number += count
+        if not 0 <= number < count:
+            raise IndexError("game number out of range")
+        self.__map()
+        data = self.__data_map
+        offset = OFFSET.unpack_from(self.__index_map, number * OFFSET.size)[0]
+        plies, result, flags = GAME_HEADER.unpack_from(data, offset)
+        offset += GAME_HEADER.size
+        start = None
+        if flags & GAME_HAS_START_POSITION:
+            start = (data[offset:offset + 64], data[offset + 64])
+            offset += START_POSITION_SIZE
+        codes = struct.unpack_from(f"<{plies}H", data, offset)
+        return StoredGame(RESULTS[result], start, [decode_move(code) for code in codes])
+
+    def __iter__(self) -> Iterator[StoredGame]:
+        for number in range(len(self)):
+            yield self[number]
+
+    def replay(self, number: int, bitboard: bool = False) -> ChessModel:
+        """Plays game `number` out on a new model.
+
+        Args:
+            number (int): The game, counting from 0.
+            bitboard (bool, optional): Whether the model should use bitboards. Defaults to False.
+
+        Returns:
+            ChessModel: The model at the end of the game, with every move in its move_history.
+        """
+        return self[number].replay(bitboard)
+
+    def rebuild_index(self):
+        """Rewrites the index file by walking the game headers of the data file."""
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as data, open(self.__index_path, "wb") as index:
+            offset = FILE_HEADER.size
+            while offset < size:
+                data.seek(offset)
+                header = data.read(GAME_HEADER.size)
+                if len(header) < GAME_HEADER.size:
+                    raise DatabaseError(f"{self.path} ends in the middle of a game.")
+                plies, _, flags = GAME_HEADER.unpack(header)
+                index.write(OFFSET.pack(offset))
+                offset += GAME_HEADER.size + plies * 2
+                if flags & GAME_HAS_START_POSITION:
+                    offset += START_POSITION_SIZE
+
+
+def _import_task(game: Tuple[str, List[str], str]) -> Optional[bytes]:
+    """Worker task: replays a game's SAN moves and packs it, or returns None if a move is not legal."""
+    fen, sans, result = game
+    try:
+        model = ChessModel.from_fen(fen)
+        moves = []
+        for san in sans:
+            move = san_to_move(model, san)
+            model.make_move(move)
+            moves.append(move)
+    except ValueError:
+        return None
+    for _ in moves:
+        model.unmake_move()
+    return pack_game(moves, result if result in RESULTS else "*", model)
+
+
+def import_pgn(database: GameDatabase, games: Iterable[PgnGame], workers: int = 1, batch_size: int = 512) -> Tuple[int, int]:
+    """Replays PGN games and appends the legal ones to a database.
+
+    Args:
+        database (GameDatabase): The database to append to.
+        games (Iterable[PgnGame]): The games, for example from pgn.read_games.
+        workers (int, optional): The number of worker processes. Defaults to 1.
+        batch_size (int, optional): The number of games handed out at once. Defaults to 512.
+
+    Returns:
+        Tuple[int, int]: The number of games stored and the number skipped for illegal moves.
+    """
+    stored = skipped = 0
+    games = iter(games)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while True:
+            batch = [(game.fen, game.moves, game.result) for game in islice(games, batch_size)]
+            if not batch:
+                break
+            if pool is None:
+                records = map(_import_task, batch)
+            else:
+                records = pool.map(_import_task, batch, chunksize=max(1, len(batch) // (workers * 4)))
+            for record in records:
+                if record is None:
+                    skipped += 1
+                else:
+                    database.append_record(record)
+                    stored += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return stored, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import games into, or read games from, a binary game database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="append the legal games of a PGN file")
+    importer.add_argument("pgn", help="PGN file to import")
+    importer.add_argument("database", help="database file, created if needed")
+    importer.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    shower = commands.add_parser("show", help="print the moves of one game")
+    shower.add_argument("database", help="database file")
+    shower.add_argument("game", type=int, help="game number, counting from 0")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        start = time.perf_counter()
+        with open(args.pgn) as file, GameDatabase(args.database) as database:
+            stored, skipped = import_pgn(database, read_games(file), args.workers)
+        seconds = time.perf_counter() - start
+        print(f"{stored} games stored, {skipped} skipped in {seconds:.3f}s "
+              f"({(stored + skipped) / max(seconds, 1e-9):.1f} games/s)")
+    else:
+        with GameDatabase(args.database) as database:
+            game = database[args.game]
+            model = game.replay()
+            print(" ".join(move_name(move) for move in game.moves), game.result)
+            print(model.to_fen())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Board geometry tables shared by the pieces, built once when the module is imported.
+
+Every table is indexed by square number, row * 8 + col, and lists squares as (row, col) pairs so
+they can be looked up directly on a board of rows.
+"""
+from typing import Dict, List, Optional, Tuple
+
+Square = Tuple[int, int]
+Direction = Tuple[int, int]
+
+# Row and column offsets of the knight's L-shaped jumps and the king's one-square steps
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+# Row and column steps rooks and bishops slide along; queens use both
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+
+def _on_board(row: int, col: int) -> bool:
+    return 0 <= row < 8 and 0 <= col < 8
+
+
+def _targets(offsets: Tuple[Direction, ...]) -> List[Tuple[Square, ...]]:
+    """Builds, for every square, the squares one of the offsets away."""
+    return [tuple((row + d_row, col + d_col) for d_row, d_col in offsets if _on_board(row + d_row, col + d_col))
+            for row, col in (divmod(square, 8) for square in range(64))]
+
+
+def _ray(square: int, direction: Direction) -> Tuple[Square, ...]:
+    """Lists the squares from a square along one direction up to the edge of the board, nearest first."""
+    row, col = divmod(square, 8)
+    d_row, d_col = direction
+    squares = []
+    row, col = row + d_row, col + d_col
+    while _on_board(row, col):
+        squares.append((row, col))
+        row, col = row + d_row, col + d_col
+    return tuple(squares)
+
+
+# KNIGHT_TARGETS[square] and KING_TARGETS[square]: the squares a knight or king there can move to
+KNIGHT_TARGETS = _targets(KNIGHT_OFFSETS)
+KING_TARGETS = _targets(KING_OFFSETS)
+
+# RAYS[direction][square]: the squares along a direction from a square, nearest first
+RAYS: Dict[Direction, List[Tuple[Square, ...]]] = {
+    direction: [_ray(square, direction) for square in range(64)] for direction in QUEEN_DIRECTIONS
+}
+
+# ROOK_RAYS[square], BISHOP_RAYS[square], QUEEN_RAYS[square]: the non-empty rays a slider there walks
+ROOK_RAYS = [tuple(RAYS[d][square] for d in ROOK_DIRECTIONS if RAYS[d][square]) for square in range(64)]
+BISHOP_RAYS = [tuple(RAYS[d][square] for d in BISHOP_DIRECTIONS if RAYS[d][square]) for square in range(64)]
+QUEEN_RAYS = [ROOK_RAYS[square] + BISHOP_RAYS[square] for square in range(64)]
+
+# DIRECTION[from][to]: the step leading from one square to another along a row, column or diagonal,
+# or None if they do not share a line. BETWEEN[from][to]: the squares strictly between the two,
+# empty when they are neighbours or do not share a line.
+DIRECTION: List[List[Optional[Direction]]] = [[None] * 64 for _ in range(64)]
+BETWEEN: List[List[Tuple[Square, ...]]] = [[()] * 64 for _ in range(64)]
+for _square in range(64):
+    for _direction in QUEEN_DIRECTIONS:
+        _squares = RAYS[_direction][_square]
+        for _distance, (_row, _col) in enumerate(_squares):
+            DIRECTION[_square][_row * 8 + _col] = _direction
+            BETWEEN[_square][_row * 8 + _col] = _squares[:_distance]
+del _square, _direction, _squares, _distance, _row, _col
+
+
+def _paths(directions: Tuple[Direction, ...]) -> List[List[Optional[Tuple[Square, ...]]]]:
+    """Builds, for every pair of squares, the squares a slider must pass over, or None if it cannot get there."""
+    return [[BETWEEN[from_square][to_square] if DIRECTION[from_square][to_square] in directions else None
+             for to_square in range(64)] for from_square in range(64)]
+
+
+def _jumps(targets: List[Tuple[Square, ...]]) -> List[List[bool]]:
+    """Builds, for every pair of squares, whether the second is one of the first's targets."""
+    return [[divmod(to_square, 8) in targets[from_square] for to_square in range(64)] for from_square in range(64)]
+
+
+# ROOK_PATHS[from][to] and friends: the squares that must be empty for that slider to move from one
+# square to the other, or None if it cannot move between them at all
+ROOK_PATHS = _paths(ROOK_DIRECTIONS)
+BISHOP_PATHS = _paths(BISHOP_DIRECTIONS)
+QUEEN_PATHS = _paths(QUEEN_DIRECTIONS)
+
+# KNIGHT_JUMPS[from][to] and KING_STEPS[from][to]: whether a knight or king can move between two squares
+KNIGHT_JUMPS = _jumps(KNIGHT_TARGETS)
+KING_STEPS = _jumps(KING_TARGETS)
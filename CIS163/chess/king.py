@@ -1,11 +1,13 @@
 from chess_piece import ChessPiece
 from move import Move
-from typing import List
+from typing import Iterator, List, Tuple
 from player import Player
+from geometry import KING_TARGETS, KING_STEPS
 
 
 class King(ChessPiece):
     """Represents a King chess piece."""
+    __slots__ = ()
 
     def __str__(self) -> str:
         """Return a string representation of the King."""
@@ -28,16 +30,19 @@ class King(ChessPiece):
         if not super().is_valid_move(move, board):
             return False
 
-        # If the king is moving one space in any direction
-        if (
-                abs(move.from_row - move.to_row) <= 1
-                and abs(move.from_col - move.to_col) <= 1
-        ):
-            # If the destination is empty or occupied by the other player
-            if (
-                    board[move.to_row][move.to_col] is None
-                    or board[move.to_row][move.to_col].player != self.player
-            ):
-                return True
-
-        return False
\ No newline at end of file
+        # The destination must be one square away; it is already known to be empty or
+        # occupied by the other player
+        return KING_STEPS[move.from_row * 8 + move.from_col][move.to_row * 8 + move.to_col]
+
+    def reachable_squares(self, row: int, col: int, board: List[List[ChessPiece]]) -> Iterator[Tuple[int, int]]:
+        """Generate the squares the King can step to.
+
+        Args:
+            row (int): The row the King is standing on.
+            col (int): The column the King is standing on.
+            board (List[List[ChessPiece]]): The current state of the chess board.
+
+        Yields:
+            Tuple[int, int]: The (row, col) of each reachable square.
+        """
+        return self._step(row, col, board, KING_TARGETS)
@@ -1,11 +1,14 @@
 from chess_piece import ChessPiece
 from move import Move
-from typing import List
+from typing import Iterator, List, Tuple
 from player import Player
+from geometry import KNIGHT_TARGETS, KNIGHT_JUMPS
 
 #t
 class Knight(ChessPiece):
     """Represents a knight chess piece, inheriting from ChessPiece."""
+    __slots__ = ()
+
     def __str__(self) -> str:
         """String representation of the knight piece.
 
@@ -37,20 +40,20 @@ class Knight(ChessPiece):
         """
         if not super().is_valid_move(move, board):
             return False
-        
-        # If the knight is moving in an L shape
-        if (
-            abs(move.from_row - move.to_row) == 2
-            and abs(move.from_col - move.to_col) == 1
-        ) or (
-            abs(move.from_row - move.to_row) == 1
-            and abs(move.from_col - move.to_col) == 2
-        ):
-            # If knight's destination is empty or occupied by the other player
-            if (
-                board[move.to_row][move.to_col] is None
-                or board[move.to_row][move.to_col].player != self.player
-            ):
-                return True
-        
-        return False
\ No newline at end of file
+
+        # The destination must be one of the knight's L-shaped jumps away; it is already known to be empty or
+        # occupied by the other player
+        return KNIGHT_JUMPS[move.from_row * 8 + move.from_col][move.to_row * 8 + move.to_col]
+
+    def reachable_squares(self, row: int, col: int, board: List[List["ChessPiece"]]) -> Iterator[Tuple[int, int]]:
+        """Generates the squares the knight can jump to.
+
+        Args:
+            row (int): The row the knight is standing on.
+            col (int): The column the knight is standing on.
+            board (List[List["ChessPiece"]]): The chess board's current state.
+
+        Yields:
+            Tuple[int, int]: The (row, col) of each reachable square.
+        """
+        return self._step(row, col, board, KNIGHT_TARGETS)
@@ -1,4 +1,9 @@
+from typing import Iterator, List
+
+
 class Move:
+    __slots__ = ("from_row", "from_col", "to_row", "to_col")
+
     def __init__(self, from_row, from_col, to_row, to_col):
         """
         Represents a move in a game of chess, detailing the start and end positions.
@@ -27,3 +32,147 @@ class Move:
         output = f'Move [from_row={self.from_row}, from_col={self.from_col}'
         output += f', to_row={self.to_row}, to_col={self.to_col}]'
         return output
+
+
+def move_name(move: Move) -> str:
+    """
+    Names a move by its start and end squares in algebraic coordinates, for example 'e2e4'.
+
+    Args:
+        move (Move): The move to name.
+
+    Returns:
+        str: The name of the move.
+    """
+    return (f"{'abcdefgh'[move.from_col]}{8 - move.from_row}"
+            f"{'abcdefgh'[move.to_col]}{8 - move.to_row}")
+
+
+# A move packs into 16 bits: the start square in bits 0-5, the end square in bits 6-11 (squares
+# numbered row * 8 + col) and flags in bits 12-15. Two packed moves are the same move if their low
+# 12 bits match; the flags only describe it.
+MOVE_PROMOTION = 1 << 12
+MOVE_CAPTURE = 1 << 13
+MOVE_SQUARES = (1 << 12) - 1
+
+# More moves than any chess position has (the most known is 218)
+MAX_MOVES = 256
+
+
+def pack_move(from_square: int, to_square: int, flags: int = 0) -> int:
+    """
+    Packs a move given by its squares into a 16-bit integer.
+
+    Args:
+        from_square (int): The start square, row * 8 + col.
+        to_square (int): The end square, row * 8 + col.
+        flags (int, optional): Flag bits such as MOVE_PROMOTION. Defaults to 0.
+
+    Returns:
+        int: The packed move.
+    """
+    return from_square | to_square << 6 | flags
+
+
+def encode_move(move: Move, flags: int = 0) -> int:
+    """
+    Packs a move into a 16-bit integer.
+
+    Args:
+        move (Move): The move to pack.
+        flags (int, optional): Flag bits such as MOVE_PROMOTION. Defaults to 0.
+
+    Returns:
+        int: The packed move.
+    """
+    return (move.from_row * 8 + move.from_col) | (move.to_row * 8 + move.to_col) << 6 | flags
+
+
+def decode_move(code: int) -> Move:
+    """
+    Unpacks a move packed by encode_move. The flags are ignored.
+
+    Args:
+        code (int): The packed move.
+
+    Returns:
+        Move: The move.
+    """
+    from_square, to_square = code & 63, code >> 6 & 63
+    return Move(from_square >> 3, from_square & 7, to_square >> 3, to_square & 7)
+
+
+def parse_move_name(name: str) -> Move:
+    """
+    Reads a move named by move_name, for example 'e2e4'.
+
+    Args:
+        name (str): The name of the move.
+
+    Raises:
+        ValueError: If the name is not two squares in algebraic coordinates.
+
+    Returns:
+        Move: The move.
+    """
+    if len(name) != 4 or name[0] not in "abcdefgh" or name[2] not in "abcdefgh" \
+            or name[1] not in "12345678" or name[3] not in "12345678":
+        raise ValueError(f"Malformed move name {name!r}.")
+    return Move(8 - int(name[1]), "abcdefgh".index(name[0]), 8 - int(name[3]), "abcdefgh".index(name[2]))
+
+
+class MoveList:
+    """
+    A fixed-size buffer of packed moves that move generation fills and search reuses, so no list
+    or Move object is built per position.
+
+    Attributes:
+        codes (List[int]): The buffer; only the first `count` entries are moves.
+        count (int): The number of moves in the buffer.
+    """
+    __slots__ = ("codes", "count")
+
+    def __init__(self, capacity: int = MAX_MOVES):
+        """
+        Initializes an empty move list.
+
+        Args:
+            capacity (int, optional): The most moves the list can hold. Defaults to MAX_MOVES.
+        """
+        self.codes = [0] * capacity
+        self.count = 0
+
+    def clear(self):
+        """Empties the list, keeping the buffer."""
+        self.count = 0
+
+    def append(self, code: int):
+        """
+        Adds a packed move to the end of the list.
+
+        Args:
+            code (int): The packed move.
+        """
+        self.codes[self.count] = code
+        self.count += 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> int:
+        if not -self.count <= index < self.count:
+            raise IndexError("move list index out of range")
+        return self.codes[index % self.count]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.codes[:self.count])
+
+    def moves(self) -> List[Move]:
+        """
+        Unpacks the moves in the list.
+
+        Returns:
+            List[Move]: The moves, in order.
+        """
+        return [decode_move(code) for code in self.codes[:self.count]]
+
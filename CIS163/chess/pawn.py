@@ -1,11 +1,13 @@
 from chess_piece import ChessPiece
 from move import Move
-from typing import List
+from typing import Iterator, List, Tuple
 from player import Player
 
 
 class Pawn(ChessPiece):
     """Represents a pawn chess piece, inheriting from ChessPiece."""
+    __slots__ = ()
+
     def __str__(self) -> str:
         """String representation of the pawn piece.
 
@@ -98,3 +100,37 @@ class Pawn(ChessPiece):
                     return True
 
         return False
+
+    def reachable_squares(self, row: int, col: int, board: List[List["ChessPiece"]]) -> Iterator[Tuple[int, int]]:
+        """Generates the squares the pawn can advance to or capture on.
+
+        Args:
+            row (int): The row the pawn is standing on.
+            col (int): The column the pawn is standing on.
+            board (List[List["ChessPiece"]]): The chess board's current state.
+
+        Yields:
+            Tuple[int, int]: The (row, col) of each reachable square.
+        """
+        # White pawns advance up the board (towards row 0), black pawns down
+        if self.player == Player.WHITE:
+            step, start_row = -1, 6
+        else:
+            step, start_row = 1, 1
+
+        to_row = row + step
+        if not 0 <= to_row < 8:
+            return
+
+        # Advance one square, or two from the starting row, onto empty squares
+        if board[to_row][col] is None:
+            yield to_row, col
+            if row == start_row and board[to_row + step][col] is None:
+                yield to_row + step, col
+
+        # Capture diagonally onto the other player's pieces
+        for to_col in (col - 1, col + 1):
+            if 0 <= to_col < 8:
+                target = board[to_row][to_col]
+                if target is not None and target.player != self.player:
+                    yield to_row, to_col
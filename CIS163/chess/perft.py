@@ -0,0 +1,185 @@
+"""Perft: counts the leaf positions of the legal move tree to benchmark and check move generation.
+
+Run from this directory, for example:
+
+    python perft.py --depth 4
+    python perft.py --position endgame --depth 3 --divide
+    python perft.py --check --bitboard
+    python perft.py --depth 5 --workers 8
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+from chess_model import ChessModel, STARTING_FEN
+from move import Move, MoveList, move_name
+
+# Set positions in FEN and the expected node counts for depths 1, 2, 3, ... Castling and en passant
+# are not part of this game's rules and pawns always promote to a queen, so the counts differ from
+# standard chess perft tables for positions where those come up.
+POSITIONS = {
+    "start": (STARTING_FEN, [20, 400, 8902, 197281]),
+    "middlegame": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [46, 1865, 86585]),
+    "endgame": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2810, 43087]),
+    "promotion": ("n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1", [15, 210, 3253, 47828]),
+}
+
+
+def perft(model: ChessModel, depth: int) -> int:
+    """Counts the positions reachable in exactly `depth` legal moves.
+
+    Args:
+        model (ChessModel): The game to count from; it is left unchanged.
+        depth (int): The number of plies.
+
+    Returns:
+        int: The number of leaf positions.
+    """
+    return _perft(model, depth, [MoveList() for _ in range(max(depth, 0))])
+
+
+def _perft(model: ChessModel, depth: int, move_lists: List[MoveList]) -> int:
+    """Counts like perft, generating the moves of each depth into its own reusable move list."""
+    if depth <= 0:
+        return 1
+    moves = model.generate_moves(move_lists[depth - 1])
+    if depth == 1:
+        return moves.count
+    nodes = 0
+    for move in moves:
+        model.make_packed_move(move)
+        nodes += _perft(model, depth - 1, move_lists)
+        model.unmake_move()
+    return nodes
+
+
+def divide(model: ChessModel, depth: int) -> Dict[str, int]:
+    """Counts the leaf positions below each root move separately.
+
+    Args:
+        model (ChessModel): The game to count from; it is left unchanged.
+        depth (int): The number of plies, including the root move.
+
+    Returns:
+        Dict[str, int]: The node count for each root move, keyed by its name (see move_name).
+    """
+    counts = {}
+    for move in model.legal_moves():
+        model.make_move(move)
+        counts[move_name(move)] = perft(model, depth - 1)
+        model.unmake_move()
+    return counts
+
+
+def _perft_after_move(snapshot: Tuple[bytes, int], move: Tuple[int, int, int, int], depth: int,
+                      bitboard: bool) -> int:
+    """Worker task: rebuilds a position from its snapshot, plays one move and counts below it."""
+    model = ChessModel.from_snapshot(snapshot, bitboard)
+    model.make_move(Move(*move))
+    return perft(model, depth)
+
+
+def parallel_divide(model: ChessModel, depth: int, workers: int) -> Dict[str, int]:
+    """Counts the leaf positions below each root move, one root move per task in a process pool.
+
+    Only the compact snapshot of the position and the root move are sent to the workers.
+
+    Args:
+        model (ChessModel): The game to count from; it is left unchanged.
+        depth (int): The number of plies, including the root move.
+        workers (int): The number of worker processes.
+
+    Returns:
+        Dict[str, int]: The node count for each root move, keyed by its name (see move_name).
+    """
+    snapshot = model.snapshot()
+    moves = model.legal_moves()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_perft_after_move, snapshot, (move.from_row, move.from_col, move.to_row, move.to_col),
+                        depth - 1, model.uses_bitboards)
+            for move in moves
+        ]
+        return {move_name(move): future.result() for move, future in zip(moves, futures)}
+
+
+def parallel_perft(model: ChessModel, depth: int, workers: int) -> int:
+    """Counts the positions reachable in exactly `depth` legal moves using a process pool.
+
+    Args:
+        model (ChessModel): The game to count from; it is left unchanged.
+        depth (int): The number of plies.
+        workers (int): The number of worker processes.
+
+    Returns:
+        int: The number of leaf positions, the same as perft returns.
+    """
+    if depth <= 1 or workers <= 1:
+        return perft(model, depth)
+    return sum(parallel_divide(model, depth, workers).values())
+
+
+def check_regressions(max_depth: int, bitboard: bool = False) -> List[Tuple[str, int, int, int, float]]:
+    """Runs every set position against its expected node counts.
+
+    Args:
+        max_depth (int): The deepest depth to check for each position.
+        bitboard (bool, optional): Whether to use the bitboard backend. Defaults to False.
+
+    Returns:
+        List[Tuple[str, int, int, int, float]]: One (position, depth, expected, counted, seconds)
+            entry per check.
+    """
+    results = []
+    for name, (fen, expected) in POSITIONS.items():
+        model = ChessModel.from_fen(fen, bitboard)
+        for depth, count in enumerate(expected[:max_depth], start=1):
+            start = time.perf_counter()
+            nodes = perft(model, depth)
+            results.append((name, depth, count, nodes, time.perf_counter() - start))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count move generation leaf nodes (perft).")
+    parser.add_argument("--position", choices=sorted(POSITIONS), default="start",
+                        help="set position to count from")
+    parser.add_argument("--fen", help="position to count from, instead of a set position")
+    parser.add_argument("--depth", type=int, default=3, help="number of plies")
+    parser.add_argument("--divide", action="store_true", help="show the count below each root move")
+    parser.add_argument("--bitboard", action="store_true", help="use the bitboard backend")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--check", action="store_true",
+                        help="check every set position against its expected counts up to --depth")
+    args = parser.parse_args()
+
+    if args.check:
+        failures, total_nodes, total_time = 0, 0, 0.0
+        for name, depth, expected, nodes, seconds in check_regressions(args.depth, args.bitboard):
+            status = "ok" if nodes == expected else f"FAILED (expected {expected})"
+            print(f"{name:<12} depth {depth}: {nodes:>10} nodes  {seconds:8.3f}s  {status}")
+            failures += nodes != expected
+            total_nodes += nodes
+            total_time += seconds
+        print(f"{total_nodes} nodes in {total_time:.3f}s ({total_nodes / max(total_time, 1e-9):,.0f} nodes/s)")
+        raise SystemExit(1 if failures else 0)
+
+    fen = args.fen or POSITIONS[args.position][0]
+    model = ChessModel.from_fen(fen, args.bitboard)
+    start = time.perf_counter()
+    if args.divide:
+        if args.workers > 1:
+            counts = parallel_divide(model, args.depth, args.workers)
+        else:
+            counts = divide(model, args.depth)
+        for name in sorted(counts):
+            print(f"{name}: {counts[name]}")
+        nodes = sum(counts.values())
+    else:
+        nodes = parallel_perft(model, args.depth, args.workers)
+    seconds = time.perf_counter() - start
+    print(f"perft({args.depth}) = {nodes} in {seconds:.3f}s ({nodes / max(seconds, 1e-9):,.0f} nodes/s)")
+
+
+if __name__ == "__main__":
+    main()
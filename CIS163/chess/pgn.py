@@ -0,0 +1,397 @@
+"""Reading and writing games in Portable Game Notation (PGN), with moves in Standard Algebraic Notation (SAN).
+
+Validate every game in an archive by replaying it through the rules, for example:
+
+    python pgn.py games.pgn --workers 8
+"""
+import argparse
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from chess_model import ChessModel, STARTING_FEN
+from move import Move, decode_move
+from player import Player
+from pawn import Pawn
+from knight import Knight
+from bishop import Bishop
+from rook import Rook
+from queen import Queen
+from king import King
+
+# Piece classes by SAN letter; pawns have no letter
+SAN_PIECES = {"K": King, "Q": Queen, "R": Rook, "B": Bishop, "N": Knight}
+
+SAN_PATTERN = re.compile(r"^([KQRBN])?([a-h])?([1-8])?x?([a-h])([1-8])(?:=?([QRBN]))?[+#]?[!?]*$")
+TAG_PATTERN = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]\s*$')
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+
+class PgnGame:
+    """A game read from a PGN file.
+
+    Attributes:
+        tags (Dict[str, str]): The tag pairs, such as Event, White, Black and Result.
+        moves (List[str]): The moves in SAN, without move numbers, comments or variations.
+        result (str): The game termination marker, one of '1-0', '0-1', '1/2-1/2' or '*'.
+    """
+
+    def __init__(self, tags: Dict[str, str], moves: List[str], result: str):
+        self.tags = tags
+        self.moves = moves
+        self.result = result
+
+    @property
+    def fen(self) -> str:
+        """str: The position the game starts from."""
+        return self.tags.get("FEN", STARTING_FEN)
+
+
+def _strip_movetext(text: str) -> str:
+    """Removes comments, variations and annotation glyphs from movetext."""
+    out, depth, index = [], 0, 0
+    while index < len(text):
+        char = text[index]
+        if char == "{":
+            end = text.find("}", index)
+            index = len(text) if end < 0 else end + 1
+            out.append(" ")
+            continue
+        if char == ";":
+            end = text.find("\n", index)
+            index = len(text) if end < 0 else end
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            out.append(char)
+        index += 1
+    return "".join(out)
+
+
+def _parse_movetext(text: str) -> Tuple[List[str], Optional[str]]:
+    """Splits movetext into SAN moves and the result marker, if there is one."""
+    moves, result = [], None
+    for token in _strip_movetext(text).split():
+        if token in RESULTS:
+            result = token
+            continue
+        if token.startswith("$"):
+            continue
+        # Drop move numbers such as '12.' or '12...' that may be glued to the move
+        token = token.lstrip("0123456789").lstrip(".")
+        if token:
+            moves.append(token)
+    return moves, result
+
+
+def _strip_comments(line: str, in_comment: bool) -> Tuple[str, bool]:
+    """Removes the comments from a line of movetext.
+
+    Args:
+        line (str): The line.
+        in_comment (bool): Whether the line starts inside a {...} comment opened on an earlier line.
+
+    Returns:
+        Tuple[str, bool]: The text outside comments, and whether the line ends inside a {...} comment.
+    """
+    text = []
+    for character in line:
+        if in_comment:
+            in_comment = character != "}"
+        elif character == "{":
+            in_comment = True
+        elif character == ";":
+            # The rest of the line is a comment
+            break
+        else:
+            text.append(character)
+    return "".join(text), in_comment
+
+
+def read_games(file: TextIO) -> Iterator[PgnGame]:
+    """Reads games from a PGN file one at a time, without loading the whole file.
+
+    Args:
+        file (TextIO): The open PGN file.
+
+    Yields:
+        PgnGame: Each game in the file.
+    """
+    tags, movetext = {}, []
+    in_comment = False
+    for line in file:
+        stripped = line.strip()
+        if in_comment:
+            # Inside a {...} comment running over several lines nothing is a tag or a result
+            text, in_comment = _strip_comments(stripped, True)
+            movetext.append(stripped)
+        elif stripped.startswith("%"):
+            continue
+        elif stripped.startswith("["):
+            # A tag after movetext starts the next game
+            if movetext:
+                yield _make_game(tags, movetext)
+                tags, movetext = {}, []
+            match = TAG_PATTERN.match(stripped)
+            if match:
+                tags[match.group(1)] = match.group(2).replace('\\"', '"').replace("\\\\", "\\")
+            continue
+        elif stripped:
+            text, in_comment = _strip_comments(stripped, False)
+            movetext.append(stripped)
+        else:
+            continue
+        tokens = text.split()
+        if not in_comment and tokens and tokens[-1] in RESULTS:
+            yield _make_game(tags, movetext)
+            tags, movetext = {}, []
+    if tags or movetext:
+        yield _make_game(tags, movetext)
+
+
+def _make_game(tags: Dict[str, str], movetext: List[str]) -> PgnGame:
+    moves, result = _parse_movetext("\n".join(movetext))
+    return PgnGame(tags, moves, result or tags.get("Result", "*"))
+
+
+def san_to_move(model: ChessModel, san: str) -> Move:
+    """Finds the legal move a SAN move names in the model's current position.
+
+    Args:
+        model (ChessModel): The game the move is played in.
+        san (str): The move in SAN, for example 'Nbd7', 'exd5' or 'e8=Q+'.
+
+    Raises:
+        ValueError: If the move is malformed, castles or underpromotes (neither is part of this
+            game's rules), or does not name exactly one legal move.
+
+    Returns:
+        Move: The move.
+    """
+    if san.startswith("O-O") or san.startswith("0-0"):
+        raise ValueError(f"Castling ({san}) is not supported by these rules.")
+    match = SAN_PATTERN.match(san)
+    if not match:
+        raise ValueError(f"Malformed SAN move {san!r}.")
+    letter, from_file, from_rank, to_file, to_rank, promotion = match.groups()
+    if promotion is not None and promotion != "Q":
+        raise ValueError(f"Promotion to anything but a queen ({san}) is not supported by these rules.")
+
+    piece_type = SAN_PIECES[letter] if letter else Pawn
+    to_row, to_col = 8 - int(to_rank), "abcdefgh".index(to_file)
+    from_row = None if from_rank is None else 8 - int(from_rank)
+    from_col = None if from_file is None else "abcdefgh".index(from_file)
+
+    found = None
+    for move in model.iter_legal_moves():
+        if (move.to_row != to_row or move.to_col != to_col
+                or (from_row is not None and move.from_row != from_row)
+                or (from_col is not None and move.from_col != from_col)
+                or type(model.piece_at(move.from_row, move.from_col)) is not piece_type):
+            continue
+        if found is not None:
+            raise ValueError(f"Ambiguous SAN move {san!r}.")
+        found = move
+    if found is None:
+        raise ValueError(f"Illegal SAN move {san!r}.")
+    return found
+
+
+def move_to_san(model: ChessModel, move: Move) -> str:
+    """Names a legal move in SAN for the model's current position.
+
+    Args:
+        model (ChessModel): The game the move is played in; it is left unchanged.
+        move (Move): The move, which must be legal.
+
+    Returns:
+        str: The move in SAN, including '+' or '#' if it gives check or mate.
+    """
+    piece = model.piece_at(move.from_row, move.from_col)
+    target = f"{'abcdefgh'[move.to_col]}{8 - move.to_row}"
+    capture = model.piece_at(move.to_row, move.to_col) is not None
+
+    if isinstance(piece, Pawn):
+        san = f"{'abcdefgh'[move.from_col]}x{target}" if capture else target
+        if move.to_row in (0, 7):
+            san += "=Q"
+    else:
+        # Name the start file, rank or both if another piece of the same kind can reach the target
+        rivals = [other for other in model.iter_legal_moves()
+                  if (other.to_row, other.to_col) == (move.to_row, move.to_col)
+                  and (other.from_row, other.from_col) != (move.from_row, move.from_col)
+                  and type(model.piece_at(other.from_row, other.from_col)) is type(piece)]
+        hint = ""
+        if rivals:
+            if all(other.from_col != move.from_col for other in rivals):
+                hint = "abcdefgh"[move.from_col]
+            elif all(other.from_row != move.from_row for other in rivals):
+                hint = str(8 - move.from_row)
+            else:
+                hint = f"{'abcdefgh'[move.from_col]}{8 - move.from_row}"
+        san = f"{piece}{hint}{'x' if capture else ''}{target}"
+
+    model.make_move(move)
+    if model.in_check(model.current_player):
+        san += "#" if model.is_complete() else "+"
+    model.unmake_move()
+    return san
+
+
+def write_game(model: ChessModel, tags: Optional[Dict[str, str]] = None, result: Optional[str] = None) -> str:
+    """Writes the moves in a model's move_history as a PGN game.
+
+    The history is taken back and replayed to name each move, which leaves the model as it was.
+
+    Args:
+        model (ChessModel): The game to write.
+        tags (Dict[str, str], optional): Extra tag pairs. Defaults to none.
+        result (str, optional): The result marker. Defaults to the result of a finished game, or '*'.
+
+    Returns:
+        str: The game in PGN, ending with a blank line.
+    """
+    records = list(model.move_history)
+    for _ in records:
+        model.unmake_move()
+    start_fen = model.to_fen()
+    start_player = model.current_player
+    sans = []
+    for record in records:
+        move = decode_move(record[0])
+        sans.append(move_to_san(model, move))
+        model.make_move(move)
+
+    if result is None:
+        result = "*"
+        if model.is_complete():
+            result = "0-1" if model.current_player == Player.WHITE else "1-0"
+
+    all_tags = {"Event": "?", "Site": "?", "Date": "????.??.??", "Round": "?", "White": "?", "Black": "?"}
+    all_tags.update(tags or {})
+    all_tags["Result"] = result
+    if start_fen != STARTING_FEN:
+        all_tags["SetUp"] = "1"
+        all_tags["FEN"] = start_fen
+    lines = [f'[{key} "{value}"]' for key, value in all_tags.items()]
+
+    # Number the moves, starting from the FEN move number
+    number = int(start_fen.split()[5])
+    tokens = []
+    for ply, san in enumerate(sans):
+        white_moves = (ply % 2 == 0) == (start_player == Player.WHITE)
+        if white_moves:
+            tokens.append(f"{number}.")
+        elif ply == 0:
+            tokens.append(f"{number}...")
+        tokens.append(san)
+        if not white_moves:
+            number += 1
+    tokens.append(result)
+
+    movetext, line = [], ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            movetext.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    movetext.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n\n"
+
+
+def replay_game(fen: str, moves: List[str], bitboard: bool = False) -> Tuple[bool, int, str]:
+    """Replays a game's SAN moves through the rules.
+
+    Args:
+        fen (str): The position the game starts from.
+        moves (List[str]): The moves in SAN.
+        bitboard (bool, optional): Whether to use the bitboard backend. Defaults to False.
+
+    Returns:
+        Tuple[bool, int, str]: Whether every move was legal, the number of moves replayed, and the
+            error for the first bad move (empty if there was none).
+    """
+    try:
+        model = ChessModel.from_fen(fen, bitboard)
+    except ValueError as error:
+        return False, 0, str(error)
+    for ply, san in enumerate(moves):
+        try:
+            model.make_move(san_to_move(model, san))
+        except ValueError as error:
+            return False, ply, str(error)
+    return True, len(moves), ""
+
+
+def _replay_task(game: Tuple[str, List[str]], bitboard: bool) -> Tuple[bool, int, str]:
+    return replay_game(game[0], game[1], bitboard)
+
+
+def validate_games(games: Iterable[PgnGame], workers: int = 1, bitboard: bool = False,
+                   batch_size: int = 512) -> Iterator[Tuple[PgnGame, Tuple[bool, int, str]]]:
+    """Replays games to check them, in worker processes when more than one worker is asked for.
+
+    Games are read lazily in batches, so only one batch is held in memory at a time. Parsing stays
+    in this process; the workers only receive each game's FEN and SAN moves.
+
+    Args:
+        games (Iterable[PgnGame]): The games, for example from read_games.
+        workers (int, optional): The number of worker processes. Defaults to 1.
+        bitboard (bool, optional): Whether to use the bitboard backend. Defaults to False.
+        batch_size (int, optional): The number of games handed out at once. Defaults to 512.
+
+    Yields:
+        Tuple[PgnGame, Tuple[bool, int, str]]: Each game, in order, with its replay_game result.
+    """
+    task = partial(_replay_task, bitboard=bitboard)
+    games = iter(games)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while True:
+            batch = list(islice(games, batch_size))
+            if not batch:
+                break
+            jobs = [(game.fen, game.moves) for game in batch]
+            if pool is None:
+                results = map(task, jobs)
+            else:
+                results = pool.map(task, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+            yield from zip(batch, results)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate a PGN archive by replaying every game.")
+    parser.add_argument("archive", help="PGN file to validate")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--bitboard", action="store_true", help="use the bitboard backend")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    valid = invalid = 0
+    with open(args.archive) as file:
+        for number, (game, (ok, plies, error)) in enumerate(
+                validate_games(read_games(file), args.workers, args.bitboard), start=1):
+            if ok:
+                valid += 1
+            else:
+                invalid += 1
+                if not args.quiet:
+                    print(f"game {number}: move {plies + 1}: {error}")
+    seconds = time.perf_counter() - start
+    games = valid + invalid
+    print(f"{games} games ({valid} valid, {invalid} invalid) in {seconds:.3f}s "
+          f"({games / max(seconds, 1e-9):.1f} games/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from player import Player
+from chess_piece import ChessPiece
+from pawn import Pawn
+from knight import Knight
+from bishop import Bishop
+from rook import Rook
+from queen import Queen
+from king import King
+
+# Piece kinds, in the order used to index piece sets and tables
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_TYPES = (Pawn, Knight, Bishop, Rook, Queen, King)
+
+# Color indexes: white pieces use codes 0-5 and black pieces use codes 6-11
+WHITE, BLACK = 0, 1
+COLORS = (Player.WHITE, Player.BLACK)
+COLOR_INDEX = {Player.WHITE: WHITE, Player.BLACK: BLACK}
+
+_KIND_OF = {piece_type: kind for kind, piece_type in enumerate(PIECE_TYPES)}
+
+# One shared piece instance per code, handed out wherever a code has to become a ChessPiece again
+PIECES = tuple(piece_type(player) for player in COLORS for piece_type in PIECE_TYPES)
+
+
+def piece_code(piece: ChessPiece) -> int:
+    """Converts a chess piece to its integer code.
+
+    Args:
+        piece (ChessPiece): The piece to encode.
+
+    Raises:
+        TypeError: If the piece is not one of the standard piece types.
+
+    Returns:
+        int: color * 6 + kind, a number from 0 to 11.
+    """
+    kind = _KIND_OF.get(type(piece))
+    if kind is None:
+        raise TypeError("Piece is not a standard ChessPiece.")
+    return COLOR_INDEX[piece.player] * 6 + kind
+
+
+def shared_piece(piece_type: type, player: Player) -> ChessPiece:
+    """Gets the shared instance of a piece, instead of allocating a new one.
+
+    Pieces hold nothing but their type and player, so every board can use the same instance for,
+    say, all white pawns.
+
+    Args:
+        piece_type (type): The piece class, such as Pawn or Queen.
+        player (Player): The player the piece belongs to.
+
+    Returns:
+        ChessPiece: The shared piece.
+    """
+    return PIECES[COLOR_INDEX[player] * 6 + _KIND_OF[piece_type]]
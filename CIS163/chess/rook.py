@@ -1,12 +1,15 @@
 
 from chess_piece import ChessPiece
 from move import Move
-from typing import List
+from typing import Iterator, List, Tuple
 from player import Player
+from geometry import ROOK_PATHS, ROOK_RAYS
 
 
 class Rook(ChessPiece):
     """Represents a rook chess piece, inheriting from ChessPiece."""
+    __slots__ = ()
+
     def __str__(self) -> str:
         """String representation of the rook piece.
 
@@ -38,54 +41,19 @@ class Rook(ChessPiece):
         if not super().is_valid_move(move, board):
             return False
 
-        # If the rook is moving horizontally
-        if move.from_row == move.to_row:
-            # If the rook is moving to the right
-            if move.from_col < move.to_col:
-                # If the path is clear and the destination is empty or occupied by the other player
-                for col in range(move.from_col + 1, move.to_col):
-                    if board[move.from_row][col] is not None:
-                        return False
-                if (
-                    board[move.to_row][move.to_col] is None
-                    or board[move.to_row][move.to_col].player != self.player
-                ):
-                    return True
-            # If the rook is moving to the left
-            elif move.from_col > move.to_col:
-                # If the path is clear and the destination is empty or occupied by the other player
-                for col in range(move.to_col + 1, move.from_col):
-                    if board[move.from_row][col] is not None:
-                        return False
-                if (
-                    board[move.to_row][move.to_col] is None
-                    or board[move.to_row][move.to_col].player != self.player
-                ):
-                    return True
+        # The move must follow one of the rook's directions over empty squares; the destination is
+        # already known to be empty or occupied by the other player
+        return self._path_is_clear(move, board, ROOK_PATHS)
 
-        # If the rook is moving vertically
-        elif move.from_col == move.to_col:
-            # If the rook is moving upwards
-            if move.from_row > move.to_row:
-                # If the path is clear and the destination is empty or occupied by the other player
-                for row in range(move.to_row + 1, move.from_row):
-                    if board[row][move.from_col] is not None:
-                        return False
-                if (
-                    board[move.to_row][move.to_col] is None
-                    or board[move.to_row][move.to_col].player != self.player
-                ):
-                    return True
-            # If the rook is moving downwards
-            elif move.from_row < move.to_row:
-                # If the path is clear and the destination is empty or occupied by the other player
-                for row in range(move.from_row + 1, move.to_row):
-                    if board[row][move.from_col] is not None:
-                        return False
-                if (
-                    board[move.to_row][move.to_col] is None
-                    or board[move.to_row][move.to_col].player != self.player
-                ):
-                    return True
+    def reachable_squares(self, row: int, col: int, board: List[List["ChessPiece"]]) -> Iterator[Tuple[int, int]]:
+        """Generates the squares the rook can reach along its row and column.
 
-        return False
+        Args:
+            row (int): The row the rook is standing on.
+            col (int): The column the rook is standing on.
+            board (List[List["ChessPiece"]]): The chess board's current state.
+
+        Yields:
+            Tuple[int, int]: The (row, col) of each reachable square.
+        """
+        return self._slide(row, col, board, ROOK_RAYS)
@@ -0,0 +1,482 @@
+import time
+from typing import Iterable, List, Optional, Tuple
+from move import Move, MoveList, MOVE_CAPTURE, MOVE_PROMOTION, decode_move
+from evaluation import evaluate, PIECE_VALUES
+from geometry import KNIGHT_TARGETS, RAYS, ROOK_DIRECTIONS, BISHOP_DIRECTIONS
+from piece_codes import PIECE_TYPES
+from player import Player
+from pawn import Pawn
+from knight import Knight
+from bishop import Bishop
+from rook import Rook
+from queen import Queen
+from king import King
+from transposition import TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+
+# Score of being checkmated at the root; mates found deeper in the tree score slightly less
+# so the search prefers the quickest mate and the slowest loss.
+MATE_SCORE = 100000
+INFINITY = MATE_SCORE + 1
+# Scores beyond this are mates; they are stored in a transposition table relative to the position
+# rather than the root, so the entry stays right wherever the position is reached
+MATE_BOUND = MATE_SCORE - 1000
+
+# How many nodes are searched between looks at the clock; a quiescence node can take a tenth of a
+# millisecond, so this keeps a timed search within a few milliseconds of its budget
+CLOCK_CHECK_INTERVAL = 32
+
+# Move ordering scores, highest first: the table's best move, then captures and promotions by most
+# valuable victim and least valuable attacker, then the killer moves of the ply, then quiet moves by
+# how often they have caused cutoffs. They are kept above the 16 bits of the packed move they sort.
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 29
+KILLER_SCORE = 1 << 28
+# History scores are halved when one reaches this, so they stay below the killers
+HISTORY_LIMIT = 1 << 20
+
+# The rank of each piece type as a victim or attacker, pawn 1 to king 6
+_RANKS = {piece_type: kind + 1 for kind, piece_type in enumerate(PIECE_TYPES)}
+# What a promotion adds to a move's capture score: it wins about a queen
+_PROMOTION_GAIN = 5 * 8
+
+# The material value of each piece type, for static exchange evaluation
+_VALUES = {piece_type: PIECE_VALUES[kind] for kind, piece_type in enumerate(PIECE_TYPES)}
+_PROMOTION_VALUE = PIECE_VALUES[4] - PIECE_VALUES[0]
+
+# The pieces that attack along each direction from a square: sliders at any distance, and the king
+# or a pawn of the right color one step away
+_SLIDERS = {direction: (Rook, Queen) for direction in ROOK_DIRECTIONS}
+_SLIDERS.update({direction: (Bishop, Queen) for direction in BISHOP_DIRECTIONS})
+_PAWN_DIRECTIONS = {Player.WHITE: ((1, -1), (1, 1)), Player.BLACK: ((-1, -1), (-1, 1))}
+_OPPONENTS = {Player.WHITE: Player.BLACK, Player.BLACK: Player.WHITE}
+
+
+def _least_valuable_attacker(board, square: int, player: Player, taken: set) -> Optional[Tuple[int, int]]:
+    """Finds the cheapest piece of a player attacking a square, looking through the squares in
+    `taken` as if they were empty so pieces lined up behind an exchanged one join in.
+
+    Returns:
+        Optional[Tuple[int, int]]: The attacker's value and square, or None if there is none.
+    """
+    best = None
+    for row, col in KNIGHT_TARGETS[square]:
+        piece = board[row][col]
+        if type(piece) is Knight and piece.player == player and row * 8 + col not in taken:
+            best = (_VALUES[Knight], row * 8 + col)
+            break
+    pawn_directions = _PAWN_DIRECTIONS[player]
+    for direction, sliders in _SLIDERS.items():
+        for distance, (row, col) in enumerate(RAYS[direction][square]):
+            piece = board[row][col]
+            if piece is None or row * 8 + col in taken:
+                continue
+            if piece.player == player:
+                piece_type = type(piece)
+                if (piece_type in sliders or (distance == 0 and (piece_type is King or (
+                        piece_type is Pawn and direction in pawn_directions)))):
+                    value = _VALUES[piece_type]
+                    if best is None or value < best[0]:
+                        best = (value, row * 8 + col)
+            break
+    return best
+
+
+def _worth_trying(board, code: int) -> bool:
+    """Decides whether a capture or promotion is worth searching: it must not lose material."""
+    if not code & MOVE_PROMOTION:
+        # Taking a piece worth at least the capturing one cannot lose material, so needs no exchange
+        from_square, to_square = code & 63, code >> 6 & 63
+        if (_VALUES[type(board[to_square >> 3][to_square & 7])]
+                >= _VALUES[type(board[from_square >> 3][from_square & 7])]):
+            return True
+    return static_exchange(board, code) >= 0
+
+
+def static_exchange(board, code: int) -> int:
+    """Works out the material a capture wins once every piece attacking the square has recaptured
+    cheapest first, with each side free to stop when carrying on would lose more.
+
+    Args:
+        board (list): The chess board, indexed as board[row][col].
+        code (int): The packed capture or promotion (see move.pack_move) of the player to move.
+
+    Returns:
+        int: The material the moving side gains in centipawns; negative if the capture loses material.
+    """
+    from_square, to_square = code & 63, code >> 6 & 63
+    piece = board[from_square >> 3][from_square & 7]
+    victim = board[to_square >> 3][to_square & 7]
+    gains = [0 if victim is None else _VALUES[type(victim)]]
+    on_square = _VALUES[type(piece)]
+    if code & MOVE_PROMOTION:
+        gains[0] += _PROMOTION_VALUE
+        on_square += _PROMOTION_VALUE
+
+    # Alternate recaptures, each gain being what the side capturing would be up if the other side stopped
+    taken = {from_square}
+    player = _OPPONENTS[piece.player]
+    while True:
+        attacker = _least_valuable_attacker(board, to_square, player, taken)
+        if attacker is None:
+            break
+        gains.append(on_square - gains[-1])
+        on_square, square = attacker
+        taken.add(square)
+        player = _OPPONENTS[player]
+
+    # Let each side stand pat instead of recapturing where that is better, from the last capture back
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
+
+
+class SearchTimeout(Exception):
+    """Exception raised inside a search when its time budget has run out."""
+
+
+class Searcher:
+    """Finds the best move for the player to move with a negamax alpha-beta search.
+
+    The searcher plays packed moves on the model with make_packed_move/unmake_move and leaves it as
+    it found it. Moves are generated into one reusable MoveList per ply, so searching builds no Move
+    objects apart from the one returned. With a transposition table, positions already searched deep
+    enough through another move order are answered from the table.
+
+    Unless ordering is turned off, moves are tried best first so alpha-beta cuts off sooner: the best
+    move the table has for the position, captures by most valuable victim / least valuable attacker,
+    the two killer moves that last caused a cutoff at the same ply, then quiet moves by their history
+    score, which grows with every cutoff the move causes anywhere in the tree.
+
+    Attributes:
+        model (ChessModel): The game being searched.
+        table (Optional[TranspositionTable]): The transposition table shared by the searches, if any.
+        ordering (bool): Whether moves are ordered before they are searched.
+        quiescence (bool): Whether the search carries on through captures and promotions at depth 0,
+            skipping captures that lose material by static exchange evaluation, instead of
+            evaluating in the middle of an exchange.
+        nodes (int): The number of positions visited by the last search.
+        depth_reached (int): The deepest search the last search completed.
+    """
+
+    def __init__(self, model, table: Optional[TranspositionTable] = None, ordering: bool = True,
+                 quiescence: bool = True):
+        """Initializes a searcher for a chess model.
+
+        Args:
+            model (ChessModel): The game to search.
+            table (TranspositionTable, optional): The transposition table to use. Defaults to none.
+            ordering (bool, optional): Whether to order moves. Defaults to True; turning it off is
+                for measuring what ordering saves.
+            quiescence (bool, optional): Whether to search captures past the depth. Defaults to True.
+        """
+        self.model = model
+        self.table = table
+        self.ordering = ordering
+        self.quiescence = quiescence
+        self.nodes = 0
+        self.depth_reached = 0
+        self.__deadline = None
+        # The best root move and score of the depth being searched, kept up to date as moves finish
+        self.__root_best: Optional[Tuple[int, int]] = None
+        self.__move_lists: List[MoveList] = []
+        # Two killer moves per ply, and history scores indexed by the from and to squares of a move
+        self.__killers: List[List[int]] = []
+        self.__history = [0] * 4096
+
+    def search(self, depth: int) -> Tuple[Optional[Move], int]:
+        """Searches the current position to a fixed depth.
+
+        Args:
+            depth (int): The number of plies to look ahead. Must be at least 1.
+
+        Returns:
+            Tuple[Optional[Move], int]: The best move (None if there are no legal moves) and its
+                score in centipawns from the point of view of the player to move.
+        """
+        self.nodes = 0
+        self.depth_reached = 0
+        self.__deadline = None
+        self.__new_search()
+        moves = self.__root_moves()
+        if not moves:
+            return None, self.__no_moves_score(0)
+        best_move, score = self.__search_root(depth, moves)
+        self.depth_reached = depth
+        return decode_move(best_move), score
+
+    def search_timed(self, time_budget_ms: int, max_depth: int = 64) -> Tuple[Optional[Move], int]:
+        """Searches the current position with iterative deepening until the time budget runs out.
+
+        Every depth, the first included, is abandoned as soon as the budget is spent, and the best
+        move of the last completed depth is returned. If depth 1 does not finish, the best root
+        move searched so far is returned, or the first move in search order if none was, and
+        depth_reached is left at 0.
+
+        Args:
+            time_budget_ms (int): The time allowed for the search, in milliseconds.
+            max_depth (int, optional): The deepest search to try. Defaults to 64.
+
+        Returns:
+            Tuple[Optional[Move], int]: The best move (None if there are no legal moves) and its
+                score in centipawns from the point of view of the player to move.
+        """
+        deadline = time.perf_counter() + time_budget_ms / 1000
+        self.nodes = 0
+        self.depth_reached = 0
+        self.__deadline = None
+        self.__new_search()
+        model = self.model
+        moves = self.__root_moves()
+        if not moves:
+            return None, self.__no_moves_score(0)
+
+        history_length = len(model.move_history)
+        best_move, best_score = moves[0], evaluate(model.board, model.current_player)
+        self.__root_best = None
+        self.__deadline = deadline
+        for depth in range(1, max_depth + 1):
+            try:
+                move, score = self.__search_root(depth, moves)
+            except SearchTimeout:
+                # Take back the moves the abandoned search was in the middle of
+                while len(model.move_history) > history_length:
+                    model.unmake_move()
+                # Without a finished depth, fall back on the best root move searched so far
+                if depth == 1 and self.__root_best is not None:
+                    best_move, best_score = self.__root_best
+                break
+            best_move, best_score = move, score
+            self.depth_reached = depth
+
+            # Stop once a forced mate is found or time is up, otherwise search the best move first next time
+            if abs(score) > MATE_BOUND or time.perf_counter() >= deadline:
+                break
+            moves.remove(move)
+            moves.insert(0, move)
+
+        self.__deadline = None
+        return decode_move(best_move), best_score
+
+    def __move_list(self, ply: int) -> MoveList:
+        """Gets the move list kept for a ply, making it the first time that ply is reached."""
+        if ply == len(self.__move_lists):
+            self.__move_lists.append(MoveList())
+        return self.__move_lists[ply]
+
+    def __new_search(self):
+        """Starts a search: ages the table and forgets the killers and history of the last one."""
+        if self.table is not None:
+            self.table.new_search()
+        self.__killers = []
+        history = self.__history
+        for index in range(4096):
+            history[index] = 0
+
+    def __root_moves(self) -> List[int]:
+        """Generates the packed root moves, in search order."""
+        moves = self.model.generate_moves(self.__move_list(0))
+        if not self.ordering:
+            return list(moves)
+        hash_move = 0
+        if self.table is not None:
+            entry = self.table.probe(self.model.position_hash)
+            if entry is not None:
+                hash_move = entry[3]
+        return self.__order(moves, 0, hash_move)
+
+    def __killer_moves(self, ply: int) -> List[int]:
+        """Gets the killer moves kept for a ply, making room for them the first time that ply is reached."""
+        killers = self.__killers
+        while len(killers) <= ply:
+            killers.append([0, 0])
+        return killers[ply]
+
+    def __order(self, moves: Iterable[int], ply: int, hash_move: int) -> List[int]:
+        """Sorts packed moves best first.
+
+        Each move is tagged with its ordering score above its 16 bits, so one integer sort orders
+        them and masking gets the move back.
+        """
+        board = self.model.board
+        killers = self.__killer_moves(ply)
+        history = self.__history
+        keyed = []
+        for code in moves:
+            if code == hash_move:
+                score = HASH_MOVE_SCORE
+            elif code & (MOVE_CAPTURE | MOVE_PROMOTION):
+                score = CAPTURE_SCORE
+                if code & MOVE_CAPTURE:
+                    to_square = code >> 6 & 63
+                    attacker = _RANKS[type(board[code >> 3 & 7][code & 7])]
+                    score += _RANKS[type(board[to_square >> 3][to_square & 7])] * 8 - attacker
+                if code & MOVE_PROMOTION:
+                    score += _PROMOTION_GAIN
+            elif code == killers[0]:
+                score = KILLER_SCORE + 1
+            elif code == killers[1]:
+                score = KILLER_SCORE
+            else:
+                score = history[code & 0xFFF]
+            keyed.append(score << 16 | code)
+        keyed.sort(reverse=True)
+        return [key & 0xFFFF for key in keyed]
+
+    def __record_cutoff(self, move: int, depth: int, ply: int):
+        """Remembers a quiet move that caused a beta cutoff as a killer and in the history scores."""
+        killers = self.__killer_moves(ply)
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.__history
+        index = move & 0xFFF
+        history[index] += depth * depth
+        if history[index] >= HISTORY_LIMIT:
+            for square_pair in range(4096):
+                history[square_pair] >>= 1
+
+    def __search_root(self, depth: int, moves: List[int]) -> Tuple[int, int]:
+        """Searches each packed root move to a fixed depth and returns the best one with its score."""
+        model = self.model
+        best_move, alpha = None, -INFINITY
+        for move in moves:
+            model.make_packed_move(move)
+            score = -self.negamax(depth - 1, -INFINITY, -alpha, 1)
+            model.unmake_move()
+            if best_move is None or score > alpha:
+                best_move, alpha = move, score
+                self.__root_best = (best_move, alpha)
+        if self.table is not None:
+            self.table.store(model.position_hash, depth, _to_table(alpha, 0), BOUND_EXACT, best_move)
+        return best_move, alpha
+
+    def negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """Scores the current position by searching `depth` more plies.
+
+        Args:
+            depth (int): The remaining depth; at 0 the position is evaluated statically.
+            alpha (int): The score the player to move is already guaranteed.
+            beta (int): The score above which the opponent will avoid this position.
+            ply (int): The distance from the root, used to prefer shorter mates.
+
+        Returns:
+            int: The score from the point of view of the player to move.
+        """
+        self.nodes += 1
+        if (self.__deadline is not None and self.nodes % CLOCK_CHECK_INTERVAL == 0
+                and time.perf_counter() >= self.__deadline):
+            raise SearchTimeout()
+        model = self.model
+        if depth <= 0:
+            if self.quiescence:
+                return self.quiesce(alpha, beta, ply)
+            return evaluate(model.board, model.current_player)
+
+        # Use a result from the table if it was searched at least as deep and settles this window,
+        # otherwise its best move is tried first
+        table = self.table
+        hash_move = 0
+        if table is not None:
+            key = model.position_hash
+            entry = table.probe(key)
+            if entry is not None:
+                entry_depth, score, bound, hash_move = entry
+                if entry_depth >= depth:
+                    score = _from_table(score, ply)
+                    if (bound == BOUND_EXACT or (bound == BOUND_LOWER and score >= beta)
+                            or (bound == BOUND_UPPER and score <= alpha)):
+                        return score
+
+        moves = model.generate_moves(self.__move_list(ply))
+        if not moves.count:
+            return self.__no_moves_score(ply)
+        if self.ordering and moves.count > 1:
+            moves = self.__order(moves, ply, hash_move)
+        original_alpha, best_move = alpha, 0
+        for move in moves:
+            model.make_packed_move(move)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            model.unmake_move()
+            if score >= beta:
+                if self.ordering and not move & (MOVE_CAPTURE | MOVE_PROMOTION):
+                    self.__record_cutoff(move, depth, ply)
+                if table is not None:
+                    table.store(key, depth, _to_table(score, ply), BOUND_LOWER, move)
+                return score
+            if score > alpha:
+                alpha, best_move = score, move
+        if table is not None:
+            table.store(key, depth, _to_table(alpha, ply), BOUND_EXACT if alpha > original_alpha else BOUND_UPPER,
+                        best_move)
+        return alpha
+
+    def quiesce(self, alpha: int, beta: int, ply: int) -> int:
+        """Scores the current position once the captures and promotions worth making have been played out.
+
+        The player to move may stand pat on the static evaluation unless in check, when every
+        legal move is searched instead. Captures that lose material by static exchange evaluation
+        are skipped.
+
+        Args:
+            alpha (int): The score the player to move is already guaranteed.
+            beta (int): The score above which the opponent will avoid this position.
+            ply (int): The distance from the root.
+
+        Returns:
+            int: The score from the point of view of the player to move.
+        """
+        self.nodes += 1
+        if (self.__deadline is not None and self.nodes % CLOCK_CHECK_INTERVAL == 0
+                and time.perf_counter() >= self.__deadline):
+            raise SearchTimeout()
+        model = self.model
+        board = model.board
+        in_check = model.in_check(model.current_player)
+        if not in_check:
+            score = evaluate(board, model.current_player)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        moves = model.generate_moves(self.__move_list(ply))
+        if not moves.count:
+            return self.__no_moves_score(ply)
+        if not in_check:
+            moves = [code for code in moves if code & (MOVE_CAPTURE | MOVE_PROMOTION) and _worth_trying(board, code)]
+        if self.ordering and len(moves) > 1:
+            moves = self.__order(moves, ply, 0)
+        for move in moves:
+            model.make_packed_move(move)
+            score = -self.quiesce(-beta, -alpha, ply + 1)
+            model.unmake_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def __no_moves_score(self, ply: int) -> int:
+        """Scores a position without legal moves: checkmate is a loss, stalemate a draw."""
+        if self.model.in_check(self.model.current_player):
+            return -MATE_SCORE + ply
+        return 0
+
+
+def _to_table(score: int, ply: int) -> int:
+    """Makes a mate score count from the position rather than the root before it is stored."""
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score: int, ply: int) -> int:
+    """Makes a stored mate score count from the root again."""
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
@@ -0,0 +1,143 @@
+"""Headless self-play: plays ChessAi against itself and streams the games to a file.
+
+Nothing here imports pygame, so it runs without a display. Each game is written as one JSON line
+as soon as it is finished. Run from this directory, for example:
+
+    python selfplay.py games.jsonl --games 1000 --workers 8 --seed 42
+
+Add --database games.cgdb to also append the games to a binary game database (see gamedb.py).
+"""
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Iterator, Optional
+from chess_model import ChessModel, ChessAi, AiStrategy
+from move import move_name, parse_move_name
+from gamedb import GameDatabase
+from tablebase import Tablebase
+from player import Player
+
+
+def play_game(seed: int, depth: int = 1, random_plies: int = 4, max_plies: int = 200,
+              strategy: AiStrategy = AiStrategy.Search, bitboard: bool = False,
+              tablebase: Optional[str] = None) -> Dict:
+    """Plays one game of the AI against itself.
+
+    The first `random_plies` moves are picked at random so games with different seeds differ; after
+    that both sides use `strategy`. The game is seeded, so the same arguments always give the same game.
+
+    Args:
+        seed (int): The random seed for the game.
+        depth (int, optional): The search depth in plies. Defaults to 1.
+        random_plies (int, optional): The number of random opening moves. Defaults to 4.
+        max_plies (int, optional): The number of moves after which the game is a draw. Defaults to 200.
+        strategy (AiStrategy, optional): How both sides choose moves. Defaults to searching.
+        bitboard (bool, optional): Whether to use the bitboard backend. Defaults to False.
+        tablebase (str, optional): A tablebase directory (see tablebase.py). Games reaching a
+            position it covers end there with the tablebase result. Defaults to none.
+
+    Returns:
+        Dict: The seed, the result ('1-0', '0-1' or '1/2-1/2'), the reason the game ended and the
+            list of moves (see move.move_name).
+    """
+    random.seed(seed)
+    model = ChessModel(bitboard)
+    opening_ai = ChessAi(model, AiStrategy.Random)
+    ai = ChessAi(model, strategy, depth)
+    moves = []
+    endgames = None if tablebase is None else Tablebase(tablebase)
+    seen = {model.position_hash: 1}
+    result, reason = "1/2-1/2", "move limit"
+
+    while len(moves) < max_plies:
+        move = (opening_ai if len(moves) < random_plies else ai).choose_move()
+        if move is None:
+            if model.in_check(model.current_player):
+                result = "0-1" if model.current_player == Player.WHITE else "1-0"
+                reason = "checkmate"
+            else:
+                reason = "stalemate"
+            break
+        model.make_move(move)
+        moves.append(move_name(move))
+
+        # A position seen for the third time with the same player to move is a draw
+        seen[model.position_hash] = seen.get(model.position_hash, 0) + 1
+        if seen[model.position_hash] >= 3:
+            reason = "repetition"
+            break
+
+        adjudicated = None if endgames is None else endgames.adjudicate(model)
+        if adjudicated is not None:
+            result, reason = adjudicated, "tablebase"
+            break
+
+    return {"seed": seed, "result": result, "reason": reason, "moves": moves}
+
+
+def play_games(games: int, seed: int, workers: int = 1, **options) -> Iterator[Dict]:
+    """Plays many games, in worker processes when more than one worker is asked for.
+
+    Games are yielded one at a time in order of their number, so they can be written out as they
+    arrive. Game number n uses seed + n, so the output only depends on the arguments.
+
+    Args:
+        games (int): The number of games to play.
+        seed (int): The seed of the first game.
+        workers (int, optional): The number of worker processes. Defaults to 1.
+        **options: Passed on to play_game.
+
+    Yields:
+        Dict: Each game as returned by play_game, plus its number under 'game'.
+    """
+    task = partial(play_game, **options)
+    seeds = range(seed, seed + games)
+    if workers <= 1:
+        records = map(task, seeds)
+        for number, record in enumerate(records):
+            yield {"game": number, **record}
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for number, record in enumerate(pool.map(task, seeds)):
+            yield {"game": number, **record}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play ChessAi against itself without a display.")
+    parser.add_argument("output", help="file to write one JSON game record per line to")
+    parser.add_argument("--games", type=int, default=10, help="number of games to play")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--depth", type=int, default=1, help="search depth in plies")
+    parser.add_argument("--random-plies", type=int, default=4, help="number of random opening moves")
+    parser.add_argument("--max-plies", type=int, default=200, help="moves before a game is drawn")
+    parser.add_argument("--random", action="store_true", help="play random moves instead of searching")
+    parser.add_argument("--bitboard", action="store_true", help="use the bitboard backend")
+    parser.add_argument("--database", help="binary game database to append the games to as well")
+    parser.add_argument("--tablebase", help="tablebase directory used to end games it covers")
+    args = parser.parse_args()
+
+    strategy = AiStrategy.Random if args.random else AiStrategy.Search
+    start = time.perf_counter()
+    played = 0
+    database = GameDatabase(args.database) if args.database else None
+    with open(args.output, "w") as output:
+        for record in play_games(args.games, args.seed, args.workers, depth=args.depth,
+                                 random_plies=args.random_plies, max_plies=args.max_plies,
+                                 strategy=strategy, bitboard=args.bitboard, tablebase=args.tablebase):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            if database is not None:
+                database.append([parse_move_name(name) for name in record["moves"]], record["result"])
+            played += 1
+    if database is not None:
+        database.close()
+    seconds = time.perf_counter() - start
+    print(f"{played} games in {seconds:.3f}s ({played / max(seconds, 1e-9):.2f} games/s)")
+
+
+if __name__ == "__main__":
+    main()
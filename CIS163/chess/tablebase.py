@@ -0,0 +1,552 @@
+"""Endgame tablebases: perfect play for positions with at most four pieces, kings included.
+
+A table covers one material set, named by the white pieces then the black pieces, for example 'KQK'
+(king and queen against a king) or 'KRKP'. Sets are stored with the stronger side as white; a
+position where black is stronger is probed by mirroring the board. Each table is indexed by the
+squares of its pieces and the player to move, and holds win/draw/loss packed four to a byte plus the
+distance to mate in plies. Tables are generated by retrograde analysis under this game's rules: no
+castling, no en passant, and pawns promote to a queen. A three-piece table takes seconds to
+generate; a four-piece table holds 33.5 million positions and takes the better part of an hour.
+
+Generate tables into a directory, or probe a position, from this directory, for example:
+
+    python tablebase.py generate KQK KRK KPK --directory tables
+    python tablebase.py probe "8/8/8/4k3/8/8/8/4K2Q w - - 0 1" --directory tables
+"""
+import argparse
+import mmap
+import os
+import struct
+import time
+from array import array
+from enum import Enum
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+from bitboard import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, rook_attacks, bishop_attacks
+from chess_model import ChessModel
+from move import Move
+from piece_codes import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, COLOR_INDEX, piece_code
+from evaluation import PIECE_VALUES
+
+MAX_PIECES = 4
+MAGIC = b"CTB1"
+# Magic and number of pieces
+FILE_HEADER = struct.Struct("<4sB3x")
+
+# Letters by piece kind, and the order pieces take within one side of a material set
+PIECE_LETTERS = "PNBRQK"
+SIDE_ORDER = "KQRBNP"
+
+# Values stored in the win/draw/loss table, from the point of view of the player to move
+DRAW, WIN, LOSS, ILLEGAL = 0, 1, 2, 3
+
+
+class Wdl(Enum):
+    """Represents the outcome of a position with perfect play, for the player to move."""
+
+    Draw = DRAW
+    Win = WIN
+    Loss = LOSS
+
+    def __str__(self):
+        return self.name
+
+
+def _side(material: str) -> Tuple[str, str]:
+    """Splits a material set such as 'KQKR' into the white and the black pieces."""
+    second_king = material.find("K", 1)
+    if not material.startswith("K") or second_king < 0:
+        raise ValueError(f"Material {material!r} must name a king for each side, for example 'KQK'.")
+    white, black = material[:second_king], material[second_king:]
+    for side in (white, black):
+        if side.count("K") != 1 or any(letter not in SIDE_ORDER for letter in side):
+            raise ValueError(f"Material {material!r} is not made of the letters {SIDE_ORDER}.")
+    return white, black
+
+
+def _sort_side(side: str) -> str:
+    return "".join(sorted(side, key=SIDE_ORDER.index))
+
+
+def _strength(side: str) -> Tuple[int, List[int]]:
+    """Ranks one side's pieces by their total value, then by the pieces themselves."""
+    return (sum(PIECE_VALUES[PIECE_LETTERS.index(letter)] for letter in side),
+            [-SIDE_ORDER.index(letter) for letter in side])
+
+
+def canonical_material(material: str) -> Tuple[str, bool]:
+    """Finds the stored name of a material set.
+
+    Args:
+        material (str): The material, white pieces first, for example 'KKQ'.
+
+    Raises:
+        ValueError: If the material is malformed or has more than MAX_PIECES pieces.
+
+    Returns:
+        Tuple[str, bool]: The stored name, for example 'KQK', and whether the colors had to be
+            swapped to get it.
+    """
+    white, black = (_sort_side(side) for side in _side(material))
+    if len(white) + len(black) > MAX_PIECES:
+        raise ValueError(f"Tablebases cover at most {MAX_PIECES} pieces, not {material!r}.")
+    if _strength(black) > _strength(white):
+        return black + white, True
+    return white + black, False
+
+
+def _table_codes(material: str) -> List[int]:
+    """Lists the piece codes of a stored material set in table order."""
+    white, black = _side(material)
+    return [WHITE * 6 + PIECE_LETTERS.index(letter) for letter in white] + \
+        [BLACK * 6 + PIECE_LETTERS.index(letter) for letter in black]
+
+
+def _multipliers(count: int) -> List[int]:
+    """Lists what each piece's square is multiplied by in the index of a table of `count` pieces."""
+    return [2 * 64 ** (count - 1 - index) for index in range(count)]
+
+
+def _material_of(codes: List[int]) -> str:
+    """Names the material of a list of piece codes, white pieces first."""
+    white = "".join(PIECE_LETTERS[code % 6] for code in codes if code < 6)
+    black = "".join(PIECE_LETTERS[code % 6] for code in codes if code >= 6)
+    return _sort_side(white) + _sort_side(black)
+
+
+def _attacks(code: int, square: int, occupied: int) -> int:
+    """The squares a piece attacks from a square with the given occupancy."""
+    color, kind = divmod(code, 6)
+    if kind == PAWN:
+        return PAWN_ATTACKS[color][square]
+    if kind == KNIGHT:
+        return KNIGHT_ATTACKS[square]
+    if kind == KING:
+        return KING_ATTACKS[square]
+    if kind == ROOK:
+        return rook_attacks(square, occupied)
+    if kind == BISHOP:
+        return bishop_attacks(square, occupied)
+    return rook_attacks(square, occupied) | bishop_attacks(square, occupied)
+
+
+def _is_attacked(square: int, color: int, codes: List[int], squares: List[int], occupied: int,
+                 skip: int = -1) -> bool:
+    """Checks whether any piece of a color, other than piece `skip`, attacks a square."""
+    for index, code in enumerate(codes):
+        if index != skip and code // 6 == color and _attacks(code, squares[index], occupied) >> square & 1:
+            return True
+    return False
+
+
+def _legal_moves(codes: List[int], squares: List[int], color: int) -> List[Tuple[int, int, int]]:
+    """Lists the legal moves of one color as (piece index, destination, index of the captured piece or -1)."""
+    occupied = 0
+    own = 0
+    for code, square in zip(codes, squares):
+        occupied |= 1 << square
+        if code // 6 == color:
+            own |= 1 << square
+    king = codes.index(color * 6 + KING)
+    king_square = squares[king]
+
+    # The squares the opponent attacks with the king lifted off the board, which it may not step onto
+    lifted = occupied & ~(1 << king_square)
+    danger = 0
+    sliders = False
+    for index, code in enumerate(codes):
+        if code // 6 != color:
+            danger |= _attacks(code, squares[index], lifted)
+            sliders = sliders or code % 6 in (BISHOP, ROOK, QUEEN)
+    # Unless the king is in check, only a sliding piece whose line a move opens can leave it attacked
+    careful = sliders or danger >> king_square & 1
+
+    moves = []
+    for index, code in enumerate(codes):
+        if code // 6 != color:
+            continue
+        square = squares[index]
+        kind = code % 6
+        if kind == KING:
+            targets = KING_ATTACKS[square] & ~own & ~danger
+        elif kind == PAWN:
+            step, start_row = (-8, 6) if color == WHITE else (8, 1)
+            targets = PAWN_ATTACKS[color][square] & occupied & ~own
+            ahead = square + step
+            if not occupied >> ahead & 1:
+                targets |= 1 << ahead
+                if square // 8 == start_row and not occupied >> (ahead + step) & 1:
+                    targets |= 1 << (ahead + step)
+        else:
+            targets = _attacks(code, square, occupied) & ~own
+
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            target = low.bit_length() - 1
+            captured = squares.index(target) if occupied & low else -1
+            if careful and kind != KING:
+                # Try the move and see whether the king is left attacked
+                squares[index] = target
+                after = (occupied & ~(1 << square)) | low
+                safe = not _is_attacked(king_square, 1 - color, codes, squares, after, captured)
+                squares[index] = square
+                if not safe:
+                    continue
+            moves.append((index, target, captured))
+    return moves
+
+
+def _unmoves(codes: List[int], squares: List[int], color: int) -> List[Tuple[int, int]]:
+    """Lists the (piece index, origin) of every quiet move of one color that could have led here.
+
+    Captures and promotions change the material, so they never lead to a position of the same table.
+    """
+    occupied = 0
+    for square in squares:
+        occupied |= 1 << square
+    found = []
+    for index, code in enumerate(codes):
+        if code // 6 != color:
+            continue
+        square = squares[index]
+        if code % 6 == PAWN:
+            step, double_row = (8, 4) if color == WHITE else (-8, 3)
+            behind = square + step
+            if not 8 <= behind < 56 or occupied >> behind & 1:
+                continue
+            found.append((index, behind))
+            if square // 8 == double_row and not occupied >> (behind + step) & 1:
+                found.append((index, behind + step))
+        else:
+            # Pieces other than pawns move the same way backwards as forwards
+            origins = _attacks(code, square, occupied) & ~occupied
+            while origins:
+                low = origins & -origins
+                origins ^= low
+                found.append((index, low.bit_length() - 1))
+    return found
+
+
+class _Table:
+    """One material set's values, either freshly generated or read from a file."""
+
+    def __init__(self, material: str, wdl, dtm):
+        self.material = material
+        self.codes = _table_codes(material)
+        self.multipliers = _multipliers(len(self.codes))
+        self.__wdl = wdl
+        self.__dtm = dtm
+
+    def index(self, squares: List[int], color: int) -> int:
+        return sum(square * multiplier for square, multiplier in zip(squares, self.multipliers)) + color
+
+    def value(self, index: int) -> Tuple[int, int]:
+        """The (win/draw/loss, distance to mate) of an index."""
+        return (self.__wdl[index >> 2] >> ((index & 3) * 2)) & 3, self.__dtm[index]
+
+
+def _pack(wdl: bytearray) -> bytes:
+    """Packs one-byte win/draw/loss values four to a byte."""
+    return bytes(a | b << 2 | c << 4 | d << 6 for a, b, c, d in zip(wdl[0::4], wdl[1::4], wdl[2::4], wdl[3::4]))
+
+
+class Tablebase:
+    """A directory of endgame tables, loaded when first probed.
+
+    Attributes:
+        directory (str): Where the table files are kept.
+    """
+
+    def __init__(self, directory: str):
+        """Opens a tablebase directory.
+
+        Args:
+            directory (str): Where the table files are kept; created when a table is generated.
+        """
+        self.directory = directory
+        self.__tables: Dict[str, Optional[_Table]] = {}
+
+    def path(self, material: str) -> str:
+        """str: The file of a stored material set."""
+        return os.path.join(self.directory, material + ".tb")
+
+    def __table(self, material: str) -> Optional[_Table]:
+        """Finds a stored material set's table, or None if it has not been generated."""
+        if material not in self.__tables:
+            path = self.path(material)
+            table = None
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, pieces = FILE_HEADER.unpack_from(data, 0)
+                size = 2 * 64 ** pieces
+                if magic != MAGIC or len(data) != FILE_HEADER.size + size // 4 + size:
+                    raise ValueError(f"{path} is not a tablebase file.")
+                wdl = memoryview(data)[FILE_HEADER.size:FILE_HEADER.size + size // 4]
+                dtm = memoryview(data)[FILE_HEADER.size + size // 4:]
+                table = _Table(material, wdl, dtm)
+            self.__tables[material] = table
+        return self.__tables[material]
+
+    def _probe_pieces(self, codes: List[int], squares: List[int], color: int) -> Optional[Tuple[int, int]]:
+        """Probes a position given as piece codes, squares and the color to move."""
+        try:
+            material, swap = canonical_material(_material_of(codes))
+        except ValueError:
+            return None
+        table = self.__table(material)
+        if table is None:
+            return None
+        if swap:
+            # Mirror the board top to bottom and swap the colors
+            codes = [(code + 6) % 12 for code in codes]
+            squares = [square ^ 56 for square in squares]
+            color = 1 - color
+        # Put the pieces in table order; identical pieces may come in any order
+        placed = sorted(zip(codes, squares),
+                        key=lambda piece: (piece[0] // 6, SIDE_ORDER.index(PIECE_LETTERS[piece[0] % 6])))
+        return table.value(table.index([square for _, square in placed], color))
+
+    def probe(self, model: ChessModel) -> Optional[Tuple[Wdl, int]]:
+        """Looks up the outcome of the model's position with perfect play.
+
+        Args:
+            model (ChessModel): The game to probe; it is left unchanged.
+
+        Returns:
+            Optional[Tuple[Wdl, int]]: The outcome for the player to move and the number of plies to
+                mate (0 for a draw), or None if the position is not covered by a generated table.
+        """
+        codes, squares = [], []
+        for row in range(8):
+            for col in range(8):
+                piece = model.board[row][col]
+                if piece is not None:
+                    if len(codes) == MAX_PIECES:
+                        return None
+                    codes.append(piece_code(piece))
+                    squares.append(row * 8 + col)
+        found = self._probe_pieces(codes, squares, COLOR_INDEX[model.current_player])
+        if found is None or found[0] == ILLEGAL:
+            return None
+        return Wdl(found[0]), found[1]
+
+    def best_move(self, model: ChessModel) -> Optional[Move]:
+        """Picks a move that keeps the best outcome: the fastest mate, the slowest loss, or a draw.
+
+        Args:
+            model (ChessModel): The game to pick a move in; it is left unchanged.
+
+        Returns:
+            Optional[Move]: The move, or None if the position or a position after one of its moves
+                is not covered by a generated table, or there are no legal moves.
+        """
+        if self.probe(model) is None:
+            return None
+        best_move, best_key = None, None
+        for move in model.legal_moves():
+            model.make_move(move)
+            found = self.probe(model)
+            model.unmake_move()
+            if found is None:
+                return None
+            wdl, dtm = found
+            # Rank moves by what they leave the opponent: a loss soonest, then a draw, then a win latest
+            if wdl == Wdl.Loss:
+                key = (0, dtm)
+            elif wdl == Wdl.Draw:
+                key = (1, 0)
+            else:
+                key = (2, -dtm)
+            if best_key is None or key < best_key:
+                best_move, best_key = move, key
+        return best_move
+
+    def adjudicate(self, model: ChessModel) -> Optional[str]:
+        """Finds the result of the model's game with perfect play from here.
+
+        Args:
+            model (ChessModel): The game to judge; it is left unchanged.
+
+        Returns:
+            Optional[str]: '1-0', '0-1' or '1/2-1/2', or None if the position is not covered.
+        """
+        found = self.probe(model)
+        if found is None:
+            return None
+        if found[0] == Wdl.Draw:
+            return "1/2-1/2"
+        white_wins = (found[0] == Wdl.Win) == (COLOR_INDEX[model.current_player] == WHITE)
+        return "1-0" if white_wins else "0-1"
+
+    def generate(self, material: str, verbose: bool = False) -> str:
+        """Generates a material set's table, and any smaller tables it leads to, unless already stored.
+
+        Args:
+            material (str): The material, for example 'KQK'.
+            verbose (bool, optional): Whether to print each table as it is finished. Defaults to False.
+
+        Raises:
+            ValueError: If the material is malformed or has more than MAX_PIECES pieces.
+
+        Returns:
+            str: The stored name of the material set.
+        """
+        material, _ = canonical_material(material)
+        if self.__table(material) is not None:
+            return material
+        codes = _table_codes(material)
+
+        # Captures and promotions lead to other material sets, which are solved first
+        for index, code in enumerate(codes):
+            if code % 6 != KING:
+                self.generate(_material_of(codes[:index] + codes[index + 1:]), verbose)
+            if code % 6 == PAWN:
+                self.generate(_material_of(codes[:index] + [code - PAWN + QUEEN] + codes[index + 1:]), verbose)
+
+        start = time.perf_counter()
+        wdl, dtm = _solve(self, material, codes)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(material), "wb") as file:
+            file.write(FILE_HEADER.pack(MAGIC, len(codes)))
+            file.write(_pack(wdl))
+            file.write(dtm)
+        self.__tables.pop(material, None)
+        if verbose:
+            print(f"{material}: {len(wdl)} positions in {time.perf_counter() - start:.1f}s")
+        return material
+
+
+def _solve(tablebase: Tablebase, material: str, codes: List[int]) -> Tuple[bytearray, bytearray]:
+    """Solves one material set by retrograde analysis, given that the sets it leads to are solved.
+
+    Every position first gets its moves counted. Moves that capture or promote are looked up in the
+    smaller tables straight away. Then, ply by ply from the checkmates outwards, each lost position
+    makes every position that can move into it a win, and each won position counts down the moves
+    left to the positions that can move into it; a position whose moves all lead to wins for the
+    opponent is lost.
+    """
+    multipliers = _multipliers(len(codes))
+    size = 2 * 64 ** len(codes)
+    wdl = bytearray(size)
+    dtm = bytearray(size)
+    # Moves of each position not yet known to lose, and the longest known loss among its captures
+    remaining = bytearray(size)
+    longest_loss = bytearray(size)
+    layers: Dict[int, array] = {}
+
+    def schedule(index: int, plies: int):
+        if plies > 255:
+            raise ValueError(f"{material} has a mate longer than 255 plies.")
+        layers.setdefault(plies, array("L")).append(index)
+
+    pawns = [index for index, code in enumerate(codes) if code % 6 == PAWN]
+    kings = [codes.index(WHITE * 6 + KING), codes.index(BLACK * 6 + KING)]
+    for base, placement in enumerate(product(range(64), repeat=len(codes))):
+        squares = list(placement)
+        occupied = 0
+        for square in squares:
+            occupied |= 1 << square
+        if occupied.bit_count() < len(squares) or any(not 8 <= squares[pawn] < 56 for pawn in pawns):
+            wdl[2 * base] = wdl[2 * base + 1] = ILLEGAL
+            continue
+        for color in (WHITE, BLACK):
+            index = 2 * base + color
+            # The player who just moved may not have left their king attacked
+            if _is_attacked(squares[kings[1 - color]], color, codes, squares, occupied):
+                wdl[index] = ILLEGAL
+                continue
+
+            moves = _legal_moves(codes, squares, color)
+            if not moves:
+                if _is_attacked(squares[kings[color]], 1 - color, codes, squares, occupied):
+                    schedule(index, 0)
+                continue
+
+            # Captures and promotions are looked up in the smaller tables; every other move counts
+            # until the position it leads to is found to be won for the opponent
+            count, win, loss = len(moves), None, 0
+            for piece, target, captured in moves:
+                promotes = piece in pawns and target // 8 in (0, 7)
+                if captured < 0 and not promotes:
+                    continue
+                next_codes = list(codes)
+                next_squares = list(squares)
+                next_squares[piece] = target
+                if promotes:
+                    next_codes[piece] += QUEEN - PAWN
+                if captured >= 0:
+                    del next_codes[captured], next_squares[captured]
+                value, plies = tablebase._probe_pieces(next_codes, next_squares, 1 - color)
+                if value == LOSS:
+                    win = plies + 1 if win is None else min(win, plies + 1)
+                elif value == WIN:
+                    loss = max(loss, plies + 1)
+                    count -= 1
+            remaining[index] = count
+            longest_loss[index] = min(loss, 255)
+            if win is not None:
+                schedule(index, win)
+            elif count == 0:
+                schedule(index, loss)
+
+    # Positions are finished ply by ply; a won position is queued once, from its first lost successor
+    done = bytearray(size)
+    queued = bytearray(size)
+    plies = 0
+    while layers:
+        for index in layers.pop(plies, ()):
+            if done[index]:
+                continue
+            done[index] = 1
+            # Wins are an odd number of plies from mate and losses an even number
+            wdl[index] = WIN if plies % 2 else LOSS
+            dtm[index] = plies
+
+            # Walk back to the positions of the other player that can move here
+            color = index & 1
+            squares = [index // multiplier % 64 for multiplier in multipliers]
+            for piece, origin in _unmoves(codes, squares, 1 - color):
+                previous = index - color + (origin - squares[piece]) * multipliers[piece] + (1 - color)
+                if wdl[previous] == ILLEGAL or done[previous] or queued[previous]:
+                    continue
+                if plies % 2 == 0:
+                    queued[previous] = 1
+                    schedule(previous, plies + 1)
+                else:
+                    remaining[previous] -= 1
+                    if remaining[previous] == 0:
+                        # Both distances are even, so the position stays lost whichever is longer
+                        schedule(previous, max(plies + 1, longest_loss[previous]))
+        plies += 1
+    return wdl, dtm
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or probe endgame tablebases.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generator = commands.add_parser("generate", help="generate tables for material sets such as KQK")
+    generator.add_argument("materials", nargs="+", help="material sets, white pieces first")
+    generator.add_argument("--directory", default="tables", help="where to keep the tables")
+    prober = commands.add_parser("probe", help="look up a position given in FEN")
+    prober.add_argument("fen", help="the position")
+    prober.add_argument("--directory", default="tables", help="where the tables are kept")
+    args = parser.parse_args()
+
+    tablebase = Tablebase(args.directory)
+    if args.command == "generate":
+        for material in args.materials:
+            tablebase.generate(material, verbose=True)
+    else:
+        model = ChessModel.from_fen(args.fen)
+        found = tablebase.probe(model)
+        if found is None:
+            print("not in the tablebase")
+        else:
+            move = tablebase.best_move(model)
+            print(f"{found[0]} in {found[1]} plies, best move {move}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Transposition tables: search results kept by position hash so positions reached again by another
+move order are not searched twice.
+
+A table is a fixed number of slots held in two preallocated arrays, one of position hashes and one of
+entries packed into 64-bit integers, so it never grows past the memory it was made with. Each entry
+holds the search depth, the score, whether the score is exact or a bound, the best move as a packed
+move (see move.pack_move) and the search generation it was stored in. When two positions want the
+same slot the replacement scheme decides which one is kept.
+"""
+from array import array
+from enum import Enum
+from typing import Optional, Tuple
+
+# What a stored score means: the exact score, at least the score (the search failed high), or at
+# most the score (no move reached alpha)
+BOUND_EXACT = 0
+BOUND_LOWER = 1
+BOUND_UPPER = 2
+
+# Layout of a packed entry
+_SCORE_OFFSET = 1 << 19
+_SCORE_MASK = (1 << 20) - 1
+_DEPTH_SHIFT = 20
+_BOUND_SHIFT = 28
+_MOVE_SHIFT = 30
+_GENERATION_SHIFT = 46
+_GENERATION_MASK = 0xFF
+_USED = 1 << 54
+
+# The number of slots a table has unless told otherwise: 1 MiB of arrays
+DEFAULT_ENTRIES = 1 << 16
+
+
+class Replacement(Enum):
+    """Represents how a table chooses between the entry in a slot and a new one."""
+
+    # Always keep the newest entry
+    Always = 1
+    # Keep the deeper entry, unless the old one is from an earlier search
+    Depth = 2
+    # Buckets of two slots: a depth-preferred slot, and an always-replaced slot for what it turns away
+    TwoTier = 3
+
+    def __str__(self):
+        return self.name
+
+
+class TranspositionTable:
+    """A fixed-size table of search results keyed by position hash.
+
+    Attributes:
+        replacement (Replacement): The replacement scheme.
+        probes (int): The number of lookups since the statistics were last reset.
+        hits (int): The number of lookups that found their position.
+        stores (int): The number of entries written.
+        overwrites (int): The number of entries written over an entry for another position.
+    """
+
+    def __init__(self, entries: int = DEFAULT_ENTRIES, replacement: Replacement = Replacement.TwoTier):
+        """Initializes an empty table.
+
+        Args:
+            entries (int, optional): The number of slots, rounded down to a power of two. Defaults
+                to DEFAULT_ENTRIES.
+            replacement (Replacement, optional): The replacement scheme. Defaults to two-tier buckets.
+
+        Raises:
+            ValueError: If the table would have fewer than two slots.
+        """
+        if entries < 2:
+            raise ValueError("A transposition table needs at least two entries.")
+        size = 1 << (entries.bit_length() - 1)
+        self.replacement = replacement
+        self.__keys = array("Q", bytes(8 * size))
+        self.__data = array("Q", bytes(8 * size))
+        self.__mask = size - 1
+        self.__generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def __len__(self) -> int:
+        return self.__mask + 1
+
+    @property
+    def hit_rate(self) -> float:
+        """float: The share of lookups that found their position, 0 before any lookup."""
+        return self.hits / self.probes if self.probes else 0.0
+
+    @property
+    def memory_bytes(self) -> int:
+        """int: The bytes held by the table's arrays."""
+        return (self.__mask + 1) * (self.__keys.itemsize + self.__data.itemsize)
+
+    def used(self) -> int:
+        """Counts the slots holding an entry.
+
+        Returns:
+            int: The number of slots in use.
+        """
+        return sum(1 for data in self.__data if data)
+
+    def new_search(self):
+        """Marks the entries stored so far as coming from an earlier search, so depth-preferred
+        slots give them up to the next search's entries."""
+        self.__generation = (self.__generation + 1) & _GENERATION_MASK
+
+    def clear(self):
+        """Empties the table and resets its statistics."""
+        size = self.__mask + 1
+        self.__keys = array("Q", bytes(8 * size))
+        self.__data = array("Q", bytes(8 * size))
+        self.__generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Sets the lookup and store counts back to zero."""
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, int, int]]:
+        """Looks a position up.
+
+        Args:
+            key (int): The position hash, see ChessModel.position_hash.
+
+        Returns:
+            Optional[Tuple[int, int, int, int]]: The stored depth, score, bound (BOUND_EXACT,
+                BOUND_LOWER or BOUND_UPPER) and packed best move (0 if none), or None if the
+                position is not in the table.
+        """
+        self.probes += 1
+        keys = self.__keys
+        index = key & self.__mask
+        if self.replacement is Replacement.TwoTier:
+            index &= ~1
+            if keys[index] != key:
+                index += 1
+        data = self.__data[index]
+        if keys[index] != key or not data:
+            return None
+        self.hits += 1
+        return ((data >> _DEPTH_SHIFT) & 0xFF, (data & _SCORE_MASK) - _SCORE_OFFSET,
+                (data >> _BOUND_SHIFT) & 3, (data >> _MOVE_SHIFT) & 0xFFFF)
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int = 0):
+        """Records a search result, if the replacement scheme lets it into its slot.
+
+        Args:
+            key (int): The position hash.
+            depth (int): The depth the position was searched to, 0 to 255.
+            score (int): The score from the point of view of the player to move.
+            bound (int): BOUND_EXACT, BOUND_LOWER or BOUND_UPPER.
+            move (int, optional): The best move found, packed. Defaults to 0 for none.
+        """
+        keys, table = self.__keys, self.__data
+        index = key & self.__mask
+        replacement = self.replacement
+        if replacement is not Replacement.Always:
+            if replacement is Replacement.TwoTier:
+                index &= ~1
+            old = table[index]
+            # Depth-preferred: keep a deeper entry from this search, unless it is for this position
+            if (old and keys[index] != key and (old >> _GENERATION_SHIFT) & _GENERATION_MASK == self.__generation
+                    and (old >> _DEPTH_SHIFT) & 0xFF > depth):
+                if replacement is Replacement.Depth:
+                    return
+                index += 1
+            # A shallower result for the same position keeps the deeper entry's move if it has none
+            elif old and keys[index] == key and not move:
+                move = (old >> _MOVE_SHIFT) & 0xFFFF
+
+        if table[index] and keys[index] != key:
+            self.overwrites += 1
+        self.stores += 1
+        keys[index] = key
+        table[index] = (_USED | self.__generation << _GENERATION_SHIFT | move << _MOVE_SHIFT | bound << _BOUND_SHIFT
+                        | min(depth, 0xFF) << _DEPTH_SHIFT | (score + _SCORE_OFFSET))
@@ -0,0 +1,32 @@
+import random
+from player import Player
+from piece_codes import piece_code
+
+# The keys come from a fixed seed so a position hashes the same in every process and every run,
+# which lets hashes be stored in files and shared between worker processes.
+_generator = random.Random(0x5EED5EED)
+
+# PIECE_KEYS[code][square] is XORed in for every piece code standing on a square (row * 8 + col)
+PIECE_KEYS = tuple(tuple(_generator.getrandbits(64) for _ in range(64)) for _ in range(12))
+
+# XORed in when black is to move
+BLACK_TO_MOVE_KEY = _generator.getrandbits(64)
+
+
+def hash_board(board, player: Player) -> int:
+    """Computes the Zobrist hash of a position from scratch.
+
+    Args:
+        board (list): The chess board, indexed as board[row][col].
+        player (Player): The player to move.
+
+    Returns:
+        int: The 64-bit hash of the position.
+    """
+    value = BLACK_TO_MOVE_KEY if player == Player.BLACK else 0
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece is not None:
+                value ^= PIECE_KEYS[piece_code(piece)][row * 8 + col]
+    return value